@@ -0,0 +1,73 @@
+"""Initial schema: videos and annotations
+
+Revision ID: 000_initial_schema
+Revises:
+Create Date: 2023-12-31 00:00:00.000000
+
+Databases whose tables were created by the application at startup already
+have some of these tables; each table is only created when it is missing, so
+``alembic upgrade head`` adopts such a database without a manual stamp.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '000_initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'videos' not in existing:
+        _create_videos()
+    if 'annotations' not in existing:
+        _create_annotations()
+
+
+def _create_videos():
+    op.create_table('videos',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('originalName', sa.String(length=255), nullable=False),
+        sa.Column('mimeType', sa.String(length=100), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('duration', sa.Float(), nullable=False),
+        sa.Column('views', sa.Integer(), nullable=True),
+        sa.Column('isActive', sa.Boolean(), nullable=True),
+        sa.Column('isProduction', sa.Boolean(), nullable=True),
+        sa.Column('totalDuration', sa.Float(), nullable=True),
+        sa.Column('caseId', sa.String(length=100), nullable=True),
+        sa.Column('sourceType', sa.String(length=50), nullable=True),
+        sa.Column('createdAt', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updatedAt', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def _create_annotations():
+    op.create_table('annotations',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('startTime', sa.Float(), nullable=False),
+        sa.Column('endTime', sa.Float(), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=True),
+        sa.Column('color', sa.String(length=7), nullable=True),
+        sa.Column('isActive', sa.Boolean(), nullable=True),
+        sa.Column('videoId', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('createdAt', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updatedAt', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['videoId'], ['videos.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('annotations')
+    op.drop_table('videos')
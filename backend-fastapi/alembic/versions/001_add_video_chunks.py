@@ -1,9 +1,11 @@
 """Add video chunks table
 
 Revision ID: 001_add_video_chunks
-Revises: 
+Revises: 000_initial_schema
 Create Date: 2024-01-01 00:00:00.000000
 
+Databases created by the application at startup already have the table but
+not its indexes; only what is missing is created.
 """
 from alembic import op
 import sqlalchemy as sa
@@ -11,13 +13,25 @@ from sqlalchemy.dialects import postgresql
 
 # revision identifiers, used by Alembic.
 revision = '001_add_video_chunks'
-down_revision = None
+down_revision = '000_initial_schema'
 branch_labels = None
 depends_on = None
 
 
 def upgrade():
     # Create video_chunks table
+    if not sa.inspect(op.get_bind()).has_table('video_chunks'):
+        _create_table()
+    indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('video_chunks')}
+
+    # Create index on video_id for better performance
+    if 'ix_video_chunks_video_id' not in indexes:
+        op.create_index('ix_video_chunks_video_id', 'video_chunks', ['video_id'])
+    if 'ix_video_chunks_chunk_index' not in indexes:
+        op.create_index('ix_video_chunks_chunk_index', 'video_chunks', ['video_id', 'chunk_index'])
+
+
+def _create_table():
     op.create_table('video_chunks',
         sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
         sa.Column('video_id', postgresql.UUID(as_uuid=True), nullable=False),
@@ -36,10 +50,6 @@ def upgrade():
         sa.ForeignKeyConstraint(['video_id'], ['videos.id'], ),
         sa.PrimaryKeyConstraint('id')
     )
-    
-    # Create index on video_id for better performance
-    op.create_index('ix_video_chunks_video_id', 'video_chunks', ['video_id'])
-    op.create_index('ix_video_chunks_chunk_index', 'video_chunks', ['video_id', 'chunk_index'])
 
 
 def downgrade():
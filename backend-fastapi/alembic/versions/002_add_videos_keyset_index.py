@@ -0,0 +1,29 @@
+"""Add keyset pagination index on videos
+
+Revision ID: 002_add_videos_keyset_index
+Revises: 001_add_video_chunks
+Create Date: 2024-01-02 00:00:00.000000
+
+Databases created by the application at startup already have the index
+declared on the model; it is only created when missing.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002_add_videos_keyset_index'
+down_revision = '001_add_video_chunks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Newest-first listing pages on (createdAt, id); a btree scanned backwards
+    # serves the descending order without a sort
+    indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('videos')}
+    if 'ix_videos_created_at_id' not in indexes:
+        op.create_index('ix_videos_created_at_id', 'videos', ['createdAt', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_videos_created_at_id', table_name='videos')
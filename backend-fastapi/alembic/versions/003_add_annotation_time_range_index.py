@@ -0,0 +1,31 @@
+"""Add annotation time range index
+
+Revision ID: 003_add_annotation_time_range_index
+Revises: 002_add_videos_keyset_index
+Create Date: 2024-01-03 00:00:00.000000
+
+Databases created by the application at startup already have the index
+declared on the model; it is only created when missing.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '003_add_annotation_time_range_index'
+down_revision = '002_add_videos_keyset_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # btree_gist lets the uuid videoId column share a GiST index with the range
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    
+    # Must match app.models.annotation.time_range for the planner to use it
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_annotations_video_time_range ON annotations '
+        'USING gist ("videoId", numrange(CAST("startTime" AS NUMERIC), CAST("endTime" AS NUMERIC), \'[]\'))'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_annotations_video_time_range', table_name='annotations')
@@ -0,0 +1,41 @@
+"""Add annotation and production listing indexes
+
+Revision ID: 004_add_listing_indexes
+Revises: 003_add_annotation_time_range_index
+Create Date: 2024-01-04 00:00:00.000000
+
+Databases created by the application at startup already have these indexes
+declared on the model; each is only created when missing.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_add_listing_indexes'
+down_revision = '003_add_annotation_time_range_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    annotation_indexes = {index['name'] for index in inspector.get_indexes('annotations')}
+    video_indexes = {index['name'] for index in inspector.get_indexes('videos')}
+    
+    # Per-video annotation lists (ordered by start time) and the batched
+    # "videoId IN (...) AND isActive" loads; also backs the videoId foreign key
+    if 'ix_annotations_video_id_start_time' not in annotation_indexes:
+        op.create_index('ix_annotations_video_id_start_time', 'annotations', ['videoId', 'startTime'])
+    
+    # Production listings, including keyset pages newest first
+    if 'ix_videos_production_active_created_at' not in video_indexes:
+        op.create_index(
+            'ix_videos_production_active_created_at',
+            'videos',
+            ['isProduction', 'isActive', 'createdAt', 'id']
+        )
+
+
+def downgrade():
+    op.drop_index('ix_videos_production_active_created_at', table_name='videos')
+    op.drop_index('ix_annotations_video_id_start_time', table_name='annotations')
@@ -2,12 +2,15 @@
 Annotation API endpoints.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+import io
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
-from app.core.database import get_db
+from app.core.database import get_db, recently_wrote
+from app.services.annotation_bulk import AnnotationBulkService, export_annotations
 from app.services.annotation_service import AnnotationService
 from app.schemas.annotation import Annotation, AnnotationCreate, AnnotationUpdate
 
@@ -17,12 +20,64 @@ router = APIRouter()
 @router.get("/video/{video_id}", response_model=List[Annotation])
 async def get_annotations_by_video(
     video_id: UUID,
+    start: Optional[float] = Query(None, ge=0, description="Window start in seconds"),
+    end: Optional[float] = Query(None, ge=0, description="Window end in seconds"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all annotations for a video."""
+    """Get annotations for a video, optionally only those overlapping [start, end]."""
     annotation_service = AnnotationService(db)
-    annotations = await annotation_service.get_by_video_id(video_id)
-    return annotations
+    if start is None and end is None:
+        return await annotation_service.get_by_video_id(video_id)
+    
+    if start is None or end is None or end < start:
+        raise HTTPException(status_code=400, detail="Both start and end are required, with start <= end")
+    return await annotation_service.get_overlapping(video_id, start, end)
+
+
+@router.get("/video/{video_id}/at/{time}", response_model=List[Annotation])
+async def get_annotations_at_time(
+    video_id: UUID,
+    time: float,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the annotations active at a playback time."""
+    annotation_service = AnnotationService(db)
+    return await annotation_service.get_at_time(video_id, time)
+
+
+@router.post("/bulk")
+async def bulk_import_annotations(
+    file: UploadFile = File(...),
+    video_id: Optional[UUID] = Query(None, description="Video for rows without a videoId"),
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$", description="Defaults from the file type"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Import annotations from an NDJSON or CSV file."""
+    if format is None:
+        is_csv = file.content_type == "text/csv" or (file.filename or "").lower().endswith(".csv")
+        format = "csv" if is_csv else "ndjson"
+    
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return await AnnotationBulkService(db).import_stream(stream, format, video_id)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+
+
+@router.get("/export")
+async def export_annotations_file(
+    request: Request,
+    video_id: Optional[UUID] = Query(None, description="Only this video's annotations"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$")
+):
+    """Stream active annotations as NDJSON or CSV."""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"annotations-{video_id or 'all'}.{format}"
+    return StreamingResponse(
+        export_annotations(video_id, format, read_only=not recently_wrote(request)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 
 @router.get("/{annotation_id}", response_model=Annotation)
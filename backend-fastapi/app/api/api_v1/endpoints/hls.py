@@ -2,16 +2,16 @@
 HLS streaming API endpoints.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import PlainTextResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 from pathlib import Path
 
 from app.core.database import get_db
-from app.services.hls_service import HLSService
-from app.services.video_processing import VideoProcessingService
+from app.services.hls_service import HLSService, get_hls_service
+from app.services.image_encoding import MEDIA_TYPES, negotiate_format
 from app.models.video import Video
 from sqlalchemy import select
 
@@ -21,11 +21,10 @@ router = APIRouter()
 @router.get("/videos/{video_id}/hls/playlist.m3u8", response_class=PlainTextResponse)
 async def get_hls_playlist(
     video_id: UUID,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    hls_service: HLSService = Depends(get_hls_service)
 ):
     """Get HLS master playlist."""
-    hls_service = HLSService()
-    
     try:
         # Check if HLS stream exists
         video_hls_dir = hls_service.hls_dir / str(video_id)
@@ -66,32 +65,53 @@ async def get_hls_playlist(
 async def get_quality_playlist(
     video_id: UUID,
     quality: str,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    hls_service: HLSService = Depends(get_hls_service)
 ):
     """Get quality-specific HLS playlist."""
-    hls_service = HLSService()
+    content = await hls_service.get_variant_playlist(video_id, quality)
+    
+    return Response(
+        content=content,
+        media_type="application/vnd.apple.mpegurl",
+        headers={
+            "Cache-Control": "no-cache, no-store, must-revalidate",
+            "Access-Control-Allow-Origin": "*",
+        }
+    )
+
+
+# Declared before the segment route, which would otherwise match thumbnails/<n>.jpg
+@router.get("/videos/{video_id}/hls/thumbnails/{timestamp}.jpg")
+async def get_hls_thumbnail(
+    video_id: UUID,
+    timestamp: int,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, description="Requested width in pixels"),
+    width: Optional[int] = Query(None, ge=1, description="Same as w"),
+    db: AsyncSession = Depends(get_db),
+    hls_service: HLSService = Depends(get_hls_service)
+):
+    """Get HLS thumbnail for timeline preview, negotiating format from the Accept header."""
+    fmt = negotiate_format(request.headers.get("accept"))
     
     try:
-        quality_dir = hls_service.hls_dir / str(video_id) / quality
-        playlist_path = quality_dir / "playlist.m3u8"
-        
-        if not playlist_path.exists():
-            raise HTTPException(status_code=404, detail="Quality playlist not found")
-        
-        async with open(playlist_path, 'r') as f:
-            content = f.read()
+        thumbnail_content = await hls_service.get_thumbnail(video_id, timestamp, fmt=fmt, width=w or width)
         
         return Response(
-            content=content,
-            media_type="application/vnd.apple.mpegurl",
+            content=thumbnail_content,
+            media_type=MEDIA_TYPES[fmt],
             headers={
-                "Cache-Control": "no-cache, no-store, must-revalidate",
+                "Cache-Control": "public, max-age=3600",
                 "Access-Control-Allow-Origin": "*",
+                "Vary": "Accept",
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get quality playlist: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get thumbnail: {str(e)}")
 
 
 @router.get("/videos/{video_id}/hls/{quality}/{segment}")
@@ -99,11 +119,10 @@ async def get_hls_segment(
     video_id: UUID,
     quality: str,
     segment: str,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    hls_service: HLSService = Depends(get_hls_service)
 ):
     """Get HLS segment."""
-    hls_service = HLSService()
-    
     try:
         segment_content = await hls_service.get_hls_segment(video_id, quality, segment)
         
@@ -116,43 +135,19 @@ async def get_hls_segment(
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get segment: {str(e)}")
 
 
-@router.get("/videos/{video_id}/hls/thumbnails/{timestamp}.jpg")
-async def get_hls_thumbnail(
-    video_id: UUID,
-    timestamp: int,
-    db: AsyncSession = Depends(get_db)
-):
-    """Get HLS thumbnail for timeline preview."""
-    hls_service = HLSService()
-    
-    try:
-        thumbnail_content = await hls_service.get_thumbnail(video_id, timestamp)
-        
-        return Response(
-            content=thumbnail_content,
-            media_type="image/jpeg",
-            headers={
-                "Cache-Control": "public, max-age=3600",
-                "Access-Control-Allow-Origin": "*",
-            }
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get thumbnail: {str(e)}")
-
-
 @router.post("/videos/{video_id}/hls/generate")
 async def generate_hls_stream(
     video_id: UUID,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    hls_service: HLSService = Depends(get_hls_service)
 ):
     """Generate HLS stream for a video."""
-    hls_service = HLSService()
-    
     try:
         # Get video from database
         result = await db.execute(
@@ -185,11 +180,10 @@ async def generate_hls_stream(
 @router.delete("/videos/{video_id}/hls")
 async def cleanup_hls_stream(
     video_id: UUID,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    hls_service: HLSService = Depends(get_hls_service)
 ):
     """Clean up HLS stream for a video."""
-    hls_service = HLSService()
-    
     try:
         await hls_service.cleanup_hls_stream(video_id)
         
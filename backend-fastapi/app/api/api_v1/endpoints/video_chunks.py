@@ -2,27 +2,49 @@
 Video chunk API endpoints.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Response
+import asyncio
+import re
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
+from app.core.config import settings
 from app.core.database import get_db
-from app.services.video_processing import VideoProcessingService
+from app.services.video_processing import VideoProcessingService, get_video_processing_service
+from app.services.frame_atlas import FrameAtlasService, get_frame_atlas_service
+from app.services.image_encoding import MEDIA_TYPES, negotiate_format
+from app.services.preview_scheduler import PreviewCancelled, preview_scheduler
+from app.services.preview_warmer import preview_warmer
+from app.services.waveform_service import WaveformService, get_waveform_service
 from app.schemas.video_chunk import VideoChunk, VideoChunkWithVideo
 from app.models.video_chunk import VideoChunk as VideoChunkModel
 from sqlalchemy import select
 
 router = APIRouter()
 
+# One entity tag in an If-None-Match list; quoted, so it may contain commas
+ENTITY_TAG = re.compile(r'(?:W/)?"[^"]*"')
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.removeprefix("W/") == opaque for tag in ENTITY_TAG.findall(if_none_match))
+
 
 @router.get("/videos/{video_id}/chunks", response_model=List[VideoChunk])
 async def get_video_chunks(
     video_id: UUID,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    video_service: VideoProcessingService = Depends(get_video_processing_service)
 ):
     """Get all chunks for a video."""
-    video_service = VideoProcessingService()
     chunks = await video_service.get_video_chunks(video_id, db)
     return chunks
 
@@ -50,7 +72,8 @@ async def get_video_chunk(
 async def stream_video_chunk(
     video_id: UUID,
     chunk_id: UUID,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    video_service: VideoProcessingService = Depends(get_video_processing_service)
 ):
     """Stream a video chunk."""
     result = await db.execute(
@@ -62,7 +85,6 @@ async def stream_video_chunk(
     if not chunk:
         raise HTTPException(status_code=404, detail="Chunk not found")
     
-    video_service = VideoProcessingService()
     chunk_path = video_service.chunks_dir / chunk.filename
     
     if not chunk_path.exists():
@@ -86,32 +108,173 @@ async def stream_video_chunk(
 async def get_frame_preview(
     video_id: UUID,
     time_seconds: float,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, description="Requested width in pixels"),
+    db: AsyncSession = Depends(get_db),
+    video_service: VideoProcessingService = Depends(get_video_processing_service)
 ):
-    """Get a frame preview for the specified time."""
-    video_service = VideoProcessingService()
-    frame_data = await video_service.generate_frame_preview(video_id, time_seconds, db)
+    """Get a frame preview for the specified time.
+    
+    A newer preview request from the same ``X-Preview-Session`` for the same
+    video, or a client disconnect, cancels this one's decode. The output format is
+    negotiated from the Accept header and the width snapped to the allowed sizes.
+    """
+    fmt = negotiate_format(request.headers.get("accept"))
+    preview_warmer.record_request(video_id)
+    try:
+        frame_data = await video_service.generate_frame_preview(
+            video_id, time_seconds, db, request, fmt=fmt, width=w
+        )
+    except PreviewCancelled as e:
+        raise HTTPException(status_code=409, detail=f"Preview cancelled: {e.reason}")
     
     if not frame_data:
         raise HTTPException(status_code=404, detail="Frame not found")
     
     return Response(
         content=frame_data,
+        media_type=MEDIA_TYPES[fmt],
+        headers={
+            "Cache-Control": "public, max-age=3600",
+            "Vary": "Accept",
+        }
+    )
+
+
+@router.get("/videos/{video_id}/preview/{time_seconds}")
+async def get_atlas_preview(
+    video_id: UUID,
+    time_seconds: float,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, description="Requested width in pixels"),
+    atlas_service: FrameAtlasService = Depends(get_frame_atlas_service)
+):
+    """Get a low-resolution preview frame sliced from the video's frame atlas."""
+    fmt = negotiate_format(request.headers.get("accept"))
+    preview_warmer.record_request(video_id)
+    frame_data = await atlas_service.get_preview(video_id, time_seconds, fmt=fmt, width=w)
+    
+    if not frame_data:
+        raise HTTPException(status_code=404, detail="Frame atlas not found")
+    
+    return Response(
+        content=frame_data,
+        media_type=MEDIA_TYPES[fmt],
+        headers={
+            "Cache-Control": "public, max-age=3600",
+            "Vary": "Accept",
+        }
+    )
+
+
+@router.get("/videos/{video_id}/preview-strip")
+async def get_atlas_preview_strip(
+    video_id: UUID,
+    request: Request,
+    count: int = Query(20, ge=1, le=200),
+    atlas_service: FrameAtlasService = Depends(get_frame_atlas_service)
+):
+    """Get a horizontal strip of evenly spaced frames from the frame atlas."""
+    fmt = negotiate_format(request.headers.get("accept"))
+    strip_data = await atlas_service.get_strip(video_id, count, fmt=fmt)
+    
+    if not strip_data:
+        raise HTTPException(status_code=404, detail="Frame atlas not found")
+    
+    return Response(
+        content=strip_data,
+        media_type=MEDIA_TYPES[fmt],
+        headers={
+            "Cache-Control": "public, max-age=3600",
+            "Vary": "Accept",
+            "X-Strip-Frames": str(count),
+        }
+    )
+
+
+@router.get("/previews/stats")
+async def get_preview_stats():
+    """Report preview queue depth, cancellation counts and cache usage."""
+    return {
+        "scheduler": preview_scheduler.stats(),
+        "atlas_cache": FrameAtlasService.cache_stats(),
+        "warming": preview_warmer.stats(),
+    }
+
+
+@router.get("/videos/{video_id}/sprite.jpg")
+async def get_sprite_sheet(
+    video_id: UUID,
+    atlas_service: FrameAtlasService = Depends(get_frame_atlas_service)
+):
+    """Get the timeline sprite sheet, building it from the frame atlas if needed."""
+    meta = atlas_service.load_sprite_meta(video_id)
+    if meta is None:
+        meta = await asyncio.to_thread(
+            atlas_service.build_sprite_sheet,
+            video_id,
+            settings.PREVIEW_WARMING_GRID_SECONDS,
+            settings.SPRITE_COLUMNS,
+        )
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Frame atlas not found")
+    
+    return FileResponse(
+        atlas_service.sprite_path(video_id),
         media_type="image/jpeg",
         headers={
             "Cache-Control": "public, max-age=3600",
+            "X-Sprite-Interval": str(meta["interval"]),
+            "X-Sprite-Columns": str(meta["columns"]),
+            "X-Sprite-Rows": str(meta["rows"]),
+            "X-Sprite-Count": str(meta["count"]),
+            "X-Sprite-Tile": f"{meta['tile_width']}x{meta['tile_height']}",
         }
     )
 
 
+@router.get("/videos/{video_id}/waveform")
+async def get_waveform(
+    video_id: UUID,
+    request: Request,
+    buckets: int = Query(1000, ge=1, le=settings.WAVEFORM_MAX_BUCKETS),
+    waveform_service: WaveformService = Depends(get_waveform_service)
+):
+    """Get audio waveform peaks downsampled to the requested bucket count.
+    
+    The body is interleaved int8 (min, max) pairs, one per bucket.
+    """
+    waveform = await asyncio.to_thread(waveform_service.get_waveform, video_id, buckets)
+    
+    if waveform is None:
+        raise HTTPException(status_code=404, detail="Waveform not found")
+    
+    data, meta, etag = waveform
+    headers = {
+        "Cache-Control": "public, max-age=86400",
+        "ETag": etag,
+        "X-Waveform-Buckets": str(meta["buckets"]),
+        "X-Waveform-Bucket-Seconds": f"{meta['bucket_seconds']:.6f}",
+        "X-Waveform-Duration": f"{meta['duration']:.3f}",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    return Response(
+        content=data,
+        media_type="application/octet-stream",
+        headers=headers,
+    )
+
+
 @router.get("/videos/{video_id}/timeline-thumbnails")
 async def get_timeline_thumbnails(
     video_id: UUID,
     num_thumbnails: int = 20,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    video_service: VideoProcessingService = Depends(get_video_processing_service)
 ):
     """Get timeline thumbnails for a video."""
-    video_service = VideoProcessingService()
     thumbnails = await video_service.generate_timeline_thumbnails(video_id, db, num_thumbnails)
     
     if not thumbnails:
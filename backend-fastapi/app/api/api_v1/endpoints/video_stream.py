@@ -11,6 +11,7 @@ import os
 
 from app.core.database import get_db
 from app.models.video import Video
+from app.services.preview_warmer import preview_warmer
 from sqlalchemy import select
 
 router = APIRouter()
@@ -23,6 +24,8 @@ async def stream_video(
     db: AsyncSession = Depends(get_db)
 ):
     """Stream video with range request support for seeking."""
+    preview_warmer.record_request(video_id)
+    
     # Get video from database
     result = await db.execute(
         select(Video).where(Video.id == video_id)
@@ -4,34 +4,42 @@ Video API endpoints.
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
 from app.core.database import get_db
+from app.core.pagination import InvalidCursor
+from app.schemas.serializers import json_response
 from app.services.video_service import VideoService
 from app.schemas.video import Video, VideoCreate, VideoUpdate, VideoList
-from app.services.video_processing import VideoProcessingService
+from app.services.video_processing import VideoProcessingService, get_video_processing_service
 
 router = APIRouter()
 
 
 @router.get("/", response_model=VideoList)
 async def get_videos(
-    skip: int = Query(0, ge=0),
+    skip: int = Query(0, ge=0, description="Deprecated offset paging; use `after`"),
     limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
+    count: str = Query("estimate", pattern="^(exact|estimate|none)$"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all videos."""
+    """Get videos, newest first, paged by cursor."""
     video_service = VideoService(db)
-    videos = await video_service.get_all(skip=skip, limit=limit)
-    total = await video_service.get_count()
+    if skip and not after:
+        # Legacy offset paging, kept for existing clients
+        videos = await video_service.get_all(skip=skip, limit=limit)
+        total = await video_service.get_count() if count != "none" else None
+        return VideoList(videos=videos, total=total, page=skip // limit + 1, size=limit)
     
-    return VideoList(
-        videos=videos,
-        total=total,
-        page=skip // limit + 1,
-        size=limit
-    )
+    try:
+        page = await video_service.get_page(after=after, limit=limit, count=count)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Rows go straight to orjson; response_model above only documents the shape
+    return json_response(page)
 
 
 @router.get("/{video_id}", response_model=Video)
@@ -98,12 +106,12 @@ async def increment_video_views(
 ):
     """Increment video views."""
     video_service = VideoService(db)
-    video = await video_service.increment_views(video_id)
+    views = await video_service.increment_views(video_id)
     
-    if not video:
+    if views is None:
         raise HTTPException(status_code=404, detail="Video not found")
     
-    return {"views": video.views}
+    return {"views": views}
 
 
 @router.post("/upload")
@@ -112,7 +120,8 @@ async def upload_video(
     file: UploadFile = File(...),
     title: str = Query(..., description="Video title"),
     description: str = Query(None, description="Video description"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    video_processing: VideoProcessingService = Depends(get_video_processing_service)
 ):
     """Upload a new video file."""
     # Validate file type
@@ -124,7 +133,6 @@ async def upload_video(
         raise HTTPException(status_code=400, detail="File too large (max 500MB)")
     
     # Process video in background
-    video_processing = VideoProcessingService()
     video_data = await video_processing.process_uploaded_video(
         file, title, description
     )
@@ -0,0 +1,127 @@
+"""
+In-process caching primitives.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Optional, Union
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from app.core.shared_cache import SharedCache
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count and total payload bytes."""
+
+    def __init__(self, name: str, max_entries: int = 1024, max_bytes: Optional[int] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size_of(value: Any) -> int:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return len(value)
+        return 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, marking it most recently used."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, size: Optional[int] = None) -> None:
+        """Store value under key, evicting least recently used entries as needed."""
+        size = self._size_of(value) if size is None else size
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        """Remove a single key. Returns True if it was present."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return False
+            self._bytes -= entry[1]
+            return True
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every key matching predicate. Returns the number removed."""
+        with self._lock:
+            doomed = [key for key in self._data if predicate(key)]
+            for key in doomed:
+                self._bytes -= self._data.pop(key)[1]
+            return len(doomed)
+
+    def invalidate_group(self, group: Any) -> int:
+        """Remove every key whose first element (or the key itself) is group."""
+        return self.invalidate(lambda k: (k[0] if isinstance(k, tuple) else k) == group)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and current occupancy."""
+        return {
+            "name": self.name,
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Caches built with build_cache, by name, for the stats endpoint
+caches: Dict[str, Union[LRUCache, "SharedCache"]] = {}
+
+
+def build_cache(name: str, max_entries: int = 1024, max_bytes: Optional[int] = None) -> Union[LRUCache, "SharedCache"]:
+    """Cache for media and metadata that every worker process can share.
+
+    With ``SHARED_CACHE_ENABLED`` (set by gunicorn.conf.py for multi-worker
+    runs) this is a host-wide SharedCache, so values must be bytes, str or
+    picklable; otherwise a per-process LRUCache.
+    """
+    if settings.SHARED_CACHE_ENABLED:
+        from app.core.shared_cache import SharedCache
+        cache = SharedCache(name, max_entries=max_entries, max_bytes=max_bytes or settings.SHARED_CACHE_DEFAULT_BYTES)
+    else:
+        cache = LRUCache(name, max_entries=max_entries, max_bytes=max_bytes)
+    caches[name] = cache
+    return cache
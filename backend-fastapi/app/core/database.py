@@ -1,16 +1,28 @@
 """
 Database configuration and session management.
+
+Reads can optionally go to a streaming read replica (``DATABASE_REPLICA_URL``).
+Safe-method requests and GraphQL queries get a replica session while the
+replica's replay lag is within ``REPLICA_MAX_LAG``; everything else, and every
+read from a client that wrote within ``READ_YOUR_WRITES_SECONDS``, stays on the
+primary.
 """
 
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from app.core.config import settings
+from app.core.db_pool import engine_options, instrument
 
 # Create async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    future=True
+engine = instrument(
+    create_async_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL, "primary")),
+    "primary"
 )
 
 # Create async session factory
@@ -20,15 +32,151 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+# Optional read replica
+replica_engine = instrument(
+    create_async_engine(settings.DATABASE_REPLICA_URL, **engine_options(settings.DATABASE_REPLICA_URL, "replica")),
+    "replica"
+) if settings.DATABASE_REPLICA_URL else None
+
+ReplicaSessionLocal = async_sessionmaker(
+    replica_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+) if replica_engine is not None else None
+
+# Set on responses to writes; reads carrying it stay on the primary until it expires
+READ_YOUR_WRITES_COOKIE = "db_primary_until"
+READ_ONLY_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Seconds the replica is behind; 0 when it has replayed everything it received
+# (an idle primary stops producing WAL, so the replay timestamp alone would
+# make a caught-up replica look lagged) or when the server is not in recovery
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
 
 class Base(DeclarativeBase):
     """Base class for all database models."""
     pass
 
 
-async def get_db() -> AsyncSession:
+class ReplicaMonitor:
+    """Polls replica lag; reads only use the replica while it is healthy."""
+
+    def __init__(self, interval: float = settings.REPLICA_HEALTH_INTERVAL):
+        self.interval = interval
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.checks = 0
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def check(self) -> bool:
+        """Measure replica lag now. Returns whether reads may use the replica."""
+        if replica_engine is None:
+            return False
+        self.checks += 1
+        try:
+            async with replica_engine.connect() as conn:
+                lag = await asyncio.wait_for(
+                    conn.scalar(REPLICA_LAG_SQL), timeout=settings.REPLICA_HEALTH_TIMEOUT
+                )
+            self.lag = float(lag or 0)
+            healthy = self.lag <= settings.REPLICA_MAX_LAG
+        except Exception as e:
+            self.failures += 1
+            self.lag = None
+            healthy = False
+            if self.healthy:
+                print(f"Error checking read replica: {e}")
+
+        if healthy != self.healthy:
+            if healthy:
+                print(f"✅ Read replica healthy (lag {self.lag:.1f}s); routing reads to it")
+            else:
+                print(f"⚠️ Read replica unhealthy (lag {self.lag}); routing reads to the primary")
+        self.healthy = healthy
+        return healthy
+
+    async def _loop(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start periodic lag checks (no-op without a configured replica)."""
+        if replica_engine is not None and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Stop lag checks and close the replica's pool."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if replica_engine is not None:
+            await replica_engine.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return replica health for the health endpoint."""
+        return {
+            "configured": replica_engine is not None,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "checks": self.checks,
+            "failures": self.failures,
+        }
+
+
+# Process-wide monitor; started by the app lifespan
+replica_monitor = ReplicaMonitor()
+
+
+def recently_wrote(request: Optional[Request]) -> bool:
+    """Whether the client wrote recently enough that a replica may not show it yet."""
+    if request is None:
+        return False
+    try:
+        return float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def stick_to_primary(response: Optional[Response]):
+    """Keep the client's reads on the primary until its write has replicated."""
+    if response is None or replica_engine is None:
+        return
+    window = settings.READ_YOUR_WRITES_SECONDS
+    response.set_cookie(
+        READ_YOUR_WRITES_COOKIE,
+        f"{time.time() + window:.3f}",
+        max_age=int(window) + 1,
+        httponly=True,
+        samesite="lax",
+    )
+
+
+def session_factory(read_only: bool) -> async_sessionmaker:
+    """Replica sessions for reads while the replica is healthy, primary otherwise."""
+    if read_only and ReplicaSessionLocal is not None and replica_monitor.healthy:
+        return ReplicaSessionLocal
+    return AsyncSessionLocal
+
+
+async def get_db(request: Request, response: Response) -> AsyncIterator[AsyncSession]:
     """Dependency to get database session."""
-    async with AsyncSessionLocal() as session:
+    read_only = request.method in READ_ONLY_METHODS
+    if not read_only:
+        stick_to_primary(response)
+    async with session_factory(read_only and not recently_wrote(request))() as session:
         try:
             yield session
         finally:
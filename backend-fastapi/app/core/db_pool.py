@@ -0,0 +1,268 @@
+"""
+Connection pool configuration and instrumentation.
+
+Each engine's pool reports live occupancy (checked out, overflow) plus
+histograms of how long requests waited for a connection and how long they
+held it, so pool sizes can be set from observed load. Statement execution
+time is recorded per operation (SELECT, INSERT, ...) from cursor events, and
+statements slower than ``SLOW_QUERY_MS`` go to the slow-query log with the
+shape of their parameters (types, never values) and the route that ran them.
+"""
+
+import bisect
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+from app.core.profiling import trace_query
+from app.core.request_context import current_route
+
+# Statements are grouped by their leading keyword; anything else is "OTHER"
+QUERY_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK"})
+
+# Bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    """Per-bucket observation counts with a running sum; cheap to observe."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max, 3),
+            "buckets": {
+                **{f"le_{bound}": n for bound, n in zip(self.buckets, self.counts)},
+                "le_inf": self.counts[-1],
+            },
+        }
+
+
+def params_shape(parameters: Any, executemany: bool = False) -> Any:
+    """Types of a statement's bound parameters, without their values."""
+    if executemany and isinstance(parameters, (list, tuple)):
+        return {"rows": len(parameters), "row": params_shape(parameters[0]) if parameters else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+# Most recent slow statements in this worker, oldest first
+slow_queries: Deque[Dict[str, Any]] = deque(maxlen=settings.SLOW_QUERY_LOG_SIZE)
+
+
+class PoolStats:
+    """Counters and latency histograms for one engine's pool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.engine: Optional[AsyncEngine] = None
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.query_errors = 0
+        self.slow_queries = 0
+        self.wait = Histogram()
+        self.hold = Histogram()
+        self.queries: Dict[str, Histogram] = {}
+
+    def _observe_query(self, statement: str, parameters: Any, executemany: bool, elapsed_ms: float):
+        trace_query(elapsed_ms)
+        if elapsed_ms >= settings.SLOW_QUERY_MS:
+            self._log_slow_query(statement, parameters, executemany, elapsed_ms)
+        words = statement.lstrip().split(None, 1)
+        operation = words[0].upper() if words else "OTHER"
+        if operation not in QUERY_OPERATIONS:
+            operation = "OTHER"
+        histogram = self.queries.get(operation)
+        if histogram is None:
+            histogram = self.queries.setdefault(operation, Histogram())
+        histogram.observe(elapsed_ms)
+
+    def _log_slow_query(self, statement: str, parameters: Any, executemany: bool, elapsed_ms: float):
+        self.slow_queries += 1
+        route = current_route()
+        slow_queries.append({
+            "engine": self.name,
+            "duration_ms": round(elapsed_ms, 3),
+            "statement": statement[:4000],
+            "params": params_shape(parameters, executemany),
+            "route": route,
+            "at": time.time(),
+        })
+        print(f"🐢 Slow query on {self.name} ({elapsed_ms:.0f} ms, {route or 'no request'}): "
+              f"{' '.join(statement.split())[:200]}")
+
+    def attach(self, engine: AsyncEngine):
+        """Subscribe to the engine's pool events."""
+        self.engine = engine
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "connect")
+        def on_connect(dbapi_connection, record):
+            self.connects += 1
+
+        @event.listens_for(sync_engine, "checkout")
+        def on_checkout(dbapi_connection, record, proxy):
+            self.checkouts += 1
+            record.info["checked_out_at"] = time.perf_counter()
+
+        @event.listens_for(sync_engine, "checkin")
+        def on_checkin(dbapi_connection, record):
+            self.checkins += 1
+            started = record.info.pop("checked_out_at", None)
+            if started is not None:
+                self.hold.observe((time.perf_counter() - started) * 1000)
+
+        @event.listens_for(sync_engine, "invalidate")
+        def on_invalidate(dbapi_connection, record, exception):
+            self.invalidations += 1
+
+        # Start times kept as a stack per connection (SQLAlchemy's query timing recipe)
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def after_execute(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.get("query_started")
+            if started:
+                elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+                self._observe_query(statement, parameters, executemany, elapsed_ms)
+
+        @event.listens_for(sync_engine, "handle_error")
+        def on_error(exception_context):
+            self.query_errors += 1
+            conn = exception_context.connection
+            started = conn.info.get("query_started") if conn is not None else None
+            if started:
+                started.pop()
+
+    def stats(self) -> Dict[str, Any]:
+        # Dispose replaces the pool object; read through the engine's current one
+        pool = self.engine.sync_engine.pool if self.engine is not None else None
+        occupancy: Dict[str, Any] = {"status": pool.status() if pool is not None else None}
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            occupancy.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow,
+            )
+        return {
+            **occupancy,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "query_errors": self.query_errors,
+            "slow_queries": self.slow_queries,
+            "wait": self.wait.stats(),
+            "hold": self.hold.stats(),
+            "queries": {operation: h.stats() for operation, h in list(self.queries.items())},
+        }
+
+
+# Engine name -> stats; filled as engines are created
+pool_stats: Dict[str, PoolStats] = {}
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited.
+
+    Pool events fire only once a connection has been handed out, so the wait
+    is timed around connect() itself.
+    """
+
+    def connect(self):
+        stats = pool_stats.get(self._orig_logging_name)
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeout:
+            if stats is not None:
+                stats.timeouts += 1
+            raise
+        if stats is not None:
+            stats.wait.observe((time.perf_counter() - start) * 1000)
+        return connection
+
+
+def per_worker(total: int) -> int:
+    """Share of a host-wide connection budget for one of WEB_CONCURRENCY workers."""
+    return math.ceil(total / max(1, settings.WEB_CONCURRENCY))
+
+
+def engine_options(url: str, name: str) -> Dict[str, Any]:
+    """create_async_engine keyword arguments from the pool settings."""
+    options: Dict[str, Any] = {
+        "echo": settings.SQL_ECHO,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_logging_name": name,
+    }
+    backend = make_url(url)
+    if backend.get_backend_name() == "postgresql":
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=max(1, per_worker(settings.DB_POOL_SIZE)),
+            max_overflow=per_worker(settings.DB_MAX_OVERFLOW),
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    if backend.get_driver_name() == "asyncpg":
+        size = settings.DB_STATEMENT_CACHE_SIZE
+        # asyncpg's own cache and SQLAlchemy's prepared statement cache
+        options["connect_args"] = {"statement_cache_size": size, "prepared_statement_cache_size": size}
+    return options
+
+
+def instrument(engine: AsyncEngine, name: str) -> AsyncEngine:
+    """Start collecting pool stats for an engine."""
+    stats = PoolStats(name)
+    stats.attach(engine)
+    pool_stats[name] = stats
+    return engine
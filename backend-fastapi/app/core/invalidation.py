@@ -0,0 +1,276 @@
+"""
+Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+
+Caches that live in one process (or one host's shared memory) register a
+handler with ``invalidation_bus``. A write calls ``invalidate(*tags)`` from
+app.core.result_cache after its commit; the bus applies the tags to this
+worker's handlers straight away and then NOTIFYs them, and every other
+worker applies them when its listener receives the message.
+
+Each worker LISTENs on a dedicated asyncpg connection (not one from the
+SQLAlchemy pool). Messages carry the publisher's origin id and a per-origin
+sequence number. A gap in the sequence means a publish failed or a message
+was lost, and a listener that reconnects may have missed anything, so in
+both cases every handler is asked to flush everything it holds.
+
+Shared-memory caches (``SHARED_CACHE_ENABLED``) hold one copy per host, so a
+message is applied to them once per host rather than once per worker.
+Messages name the sender's slabs; when they are this host's slabs the sender
+already changed them. A message from another host is claimed in a small
+shared cache, and only the worker that claims it changes the slabs.
+"""
+
+import asyncio
+import inspect
+import os
+import socket
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+
+import orjson
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.core.db_pool import Histogram
+from app.core.shared_cache import applied_on_host
+
+# Receives the changed tags, or None when every entry must go
+Handler = Callable[[Optional[FrozenSet[str]]], Union[None, Awaitable[None]]]
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+
+
+class InvalidationBus:
+    """Publishes entity-change tags with NOTIFY and applies other workers' changes."""
+
+    def __init__(self):
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        url = make_url(settings.DATABASE_URL)
+        self.enabled = settings.INVALIDATION_BUS_ENABLED and url.get_backend_name() == "postgresql"
+        self._dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self.slabs: Optional[str] = None  # This host's shared cache slabs, set by start()
+        self._claims = None
+        self._handlers: List[Tuple[Handler, bool]] = []
+        self._seq = 0
+        self._unsent = False  # A publish failed; the next message tells others to flush
+        self._last_seq: Dict[str, int] = {}
+        self._conn = None
+        self._conn_lock = asyncio.Lock()
+        self._queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self.connected = False
+        self.published = 0
+        self.publish_errors = 0
+        self.received = 0
+        self.dropped = 0  # Sequence numbers that never arrived
+        self.late = 0  # Arrived more than INVALIDATION_LATE_SECONDS after publishing
+        self.out_of_order = 0
+        self.flushes = 0
+        self.reconnects = 0
+        self.applied_on_host = 0  # Messages whose shared cache changes another worker made
+        self.delay = Histogram()
+
+    def subscribe(self, handler: Handler = None, *, remote: bool = True):
+        """Register a cache's handler; usable as a decorator.
+
+        Pass ``remote=False`` for stores every worker shares (Redis), which
+        the writing worker has already invalidated.
+        """
+        def register(fn: Handler) -> Handler:
+            self._handlers.append((fn, remote))
+            return fn
+        return register(handler) if handler is not None else register
+
+    async def _apply(self, tags: Optional[FrozenSet[str]], remote: bool):
+        for handler, on_remote in self._handlers:
+            if remote and not on_remote:
+                continue
+            try:
+                result = handler(tags)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Error in cache invalidation handler {handler.__qualname__}: {e}")
+
+    async def flush(self, reason: str):
+        """Empty every registered cache in this worker."""
+        self.flushes += 1
+        print(f"🧹 Flushing local caches ({reason})")
+        await self._apply(None, remote=True)
+
+    async def publish(self, tags: Any):
+        """Invalidate tags here, then tell the other workers. Call after the commit."""
+        tags = frozenset(tags)
+        await self._apply(tags, remote=False)
+        if self.enabled:
+            await self._send(sorted(tags))
+
+    async def _send(self, tags: Optional[List[str]]):
+        async with self._conn_lock:
+            # Numbered under the lock so sequence order is send order
+            self._seq += 1
+            if self._unsent:
+                tags = None  # Others missed earlier changes; have them flush everything
+            message = {"o": self.origin, "s": self._seq, "ts": time.time(), "h": self.slabs, "t": tags}
+            payload = orjson.dumps(message)
+            if len(payload) > MAX_PAYLOAD_BYTES:
+                payload = orjson.dumps({**message, "t": None})
+            try:
+                if self._conn is None or self._conn.is_closed():
+                    raise ConnectionError("listener connection is down")
+                await self._conn.execute("SELECT pg_notify($1, $2)", settings.INVALIDATION_CHANNEL, payload.decode())
+                self.published += 1
+                self._unsent = False
+            except Exception as e:
+                self.publish_errors += 1
+                self._unsent = True
+                print(f"Error publishing cache invalidation: {e}")
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        self._queue.put_nowait(payload.encode())
+
+    async def _handle(self, payload: bytes):
+        try:
+            message = orjson.loads(payload)
+            origin, seq = message["o"], int(message["s"])
+        except (orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+            print(f"⚠️ Ignoring malformed invalidation message: {payload[:200]!r}")
+            return
+        if origin == self.origin:
+            return  # Applied when it was published
+        self.received += 1
+
+        delay = max(0.0, time.time() - float(message.get("ts", 0)))
+        self.delay.observe(delay * 1000)
+        if delay > settings.INVALIDATION_LATE_SECONDS:
+            self.late += 1
+
+        last = self._last_seq.get(origin)
+        if len(self._last_seq) > 4096:
+            self._last_seq.clear()  # Origins of long-gone workers
+        self._last_seq[origin] = seq if last is None else max(last, seq)
+        if last is not None and seq <= last:
+            self.out_of_order += 1
+
+        token = applied_on_host.set(self._applied_on_host(message, origin, seq))
+        try:
+            if last is not None and seq > last + 1:
+                self.dropped += seq - last - 1
+                await self.flush(f"{seq - last - 1} messages from {origin} missing")
+                return
+
+            tags = message.get("t")
+            await self._apply(frozenset(tags) if tags is not None else None, remote=True)
+        finally:
+            applied_on_host.reset(token)
+
+    def _applied_on_host(self, message: Dict[str, Any], origin: str, seq: int) -> bool:
+        """Whether another worker has already applied this message to the shared cache slabs."""
+        if self.slabs is None:
+            return False
+        if message.get("h") == self.slabs:
+            applied = True  # Published from this host, so already applied to these slabs
+        else:
+            applied = not self._claims.add((origin, seq), b"")
+        if applied:
+            self.applied_on_host += 1
+        return applied
+
+    async def _dispatch(self):
+        # One consumer keeps messages in arrival order
+        while True:
+            payload = await self._queue.get()
+            await self._handle(payload)
+
+    async def _listen(self):
+        import asyncpg  # Only needed with a Postgres database
+
+        retry = settings.INVALIDATION_RECONNECT_DELAY
+        first = True
+        while True:
+            try:
+                conn = await asyncpg.connect(self._dsn, timeout=settings.INVALIDATION_KEEPALIVE_INTERVAL)
+                async with self._conn_lock:
+                    self._conn = conn
+                await conn.add_listener(settings.INVALIDATION_CHANNEL, self._on_notify)
+                self.connected = True
+                retry = settings.INVALIDATION_RECONNECT_DELAY
+                if not first:
+                    self.reconnects += 1
+                    await self.flush("invalidation listener reconnected")
+                first = False
+                if self._unsent:
+                    await self._send(None)
+
+                # NOTIFYs arrive on their own; the keepalive only notices dead connections
+                while True:
+                    await asyncio.sleep(settings.INVALIDATION_KEEPALIVE_INTERVAL)
+                    async with self._conn_lock:
+                        await asyncio.wait_for(conn.fetchval("SELECT 1"), settings.INVALIDATION_KEEPALIVE_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.connected or first:
+                    print(f"⚠️ Cache invalidation listener disconnected: {e}")
+                # Anything published from now until we are back was missed
+                first = False
+                self.connected = False
+                await self._close()
+                await asyncio.sleep(retry)
+                retry = min(retry * 2, 30.0)
+
+    async def _close(self):
+        async with self._conn_lock:
+            conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await conn.close(timeout=2)
+            except Exception:
+                conn.terminate()
+
+    def start(self):
+        """Start listening for other workers' invalidations (Postgres only)."""
+        if self.enabled and settings.SHARED_CACHE_ENABLED and self.slabs is None:
+            from app.core.shared_cache import SharedCache, slab_identity
+            self.slabs = slab_identity()
+            self._claims = SharedCache("invalidation_claims", max_entries=4096, max_bytes=1024 * 1024)
+        if self.enabled and not self._tasks:
+            self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._dispatch())]
+            print(f"📡 Cache invalidation bus listening on {settings.INVALIDATION_CHANNEL}")
+
+    async def stop(self):
+        """Stop listening and close the dedicated connection."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self.connected = False
+        await self._close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return bus counters for the health endpoint."""
+        return {
+            "enabled": self.enabled,
+            "connected": self.connected,
+            "origin": self.origin,
+            "published": self.published,
+            "publish_errors": self.publish_errors,
+            "received": self.received,
+            "dropped": self.dropped,
+            "late": self.late,
+            "out_of_order": self.out_of_order,
+            "flushes": self.flushes,
+            "reconnects": self.reconnects,
+            "applied_on_host": self.applied_on_host,
+            "delay_ms": {k: v for k, v in self.delay.stats().items() if k != "buckets"},
+        }
+
+
+# Process-wide bus; the listener is started by the app lifespan
+invalidation_bus = InvalidationBus()
@@ -0,0 +1,67 @@
+"""
+Deferred imports for heavy media libraries.
+
+numpy, Pillow, ffmpeg-python and m3u8 are only needed by the media endpoints
+and background jobs, so modules bind them through ``lazy_import`` and the
+real import happens on first attribute access. Workers that only serve
+GraphQL or metadata never pay for them.
+
+The first access often happens in a worker thread (``asyncio.to_thread``).
+``importlib.util.LazyLoader`` is not thread-safe before Python 3.12: the
+module stops being lazy before its code has run, so a second thread can read
+a half-executed module. Loads here are serialized on a lock, and other
+threads wait until the module has finished executing.
+"""
+
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+
+_load_lock = threading.RLock()
+
+
+class _LoadingModule(ModuleType):
+    """A lazy module whose code is executing; other threads wait for it."""
+
+    def __getattribute__(self, attr):
+        with _load_lock:
+            # By the time the lock is free the load is done and the class reset
+            return ModuleType.__getattribute__(self, attr)
+
+
+class _LockedLazyModule(importlib.util._LazyModule):
+    """A lazy module that is loaded by one thread at a time."""
+
+    def __getattribute__(self, attr):
+        with _load_lock:
+            if object.__getattribute__(self, "__class__") is not _LockedLazyModule:
+                # Another thread finished loading while this one waited
+                return getattr(self, attr)
+            try:
+                return super().__getattribute__(attr)
+            finally:
+                object.__setattr__(self, "__class__", ModuleType)
+
+    def __setattr__(self, attr, value):
+        if attr == "__class__" and value is ModuleType:
+            # LazyLoader drops the lazy class before executing the module
+            value = _LoadingModule
+        super().__setattr__(attr, value)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return a module that is executed on first attribute access."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    module.__class__ = _LockedLazyModule
+    return module
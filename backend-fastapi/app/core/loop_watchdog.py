@@ -0,0 +1,166 @@
+"""
+Event-loop blocking watchdog.
+
+A sync call inside ``async def`` (ffmpeg ``.run()``, ``ffmpeg.probe``, file
+reads, ``os.listdir``) stalls every stream the worker is serving. A
+heartbeat task wakes every ``LOOP_WATCHDOG_INTERVAL`` seconds and records how
+late it woke (``event_loop_lag_seconds``). A watchdog thread checks the
+heartbeat; once it is ``LOOP_WATCHDOG_THRESHOLD`` overdue the thread
+captures the loop thread's stack, names the route whose endpoint is on it
+and logs the blocking call. When the loop runs again the stall's full
+length goes to ``event_loop_stall_seconds`` and ``/internal/loop-stalls``.
+"""
+
+import asyncio
+import inspect
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from types import CodeType
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_LAG, EVENT_LOOP_STALL_SECONDS, EVENT_LOOP_STALLS
+
+# Frames under this directory are the application's own code
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LoopWatchdog:
+    """Heartbeat on the event loop, watched from a thread that reports stalls."""
+
+    def __init__(self):
+        self.interval = settings.LOOP_WATCHDOG_INTERVAL
+        self.threshold = settings.LOOP_WATCHDOG_THRESHOLD
+        self.stalls = 0
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=settings.LOOP_WATCHDOG_LOG_SIZE)
+        self._beat = 0.0  # Monotonic time the heartbeat last ran
+        self._reported_beat: Optional[float] = None
+        self._stall: Optional[Dict[str, Any]] = None  # Captured by the thread, finished by the heartbeat
+        self._lock = threading.Lock()
+        self._loop_thread: Optional[int] = None
+        self._route_codes: Dict[CodeType, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def _map_routes(self, app: Any):
+        """Remember each endpoint's code object so a stack can be matched to its route."""
+        for route in getattr(app, "routes", ()):
+            endpoint = getattr(route, "endpoint", None)
+            code = getattr(inspect.unwrap(endpoint), "__code__", None) if endpoint is not None else None
+            if code is not None:
+                self._route_codes.setdefault(code, route.path)
+
+    def _capture(self, beat: float, overdue: float) -> Optional[Dict[str, Any]]:
+        """Snapshot the loop thread's stack while it is blocked."""
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return None
+        route = None
+        caller = frame
+        while caller is not None and route is None:
+            route = self._route_codes.get(caller.f_code)
+            caller = caller.f_back
+        stack = traceback.extract_stack(frame)[-settings.LOOP_WATCHDOG_STACK_DEPTH:]
+        # The innermost frame of our own code is the call that blocks
+        blocking = next((f for f in reversed(stack) if f.filename.startswith(APP_DIR)), stack[-1] if stack else None)
+        location = (
+            f"{blocking.name} ({os.path.relpath(blocking.filename, os.path.dirname(APP_DIR))}:{blocking.lineno})"
+            if blocking is not None else "unknown"
+        )
+        return {
+            "beat": beat,
+            "at": time.time(),
+            "route": route or "background",
+            "location": location,
+            "overdue_s": round(overdue, 3),
+            "stack": traceback.format_list(stack),
+        }
+
+    def _watch(self):
+        while not self._stopping.wait(min(self.interval, self.threshold) / 2):
+            beat = self._beat
+            overdue = time.monotonic() - beat - self.interval
+            if overdue < self.threshold or beat == self._reported_beat:
+                continue
+            self._reported_beat = beat
+            stall = self._capture(beat, overdue)
+            if stall is None or self._beat != beat:
+                continue  # The loop moved on while the stack was read
+            with self._lock:
+                self._stall = stall
+            print(f"🐌 Event loop blocked for {overdue:.2f}s+ by {stall['route']} in {stall['location']}\n"
+                  + "".join(stall["stack"][-8:]).rstrip())
+
+    async def _heartbeat(self):
+        beat = self._beat  # Set by start(), which the thread is already watching
+        while True:
+            self._beat = beat
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - beat - self.interval)
+            EVENT_LOOP_LAG.observe(value=lag)
+            with self._lock:
+                stall, self._stall = self._stall, None
+            if stall is not None and stall["beat"] != beat:
+                stall = None
+            if lag >= self.threshold:
+                self._finish(stall, lag)
+            beat = now
+
+    def _finish(self, stall: Optional[Dict[str, Any]], lag: float):
+        """Count a stall once the loop runs again and its length is known."""
+        route = stall["route"] if stall is not None else "unknown"
+        self.stalls += 1
+        EVENT_LOOP_STALLS.inc(route)
+        EVENT_LOOP_STALL_SECONDS.observe(route, value=lag)
+        if stall is not None:
+            stall.pop("beat")
+            self.recent.append({**stall, "duration_s": round(lag, 3)})
+        print(f"🐌 Event loop resumed after {lag:.2f}s ({route})")
+
+    def start(self, app: Any = None):
+        """Start the heartbeat on the running loop and the thread watching it."""
+        if not settings.LOOP_WATCHDOG_ENABLED or self._task is not None:
+            return
+        if app is not None:
+            self._map_routes(app)
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        print(f"🐕 Event-loop watchdog reporting stalls over {self.threshold * 1000:.0f} ms")
+
+    async def stop(self):
+        """Stop the heartbeat and the watchdog thread."""
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Stall count and the most recent stalls with their stacks, newest first."""
+        return {
+            "enabled": settings.LOOP_WATCHDOG_ENABLED,
+            "threshold_s": self.threshold,
+            "stalls": self.stalls,
+            "recent": list(reversed(self.recent)),
+        }
+
+
+# Process-wide watchdog; started by the app lifespan
+loop_watchdog = LoopWatchdog()
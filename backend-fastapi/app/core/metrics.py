@@ -0,0 +1,465 @@
+"""
+Prometheus metrics for the media hot paths, served at ``/metrics``.
+
+Covers request latency per route template, bytes served, Range request
+sizes, ffmpeg job durations and realtime factor, cache hit rates, database
+query latency and event-loop lag. Label values come from fixed sets (route
+templates, job types, cache and engine names) and video ids never become
+labels, so the number of series stays bounded whatever the catalogue size;
+``METRICS_MAX_SERIES`` folds anything beyond that into ``other``.
+
+Each worker keeps its own registry. Under gunicorn ``METRICS_MULTIPROC_DIR``
+is set and every worker writes a snapshot there every
+``METRICS_SNAPSHOT_INTERVAL`` seconds; whichever worker answers a scrape
+merges them. Counters and histograms are summed over all snapshots, including
+those of exited workers, so totals never go backwards. Gauges are reported
+per live worker with a ``worker`` label.
+"""
+
+import asyncio
+import glob
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import orjson
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.cache import caches
+from app.core.config import settings
+from app.core.db_pool import LATENCY_BUCKETS_MS, Histogram, pool_stats
+from app.core.profiling import trace_ffmpeg
+from app.core.request_context import route_template
+
+# Bucket upper bounds
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1KB .. 256MB
+REALTIME_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+OVERFLOW_LABEL = "other"
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette adds the charset
+
+
+class Metric:
+    """One metric family: a series per combination of label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _new(self) -> Any:
+        raise NotImplementedError
+
+    def _key(self, values: Tuple[Any, ...]) -> Tuple[str, ...]:
+        key = tuple(str(v) for v in values)
+        if key not in self._series and len(self._series) >= settings.METRICS_MAX_SERIES:
+            key = (OVERFLOW_LABEL,) * len(self.labelnames)
+        return key
+
+    def _get(self, values: Tuple[Any, ...]) -> Any:
+        key = self._key(values)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._new())
+        return series
+
+    def _dump(self, value: Any) -> Any:
+        return value[0]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            series = [[list(key), self._dump(value)] for key, value in self._series.items()]
+        return {"type": self.kind, "help": self.documentation, "labels": list(self.labelnames), "series": series}
+
+
+class Counter(Metric):
+    """Monotonic total."""
+
+    kind = "counter"
+
+    def _new(self) -> List[float]:
+        return [0.0]
+
+    def inc(self, *labels: Any, amount: float = 1.0):
+        series = self._get(labels)
+        with self._lock:
+            series[0] += amount
+
+    def set(self, *labels: Any, value: float):
+        """Mirror a total that is counted elsewhere (cache and pool stats)."""
+        self._get(labels)[0] = float(value)
+
+
+class Gauge(Metric):
+    """Value that goes up and down."""
+
+    kind = "gauge"
+
+    def _new(self) -> List[float]:
+        return [0.0]
+
+    def inc(self, *labels: Any, amount: float = 1.0):
+        series = self._get(labels)
+        with self._lock:
+            series[0] += amount
+
+    def dec(self, *labels: Any, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: Any, value: float):
+        self._get(labels)[0] = float(value)
+
+
+class HistogramMetric(Metric):
+    """Distribution over fixed buckets, backed by db_pool.Histogram.
+
+    ``scale`` converts histograms kept in other units (the pool's are in
+    milliseconds) to the seconds Prometheus expects.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = SECONDS_BUCKETS, scale: float = 1.0):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self.scale = scale
+
+    def _new(self) -> Histogram:
+        return Histogram(self.buckets)
+
+    def observe(self, *labels: Any, value: float):
+        series = self._get(labels)
+        with self._lock:
+            series.observe(value)
+
+    def attach(self, *labels: Any, histogram: Histogram):
+        """Export a histogram that is observed elsewhere."""
+        self._series[self._key(labels)] = histogram
+
+    def _dump(self, value: Histogram) -> Any:
+        return [list(value.counts), value.total * self.scale]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "buckets": [b * self.scale for b in self.buckets]}
+
+
+# Every metric in this process, in exposition order
+registry: List[Metric] = []
+
+# Refresh mirrored metrics just before a snapshot
+collectors: List[Callable[[], None]] = []
+
+HTTP_REQUEST_SECONDS = HistogramMetric(
+    "http_request_duration_seconds", "Request latency by route template.", ("method", "route", "status"))
+HTTP_RESPONSE_BYTES = Counter(
+    "http_response_bytes_total", "Response body bytes sent by route template.", ("route",))
+HTTP_RANGE_BYTES = HistogramMetric(
+    "http_range_response_bytes", "Body size of partial (206) responses to Range requests.", ("route",),
+    buckets=BYTES_BUCKETS)
+FFMPEG_JOB_SECONDS = HistogramMetric(
+    "ffmpeg_job_duration_seconds", "Wall time of ffmpeg jobs by job type and outcome.", ("job", "outcome"))
+FFMPEG_REALTIME_FACTOR = HistogramMetric(
+    "ffmpeg_job_realtime_factor", "Seconds of media processed per wall-clock second.", ("job",),
+    buckets=REALTIME_BUCKETS)
+FFMPEG_JOBS_RUNNING = Gauge("ffmpeg_jobs_running", "ffmpeg jobs in progress.", ("job",))
+CACHE_HITS = Counter("cache_hits_total", "Cache lookups that found an entry.", ("cache",))
+CACHE_MISSES = Counter("cache_misses_total", "Cache lookups that found nothing.", ("cache",))
+CACHE_EVICTIONS = Counter("cache_evictions_total", "Entries dropped to make room.", ("cache",))
+CACHE_ENTRIES = Gauge("cache_entries", "Entries held (host-wide for shared caches).", ("cache",))
+CACHE_BYTES = Gauge("cache_bytes", "Payload bytes held (host-wide for shared caches).", ("cache",))
+DB_QUERY_SECONDS = HistogramMetric(
+    "db_query_duration_seconds", "Statement execution time by engine and operation.", ("engine", "operation"),
+    buckets=LATENCY_BUCKETS_MS, scale=0.001)
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "Statements that raised.", ("engine",))
+DB_POOL_WAIT_SECONDS = HistogramMetric(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection.", ("engine",),
+    buckets=LATENCY_BUCKETS_MS, scale=0.001)
+DB_POOL_HOLD_SECONDS = HistogramMetric(
+    "db_pool_hold_seconds", "Time a pooled connection stayed checked out.", ("engine",),
+    buckets=LATENCY_BUCKETS_MS, scale=0.001)
+DB_POOL_CONNECTIONS = Gauge("db_pool_connections", "Pooled connections by state.", ("engine", "state"))
+DB_SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS.", ("engine",))
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that gave up waiting.", ("engine",))
+EVENT_LOOP_LAG = HistogramMetric(
+    "event_loop_lag_seconds", "How late the event loop woke a sleeping task.", buckets=LOOP_LAG_BUCKETS)
+EVENT_LOOP_STALLS = Counter(
+    "event_loop_stalls_total", "Times the event loop was blocked past LOOP_WATCHDOG_THRESHOLD.", ("route",))
+EVENT_LOOP_STALL_SECONDS = HistogramMetric(
+    "event_loop_stall_seconds", "How long each stall blocked the event loop.", ("route",), buckets=LOOP_LAG_BUCKETS)
+
+
+class FfmpegJob:
+    """Handle for a running job; set ``media_seconds`` once the amount decoded is known."""
+
+    def __init__(self, media_seconds: Optional[float]):
+        self.media_seconds = media_seconds
+
+
+@contextmanager
+def ffmpeg_job(job: str, media_seconds: Optional[float] = None) -> Iterator[FfmpegJob]:
+    """Time an ffmpeg run. ``job`` is a fixed job type, never a video id."""
+    handle = FfmpegJob(media_seconds)
+    FFMPEG_JOBS_RUNNING.inc(job)
+    outcome = "error"
+    start = time.perf_counter()
+    try:
+        yield handle
+        outcome = "ok"
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        FFMPEG_JOBS_RUNNING.dec(job)
+        FFMPEG_JOB_SECONDS.observe(job, outcome, value=elapsed)
+        trace_ffmpeg(elapsed * 1000)
+        if outcome == "ok" and handle.media_seconds and elapsed > 0:
+            FFMPEG_REALTIME_FACTOR.observe(job, value=handle.media_seconds / elapsed)
+
+
+def _collect_caches():
+    for name, cache in list(caches.items()):
+        stats = cache.stats()
+        CACHE_HITS.set(name, value=stats["hits"])
+        CACHE_MISSES.set(name, value=stats["misses"])
+        # Shared slabs also count host-wide evictions; sum only this worker's
+        CACHE_EVICTIONS.set(name, value=stats.get("worker_evictions", stats["evictions"]))
+        CACHE_ENTRIES.set(name, value=stats["entries"])
+        CACHE_BYTES.set(name, value=stats["bytes"])
+
+
+def _collect_pools():
+    for name, stats in list(pool_stats.items()):
+        DB_POOL_WAIT_SECONDS.attach(name, histogram=stats.wait)
+        DB_POOL_HOLD_SECONDS.attach(name, histogram=stats.hold)
+        for operation, histogram in list(stats.queries.items()):
+            DB_QUERY_SECONDS.attach(name, operation, histogram=histogram)
+        DB_QUERY_ERRORS.set(name, value=stats.query_errors)
+        DB_SLOW_QUERIES.set(name, value=stats.slow_queries)
+        DB_POOL_TIMEOUTS.set(name, value=stats.timeouts)
+        occupancy = stats.stats()
+        for state in ("checked_out", "checked_in", "overflow"):
+            if state in occupancy:
+                DB_POOL_CONNECTIONS.set(name, state, value=occupancy[state])
+
+
+collectors.extend([_collect_caches, _collect_pools])
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(snapshots: List[Tuple[Optional[str], bool, Dict[str, Any]]]) -> str:
+    """Merge (worker, alive, snapshot) triples into the Prometheus text format."""
+    lines: List[str] = []
+    names: List[str] = []
+    families: Dict[str, Dict[str, Any]] = {}
+    for worker, alive, snapshot in snapshots:
+        for name, family in snapshot.items():
+            merged = families.get(name)
+            if merged is None:
+                merged = families[name] = {**family, "labels": list(family["labels"]), "series": {}}
+                if family["type"] == "gauge" and worker is not None:
+                    merged["labels"].append("worker")
+                names.append(name)
+            if family["type"] == "gauge":
+                if not alive:
+                    continue
+                for values, value in family["series"]:
+                    key = tuple(values) + ((worker,) if worker is not None else ())
+                    merged["series"][key] = value
+            elif family["type"] == "histogram":
+                if family["buckets"] != merged["buckets"]:
+                    continue  # Written by a worker running different code
+                for values, (counts, total) in family["series"]:
+                    current = merged["series"].setdefault(tuple(values), [[0] * len(counts), 0.0])
+                    current[0] = [a + b for a, b in zip(current[0], counts)]
+                    current[1] += total
+            else:
+                for values, value in family["series"]:
+                    key = tuple(values)
+                    merged["series"][key] = merged["series"].get(key, 0.0) + value
+
+    for name in names:
+        family = families[name]
+        labelnames = family["labels"]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for values, value in sorted(family["series"].items()):
+            if family["type"] == "histogram":
+                counts, total = value
+                cumulative = 0
+                for bound, n in zip(list(family["buckets"]) + [float("inf")], counts):
+                    cumulative += n
+                    le = f'le="{_number(bound)}"'
+                    lines.append(f"{name}_bucket{_labels(labelnames, values, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labelnames, values)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labelnames, values)} {cumulative}")
+            else:
+                lines.append(f"{name}{_labels(labelnames, values)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def reset_metrics_dir() -> int:
+    """Delete worker snapshots left by a previous deployment. Returns files removed."""
+    if not settings.METRICS_MULTIPROC_DIR:
+        return 0
+    removed = 0
+    for path in glob.glob(os.path.join(settings.METRICS_MULTIPROC_DIR, "*.json")):
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+class Metrics:
+    """Writes this worker's snapshot and renders scrapes."""
+
+    def __init__(self):
+        self.directory = settings.METRICS_MULTIPROC_DIR
+        self._tasks: List[asyncio.Task] = []
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Refresh mirrored metrics and return every family's current values."""
+        for collect in collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"Error collecting metrics in {collect.__name__}: {e}")
+        return {metric.name: metric.snapshot() for metric in registry}
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"{pid}.json")
+
+    def _write(self, snapshot: Dict[str, Any]):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(snapshot))
+        os.replace(tmp_path, path)
+
+    def _read_others(self) -> List[Tuple[Optional[str], bool, Dict[str, Any]]]:
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            pid = int(os.path.basename(path).split(".")[0])
+            if pid == os.getpid():
+                continue
+            try:
+                with open(path, "rb") as f:
+                    snapshots.append((str(pid), _pid_alive(pid), orjson.loads(f.read())))
+            except (OSError, orjson.JSONDecodeError) as e:
+                print(f"⚠️ Skipping metrics snapshot {path}: {e}")
+        return snapshots
+
+    async def render(self) -> str:
+        """Exposition text for a scrape: this worker, plus the others' snapshots."""
+        snapshot = self.snapshot()
+        if not self.directory:
+            return render([(None, True, snapshot)])
+        others = await asyncio.to_thread(self._read_others)
+        return render([(str(os.getpid()), True, snapshot)] + others)
+
+    async def _write_snapshots(self):
+        while True:
+            await asyncio.sleep(settings.METRICS_SNAPSHOT_INTERVAL)
+            try:
+                await asyncio.to_thread(self._write, self.snapshot())
+            except Exception as e:
+                print(f"Error writing metrics snapshot: {e}")
+
+    def start(self):
+        """With a snapshot directory, start publishing this worker's metrics."""
+        if settings.METRICS_ENABLED and self.directory and not self._tasks:
+            self._tasks.append(asyncio.create_task(self._write_snapshots()))
+
+    async def stop(self):
+        """Stop publishing and leave a final snapshot so this worker's totals outlive it."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._tasks and self.directory:
+            try:
+                self._write(self.snapshot())
+            except Exception as e:
+                print(f"Error writing metrics snapshot: {e}")
+        self._tasks = []
+
+
+# Process-wide exporter; started by the app lifespan
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """Times requests and counts bytes sent, labelled by route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        sent = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = route_template(scope)
+            HTTP_REQUEST_SECONDS.observe(scope["method"], route, f"{status // 100}xx",
+                                         value=time.perf_counter() - start)
+            HTTP_RESPONSE_BYTES.inc(route, amount=sent)
+            if status == 206:
+                HTTP_RANGE_BYTES.observe(route, value=sent)
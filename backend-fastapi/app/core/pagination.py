@@ -0,0 +1,89 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Pages are ordered newest first on ``(createdAt, id)`` and continue from an
+opaque cursor encoding the last row's sort key, so a deep page costs the same
+index range scan as the first one. Totals are optional and may be served from
+the planner's row estimate instead of a full count.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import Select, func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+COUNT_MODES = ("exact", "estimate", "none")
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    """Encode a row's sort key as an opaque URL-safe cursor."""
+    raw = f"{created_at.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(id)
+    except ValueError as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def keyset_page(query: Select, created_col: Any, id_col: Any, after: Optional[str], limit: int) -> Select:
+    """Restrict query to the page after the cursor, fetching one extra row to detect more."""
+    if after:
+        created_at, id = decode_cursor(after)
+        # Row comparison lets the planner use the (createdAt, id) index as a range
+        query = query.where(tuple_(created_col, id_col) < tuple_(created_at, id))
+    return query.order_by(created_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def split_page(rows: Sequence[Any], limit: int, key) -> Tuple[Sequence[Any], Optional[str]]:
+    """Trim the look-ahead row and return the page with the cursor for the next one."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    created_at, id = key(rows[-1])
+    return rows, encode_cursor(created_at, id)
+
+
+async def estimate_rows(db: AsyncSession, query: Select) -> Optional[int]:
+    """Planner row estimate for query without executing it (PostgreSQL only)."""
+    if db.bind is None or db.bind.dialect.name != "postgresql":
+        return None
+    try:
+        sql = query.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+        # A savepoint keeps a failed EXPLAIN from aborting the transaction
+        # the exact count falls back to
+        async with db.begin_nested():
+            result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+    except Exception as e:
+        print(f"Row estimate unavailable: {e}")
+        return None
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_rows(db: AsyncSession, query: Select, mode: str = "estimate") -> Optional[int]:
+    """Count rows matched by query: exactly, from the planner estimate, or not at all."""
+    if mode == "none":
+        return None
+    query = query.order_by(None).limit(None).offset(None)
+    if mode == "estimate":
+        estimate = await estimate_rows(db, query)
+        if estimate is not None:
+            return estimate
+    result = await db.execute(select(func.count()).select_from(query.subquery()))
+    return result.scalar()
@@ -0,0 +1,235 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when it sends ``X-Profile-Token`` matching
+``PROFILING_TOKEN``, or when it is picked by ``PROFILING_SAMPLE_RATE``. Its
+profile is a cProfile run over the request plus a breakdown of where the
+wall time went: SQL statements, ffmpeg jobs and everything else (Python
+work such as serialization). The response carries ``X-Profile-Id``; the
+profile is kept in ``PROFILING_DIR``, shared by all workers, and served by
+the ``/internal/profiles`` endpoints.
+
+cProfile hooks the event loop thread, so one request per worker is profiled
+at a time and the profile also shows other requests' work interleaved with
+it. Work in ``asyncio.to_thread`` is not in the cProfile output but is in
+the SQL and ffmpeg totals.
+"""
+
+import asyncio
+import cProfile
+import glob
+import hmac
+import io
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+import orjson
+from fastapi import Header, HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.request_context import route_template
+
+PROFILE_HEADER = "x-profile-token"
+PROFILE_ID = re.compile(r"^[0-9a-f]{16}$")
+
+
+class RequestTrace:
+    """Time a profiled request spent in SQL and ffmpeg."""
+
+    def __init__(self):
+        self.sql_ms = 0.0
+        self.statements = 0
+        self.ffmpeg_ms = 0.0
+        self.ffmpeg_jobs = 0
+
+
+# Set only while a profiled request is being served
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def trace_query(elapsed_ms: float):
+    """Add a statement's time to the profiled request, if there is one."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.sql_ms += elapsed_ms
+        trace.statements += 1
+
+
+def trace_ffmpeg(elapsed_ms: float):
+    """Add an ffmpeg job's time to the profiled request, if there is one."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.ffmpeg_ms += elapsed_ms
+        trace.ffmpeg_jobs += 1
+
+
+class Profiler:
+    """Chooses requests to profile and stores their profiles."""
+
+    def __init__(self):
+        self.directory = settings.PROFILING_DIR
+        self.active = False
+        self.profiled = 0
+        self.skipped = 0  # Wanted while another profile was running
+
+    def wanted(self, scope: Scope) -> Optional[str]:
+        """Why this request should be profiled ("header" or "sample"), or None."""
+        if scope["path"].startswith("/internal/"):
+            return None
+        if settings.PROFILING_TOKEN:
+            for name, value in scope.get("headers", ()):
+                if name == PROFILE_HEADER.encode():
+                    if hmac.compare_digest(value, settings.PROFILING_TOKEN.encode()):
+                        return "header"
+                    break
+        if settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    def _path(self, profile_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}{suffix}")
+
+    def _save(self, profile_id: str, profile: cProfile.Profile, summary: Dict[str, Any]):
+        os.makedirs(self.directory, exist_ok=True)
+        text = io.StringIO()
+        pstats.Stats(profile, stream=text).sort_stats("cumulative").print_stats(settings.PROFILING_TOP_FUNCTIONS)
+        profile.dump_stats(self._path(profile_id, ".prof"))
+        with open(self._path(profile_id, ".json"), "wb") as f:
+            f.write(orjson.dumps({**summary, "top_functions": text.getvalue()}))
+        self._prune()
+
+    def _prune(self):
+        summaries = sorted(glob.glob(os.path.join(self.directory, "*.json")), key=os.path.getmtime)
+        for path in summaries[:-settings.PROFILING_MAX_PROFILES or None]:
+            for stale in (path, path[:-len(".json")] + ".prof"):
+                try:
+                    os.unlink(stale)
+                except FileNotFoundError:
+                    pass
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Stored profile summaries, newest first."""
+        profiles = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path, "rb") as f:
+                    summary = orjson.loads(f.read())
+            except (OSError, orjson.JSONDecodeError):
+                continue
+            summary.pop("top_functions", None)
+            profiles.append(summary)
+        return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """One profile's summary including its top functions."""
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, ".json"), "rb") as f:
+                return orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+
+    def pstats_path(self, profile_id: str) -> Optional[str]:
+        """Path of the raw cProfile dump, loadable with pstats or snakeviz."""
+        if not PROFILE_ID.match(profile_id):
+            return None
+        path = self._path(profile_id, ".prof")
+        return path if os.path.exists(path) else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "token_enabled": bool(settings.PROFILING_TOKEN),
+            "sample_rate": settings.PROFILING_SAMPLE_RATE,
+            "active": self.active,
+            "profiled": self.profiled,
+            "skipped": self.skipped,
+        }
+
+
+# Process-wide profiler
+profiler = Profiler()
+
+
+def require_profiling_token(x_profile_token: Optional[str] = Header(None)):
+    """Dependency guarding the profile endpoints with PROFILING_TOKEN."""
+    if not settings.PROFILING_TOKEN:
+        raise HTTPException(status_code=403, detail="Set PROFILING_TOKEN to read profiles")
+    if x_profile_token is None or not hmac.compare_digest(x_profile_token, settings.PROFILING_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+
+class ProfilingMiddleware:
+    """Profiles the requests Profiler.wanted picks and tags their responses."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = profiler.wanted(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        if profiler.active:
+            profiler.skipped += 1
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:16]
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        trace = RequestTrace()
+        token = current_trace.set(trace)
+        profile = cProfile.Profile()
+        profiler.active = True
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.disable()
+            duration_ms = (time.perf_counter() - start) * 1000
+            profiler.active = False
+            profiler.profiled += 1
+            current_trace.reset(token)
+            summary = {
+                "id": profile_id,
+                "created_at": time.time(),
+                "trigger": trigger,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route_template(scope),
+                "status": status,
+                "worker": os.getpid(),
+                "duration_ms": round(duration_ms, 3),
+                "sql_ms": round(trace.sql_ms, 3),
+                "statements": trace.statements,
+                "ffmpeg_ms": round(trace.ffmpeg_ms, 3),
+                "ffmpeg_jobs": trace.ffmpeg_jobs,
+                # Serialization and other Python work; negative when ffmpeg ran in threads concurrently
+                "other_ms": round(duration_ms - trace.sql_ms - trace.ffmpeg_ms, 3),
+            }
+            try:
+                await asyncio.to_thread(profiler._save, profile_id, profile, summary)
+            except Exception as e:
+                print(f"Error saving profile {profile_id}: {e}")
+            print(f"🔬 Profiled {scope['method']} {summary['route']} in {duration_ms:.1f} ms "
+                  f"(sql {trace.sql_ms:.1f} ms, ffmpeg {trace.ffmpeg_ms:.1f} ms): {profile_id}")
@@ -0,0 +1,59 @@
+"""
+The request being served, for code far from the endpoint.
+
+``RequestContextMiddleware`` records the ASGI scope in a context variable,
+so database events, ffmpeg jobs and logs can name the route they ran for.
+Routes are named by path template (``/api/v1/videos/{video_id}``), never by
+the raw path.
+"""
+
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+current_scope: ContextVar[Optional[Scope]] = ContextVar("current_scope", default=None)
+
+# id(endpoint) -> path template
+_templates: Dict[int, str] = {}
+
+
+def route_template(scope: Scope) -> str:
+    """Path template of the route the router matched, or "unmatched"."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    template = _templates.get(id(endpoint))
+    if template is None:
+        for route in getattr(scope.get("app"), "routes", ()):
+            # Mounts (static files) expose the mounted app as their endpoint
+            if getattr(route, "endpoint", None) is endpoint or getattr(route, "app", None) is endpoint:
+                template = route.path or "/"
+                break
+        else:
+            template = "unmatched"
+        _templates[id(endpoint)] = template
+    return template
+
+
+def current_route() -> Optional[str]:
+    """Route template of the request being served, if any."""
+    scope = current_scope.get()
+    return route_template(scope) if scope is not None else None
+
+
+class RequestContextMiddleware:
+    """Makes the request scope available through ``current_scope``."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(token)
@@ -0,0 +1,230 @@
+"""
+Tag-invalidated result cache for GraphQL query responses.
+
+Entries are stored with the entity tags their resolvers touched (a video, a
+video's annotations or chunks, the video listing). Writes invalidate exactly
+the tags they change. The default backend is an in-process LRU; set
+``GRAPHQL_CACHE_BACKEND=redis`` to share entries between workers.
+
+``invalidate`` is also the entry point for every other per-worker cache: it
+goes through the invalidation bus, which applies the tags locally and
+forwards them to the other workers.
+"""
+
+import time
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Set
+
+import orjson
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.invalidation import invalidation_bus
+
+# Any change to the set of videos (create, delete) affects every listing
+VIDEO_LIST_TAG = "videos"
+
+
+def video_tag(video_id: Any) -> str:
+    return f"video:{video_id}"
+
+
+def annotations_tag(video_id: Any) -> str:
+    return f"annotations:{video_id}"
+
+
+def chunks_tag(video_id: Any) -> str:
+    return f"chunks:{video_id}"
+
+
+def hls_tag(video_id: Any) -> str:
+    return f"hls:{video_id}"
+
+
+def atlas_tag(video_id: Any) -> str:
+    return f"atlas:{video_id}"
+
+
+def tagged_ids(tags: Iterable[str], kind: str) -> Set[str]:
+    """Ids named by tags of one kind, e.g. the video ids of every ``chunks:`` tag."""
+    prefix = f"{kind}:"
+    return {tag[len(prefix):] for tag in tags if tag.startswith(prefix)}
+
+
+class MemoryResultCache:
+    """In-process result cache; entries are private to each worker."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = LRUCache("graphql_results", max_entries=max_entries)
+        self._tags: Dict[str, Set[str]] = defaultdict(set)
+        self._generation = 0
+        self._invalidated_at = 0.0
+
+    async def generation(self) -> int:
+        return self._generation
+
+    async def invalidated_at(self) -> float:
+        return self._invalidated_at
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        data, expires_at = entry
+        if expires_at < time.monotonic():
+            self._entries.delete(key)
+            return None
+        return data
+
+    async def set(self, key: str, data: Any, tags: Iterable[str], generation: int):
+        # A write landed while this result was being built; it may be stale
+        if generation != self._generation:
+            return
+        self._entries.set(key, (data, time.monotonic() + self.ttl))
+        for tag in tags:
+            self._tags[tag].add(key)
+        if len(self._tags) > 4 * self.max_entries:
+            self._prune()
+
+    def _prune(self):
+        # Drop references to entries the LRU has already evicted
+        for tag in list(self._tags):
+            live = {key for key in self._tags[tag] if key in self._entries}
+            if live:
+                self._tags[tag] = live
+            else:
+                del self._tags[tag]
+
+    async def invalidate(self, tags: Iterable[str]):
+        self._generation += 1
+        self._invalidated_at = time.time()
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self._entries.delete(key)
+
+    async def clear(self):
+        self._generation += 1
+        self._invalidated_at = time.time()
+        self._entries.clear()
+        self._tags.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._entries.stats(), "backend": "memory", "tags": len(self._tags)}
+
+
+class RedisResultCache:
+    """Result cache shared by all workers through Redis."""
+
+    def __init__(self, url: str, ttl: float, prefix: str = "gql"):
+        import redis.asyncio as redis  # Optional dependency, only needed for this backend
+
+        self._redis = redis.from_url(url)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, kind: str, name: Any) -> str:
+        return f"{self.prefix}:{kind}:{name}"
+
+    async def generation(self) -> int:
+        try:
+            return int(await self._redis.get(self._key("meta", "generation")) or 0)
+        except Exception as e:
+            self.errors += 1
+            print(f"GraphQL cache unavailable: {e}")
+            return -1
+
+    async def invalidated_at(self) -> float:
+        try:
+            return float(await self._redis.get(self._key("meta", "invalidated_at")) or 0)
+        except Exception as e:
+            self.errors += 1
+            print(f"GraphQL cache unavailable: {e}")
+            return time.time()
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = await self._redis.get(self._key("result", key))
+        except Exception as e:
+            self.errors += 1
+            print(f"GraphQL cache unavailable: {e}")
+            return None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return orjson.loads(raw)
+
+    async def set(self, key: str, data: Any, tags: Iterable[str], generation: int):
+        if generation < 0 or await self.generation() != generation:
+            return
+        result_key = self._key("result", key)
+        try:
+            pipe = self._redis.pipeline()
+            pipe.set(result_key, orjson.dumps(data), ex=self.ttl)
+            for tag in tags:
+                tag_key = self._key("tag", tag)
+                pipe.sadd(tag_key, result_key)
+                pipe.expire(tag_key, self.ttl)
+            await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            print(f"Error storing GraphQL result: {e}")
+
+    async def invalidate(self, tags: Iterable[str]):
+        tag_keys = [self._key("tag", tag) for tag in tags]
+        try:
+            await self._redis.incr(self._key("meta", "generation"))
+            await self._redis.set(self._key("meta", "invalidated_at"), time.time())
+            if not tag_keys:
+                return
+            pipe = self._redis.pipeline()
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            members = await pipe.execute()
+            doomed = set(tag_keys)
+            for keys in members:
+                doomed.update(keys)
+            await self._redis.delete(*doomed)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error invalidating GraphQL results: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+def _build_result_cache():
+    if settings.GRAPHQL_CACHE_BACKEND == "redis":
+        try:
+            return RedisResultCache(settings.REDIS_URL, settings.GRAPHQL_CACHE_TTL)
+        except ImportError:
+            print("⚠️ redis is not installed; falling back to the in-process GraphQL cache")
+    return MemoryResultCache(settings.GRAPHQL_CACHE_MAX_ENTRIES, settings.GRAPHQL_CACHE_TTL)
+
+
+result_cache = _build_result_cache()
+
+
+# Redis entries are shared, so only the writing worker needs to drop them
+@invalidation_bus.subscribe(remote=isinstance(result_cache, MemoryResultCache))
+async def _invalidate_results(tags: Optional[FrozenSet[str]]):
+    if not settings.GRAPHQL_CACHE_ENABLED:
+        return
+    if tags is None:
+        await result_cache.clear()  # Only sent to workers, so always the memory backend
+    else:
+        await result_cache.invalidate(tags)
+
+
+async def invalidate(*tags: str):
+    """Invalidate cached data that depends on any of the tags, in every worker.
+
+    Call after the commit that made the change.
+    """
+    if tags:
+        await invalidation_bus.publish(tags)
@@ -0,0 +1,464 @@
+"""
+Cross-process cache tier backed by memory-mapped slab files.
+
+With several worker processes, per-process LRU caches would hold N copies of
+the same preview JPEGs, segments and playlists. A SharedCache keeps one copy
+per host instead: each cache maps a file under ``SHARED_CACHE_DIR``
+(``/dev/shm`` by default) laid out as
+
+    header | index slots | data area
+
+The index is an open-addressing hash table of fixed-size slots (key digest,
+group hash, record offset and length). Records are appended to the data area
+as a ring: ``head`` is a logical offset that only grows and a record lives at
+``start % data_size``. A record is intact while ``head - start <= data_size``;
+once the writer has come round again its slot simply reads as free. Eviction
+is therefore FIFO by insertion, which suits media that is written once and
+read many times.
+
+The header also counts live entries and their bytes, so ``stats()`` never
+scans the index. Each record is prefixed with the slot that owns it; before
+a write overwrites the oldest records, ``tail`` walks over them and uncounts
+the ones their slot still points at.
+
+Writers hold an exclusive ``flock`` on the file, readers a shared one, and a
+thread lock covers threads inside a worker (they share one open file, so
+flock alone does not exclude them). Values are stored as raw bytes, UTF-8
+text or pickles; the files are private to the service user, so only this
+application ever writes what gets unpickled.
+
+Every worker on the host receives the same invalidation bus messages, but a
+slab only needs changing once. While the bus applies a message that already
+reached this host's slabs, ``applied_on_host`` is set and
+``invalidate_group``/``clear`` leave the slab alone.
+"""
+
+import fcntl
+import glob
+import hashlib
+import mmap
+import os
+import pickle
+import socket
+import struct
+import tempfile
+import threading
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from app.core.config import settings
+
+MAGIC = b"VPSC"
+VERSION = 2
+
+# magic, version, n_slots, data_size, head, sets, evictions, tail, entries, bytes
+HEADER = struct.Struct("<4sIIQQQQQQQ")
+HEADER_SIZE = 128
+# key digest, group hash, logical start, record length (0 = free)
+SLOT = struct.Struct("<16s8sQI")
+# Prefix of each record in the data area: owning slot, record length
+RECORD = struct.Struct("<II")
+PAD_SLOT = 0xFFFFFFFF  # Marks the unused end of the data area before a wrap
+HEAD_OFFSET = struct.calcsize("<4sIIQ")
+SETS_OFFSET = HEAD_OFFSET + 8
+EVICTIONS_OFFSET = SETS_OFFSET + 8
+TAIL_OFFSET = EVICTIONS_OFFSET + 8
+COUNTS = struct.Struct("<QQQ")  # tail, entries, bytes
+
+NEVER_USED = bytes(16)
+TOMBSTONE = b"\xff" * 16
+PROBE_LIMIT = 16
+
+KIND_BYTES, KIND_TEXT, KIND_PICKLE = 0, 1, 2
+
+# Set by the invalidation bus while it applies a change another worker made to these slabs
+applied_on_host: ContextVar[bool] = ContextVar("applied_on_host", default=False)
+
+
+def _cache_dir() -> str:
+    directory = settings.SHARED_CACHE_DIR
+    return directory if os.path.isdir(directory) else tempfile.gettempdir()
+
+
+def slab_path(name: str) -> str:
+    """Slab file for a named cache."""
+    return os.path.join(_cache_dir(), f"{settings.SHARED_CACHE_PREFIX}-{name}.slab")
+
+
+def reset_shared_caches() -> int:
+    """Delete every slab file; run once before workers start. Returns files removed."""
+    removed = 0
+    for path in glob.glob(os.path.join(_cache_dir(), f"{settings.SHARED_CACHE_PREFIX}-*.slab")):
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def slab_identity() -> Optional[str]:
+    """Id shared by every process that maps the same slab files, or None if unreadable."""
+    path = os.path.join(_cache_dir(), f"{settings.SHARED_CACHE_PREFIX}.id")
+    try:
+        if not os.path.exists(path):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(uuid.uuid4().hex)
+            try:
+                os.link(tmp, path)  # Atomic; the first process to get here wins
+            except FileExistsError:
+                pass
+            finally:
+                os.unlink(tmp)
+        with open(path) as f:
+            token = f.read().strip()
+    except OSError:
+        return None
+    return f"{socket.gethostname()}:{token}" if token else None
+
+
+def _digest(key: Hashable) -> bytes:
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).digest()
+
+
+def _group(key: Hashable) -> bytes:
+    """Hash of the key's first element, which callers use as the video id."""
+    first = key[0] if isinstance(key, tuple) and key else key
+    return hashlib.blake2b(repr(first).encode(), digest_size=8).digest()
+
+
+class SharedCache:
+    """Host-wide cache with the LRUCache interface; FIFO eviction within a byte budget.
+
+    If the slab cannot be created (no space in ``SHARED_CACHE_DIR``, for
+    example) the cache falls back to a per-process LRUCache and says so.
+    """
+
+    def __init__(self, name: str, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.name = name
+        self.path = slab_path(name)
+        self.n_slots = 1 << max(4, (2 * max_entries - 1).bit_length())  # Load factor <= 0.5
+        self.data_size = max_bytes
+        self.max_item_bytes = min(settings.SHARED_CACHE_MAX_ITEM_BYTES, max_bytes // 8)
+        self.data_offset = HEADER_SIZE + self.n_slots * SLOT.size
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        self._fallback = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # Caused by this worker's sets; the header counts host-wide ones
+
+    def _open_slab(self) -> int:
+        """Open the slab file with this cache's layout, creating or replacing it as needed."""
+        size = self.data_offset + self.data_size
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            ready = False
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    if os.fstat(fd).st_ino != os.stat(self.path).st_ino:
+                        continue  # Replaced by another process while we waited
+                except FileNotFoundError:
+                    continue
+                header = os.pread(fd, HEADER.size, 0)
+                if (
+                    len(header) == HEADER.size
+                    and HEADER.unpack(header)[:4] == (MAGIC, VERSION, self.n_slots, self.data_size)
+                    and os.fstat(fd).st_size == size
+                ):
+                    ready = True
+                elif os.fstat(fd).st_size == 0:
+                    # Reserve the pages now so a full tmpfs fails here rather than
+                    # with SIGBUS on a later write through the mapping
+                    if hasattr(os, "posix_fallocate"):
+                        os.posix_fallocate(fd, 0, size)
+                    else:
+                        os.ftruncate(fd, size)
+                    os.pwrite(fd, HEADER.pack(MAGIC, VERSION, self.n_slots, self.data_size, 0, 0, 0, 0, 0, 0), 0)
+                    ready = True
+                else:
+                    # Different layout (settings changed): processes still mapping
+                    # the old file keep their inode, so never truncate it in place
+                    os.unlink(self.path)
+            finally:
+                if ready:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    os.close(fd)
+            if ready:
+                return fd
+
+    def _attach(self) -> bool:
+        """Map the slab file in this process. Caller holds _lock."""
+        if self._pid == os.getpid():
+            return self._fallback is None
+        # First use in this process (or after a fork): never reuse an inherited fd,
+        # since flock is shared between processes that share the open file
+        self._pid = os.getpid()
+        self._fd = self._map = self._fallback = None
+        try:
+            fd = self._open_slab()
+        except OSError as e:
+            from app.core.cache import LRUCache
+            print(f"⚠️ Shared cache {self.name} unavailable ({e}); using a per-process cache")
+            self._fallback = LRUCache(self.name, max_entries=self.n_slots // 2, max_bytes=self.data_size)
+            return False
+        self._map = mmap.mmap(fd, self.data_offset + self.data_size)
+        self._fd = fd
+        return True
+
+    def _head(self) -> int:
+        return struct.unpack_from("<Q", self._map, HEAD_OFFSET)[0]
+
+    def _slot(self, index: int) -> Tuple[bytes, bytes, int, int]:
+        return SLOT.unpack_from(self._map, HEADER_SIZE + index * SLOT.size)
+
+    def _write_slot(self, index: int, digest: bytes, group: bytes, start: int, length: int):
+        SLOT.pack_into(self._map, HEADER_SIZE + index * SLOT.size, digest, group, start, length)
+
+    def _live(self, start: int, length: int, head: int) -> bool:
+        return length > 0 and head - start <= self.data_size
+
+    def _count(self, entries: int, used: int):
+        """Adjust the live entry and byte counters. Caller holds the exclusive lock."""
+        tail, old_entries, old_used = COUNTS.unpack_from(self._map, TAIL_OFFSET)
+        COUNTS.pack_into(self._map, TAIL_OFFSET, tail, old_entries + entries, old_used + used)
+
+    def _release(self, index: int, head: int):
+        """Empty a slot, uncounting its record if that is still live."""
+        _, _, start, length = self._slot(index)
+        if self._live(start, length, head):
+            self._count(-1, -length)
+        self._write_slot(index, TOMBSTONE, bytes(8), 0, 0)
+
+    def _expire(self, head: int, end: int):
+        """Uncount the records a write reaching logical offset end will overwrite."""
+        tail, entries, used = COUNTS.unpack_from(self._map, TAIL_OFFSET)
+        while tail < end - self.data_size and tail < head:
+            gap = self.data_size - tail % self.data_size
+            if gap < RECORD.size:
+                tail += gap  # Too short for a pad marker
+                continue
+            index, length = RECORD.unpack_from(self._map, self.data_offset + tail % self.data_size)
+            if index < self.n_slots:
+                _, _, start, slot_length = self._slot(index)
+                if start == tail and slot_length:
+                    entries -= 1
+                    used -= slot_length
+            elif index != PAD_SLOT:
+                tail = head  # Unreadable; nothing older is counted any more
+                break
+            tail += RECORD.size + length
+        COUNTS.pack_into(self._map, TAIL_OFFSET, tail, entries, used)
+
+    def _probe(self, digest: bytes):
+        first = int.from_bytes(digest[:8], "little") % self.n_slots
+        for i in range(PROBE_LIMIT):
+            yield (first + i) % self.n_slots
+
+    def _find(self, digest: bytes) -> Optional[int]:
+        for index in self._probe(digest):
+            slot_digest = self._slot(index)[0]
+            if slot_digest == digest:
+                return index
+            if slot_digest == NEVER_USED:
+                return None
+        return None
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes([KIND_BYTES]) + bytes(value)
+        if isinstance(value, str):
+            return bytes([KIND_TEXT]) + value.encode()
+        return bytes([KIND_PICKLE]) + pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(record: bytes) -> Any:
+        kind, payload = record[0], record[1:]
+        if kind == KIND_BYTES:
+            return payload
+        if kind == KIND_TEXT:
+            return payload.decode()
+        return pickle.loads(payload)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key (a copy), or default."""
+        digest = _digest(key)
+        with self._lock:
+            if not self._attach():
+                return self._fallback.get(key, default)
+            fcntl.flock(self._fd, fcntl.LOCK_SH)
+            try:
+                index = self._find(digest)
+                record = None
+                if index is not None:
+                    _, _, start, length = self._slot(index)
+                    if self._live(start, length, self._head()):
+                        offset = self.data_offset + start % self.data_size + RECORD.size
+                        record = self._map[offset:offset + length]
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        if record is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return self._decode(record)
+
+    def set(self, key: Hashable, value: Any, size: Optional[int] = None) -> None:
+        """Store value under key; values over the per-item limit are not cached."""
+        self._store(key, value, size, replace=True)
+
+    def add(self, key: Hashable, value: Any) -> bool:
+        """Store value only if key is absent, atomically across processes. Returns True if stored."""
+        return self._store(key, value, None, replace=False)
+
+    def _store(self, key: Hashable, value: Any, size: Optional[int], replace: bool) -> bool:
+        record = self._encode(value)
+        if len(record) > self.max_item_bytes:
+            return False
+        digest, group = _digest(key), _group(key)
+        with self._lock:
+            if not self._attach():
+                if not replace and key in self._fallback:
+                    return False
+                self._fallback.set(key, value, size)
+                return True
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                head = self._head()
+                # Pick the slot: this key's own, else the first free one in the
+                # probe window, else the window's oldest record
+                target = free = oldest = None
+                for index in self._probe(digest):
+                    slot_digest, _, start, length = self._slot(index)
+                    if slot_digest == digest:
+                        if not replace and self._live(start, length, head):
+                            return False
+                        target = index
+                        break
+                    if slot_digest == NEVER_USED:
+                        free = index if free is None else free
+                        break
+                    if not self._live(start, length, head):
+                        free = index if free is None else free
+                    elif oldest is None or start < self._slot(oldest)[2]:
+                        oldest = index
+                if target is None:
+                    target = free
+                if target is None:
+                    target = oldest
+                    self.evictions += 1
+                    struct.pack_into("<Q", self._map, EVICTIONS_OFFSET,
+                                     struct.unpack_from("<Q", self._map, EVICTIONS_OFFSET)[0] + 1)
+                self._release(target, head)
+
+                # Records never straddle the end of the data area
+                start = head
+                gap = self.data_size - start % self.data_size
+                if RECORD.size + len(record) > gap:
+                    start += gap
+                end = start + RECORD.size + len(record)
+                self._expire(head, end)
+                if start != head and gap >= RECORD.size:
+                    RECORD.pack_into(self._map, self.data_offset + head % self.data_size,
+                                     PAD_SLOT, gap - RECORD.size)
+                offset = self.data_offset + start % self.data_size
+                RECORD.pack_into(self._map, offset, target, len(record))
+                self._map[offset + RECORD.size:offset + RECORD.size + len(record)] = record
+                self._write_slot(target, digest, group, start, len(record))
+                struct.pack_into("<QQ", self._map, HEAD_OFFSET, end,
+                                 struct.unpack_from("<Q", self._map, SETS_OFFSET)[0] + 1)
+                self._count(1, len(record))
+                return True
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def delete(self, key: Hashable) -> bool:
+        """Remove a single key. Returns True if it was present."""
+        digest = _digest(key)
+        with self._lock:
+            if not self._attach():
+                return self._fallback.delete(key)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                index = self._find(digest)
+                if index is None:
+                    return False
+                _, _, start, length = self._slot(index)
+                self._release(index, self._head())
+                return self._live(start, length, self._head())
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def invalidate_group(self, group: Any) -> int:
+        """Remove every key whose first element is group. Scans the whole index."""
+        group_hash = _group((group,))
+        with self._lock:
+            if not self._attach():
+                return self._fallback.invalidate_group(group)
+            if applied_on_host.get():
+                return 0
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                removed = 0
+                head = self._head()
+                for index in range(self.n_slots):
+                    slot_digest, slot_group, _, length = self._slot(index)
+                    if length and slot_group == group_hash:
+                        self._release(index, head)
+                        removed += 1
+                return removed
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def clear(self) -> None:
+        """Drop all entries in every process."""
+        with self._lock:
+            if not self._attach():
+                self._fallback.clear()
+                return
+            if applied_on_host.get():
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                self._map[HEADER_SIZE:self.data_offset] = bytes(self.data_offset - HEADER_SIZE)
+                COUNTS.pack_into(self._map, TAIL_OFFSET, self._head(), 0, 0)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def __contains__(self, key: Hashable) -> bool:
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def __len__(self) -> int:
+        return self.stats()["entries"]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return occupancy (host-wide) and hit/miss counters (this worker)."""
+        with self._lock:
+            if not self._attach():
+                return {**self._fallback.stats(), "backend": "process"}
+            fcntl.flock(self._fd, fcntl.LOCK_SH)
+            try:
+                _, _, _, _, head, sets, evictions, _, entries, used = HEADER.unpack_from(self._map, 0)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return {
+            "name": self.name,
+            "backend": "shared",
+            "entries": entries,
+            "bytes": used,
+            "capacity_bytes": self.data_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": sets,
+            "evictions": evictions,
+            "worker_evictions": self.evictions,
+            "wrapped": head // self.data_size,
+        }
@@ -0,0 +1,73 @@
+"""
+Per-request GraphQL context
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import AsyncIterator, Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from strawberry.dataloader import DataLoader
+from strawberry.fastapi import BaseContext
+
+from app.core.database import ReplicaSessionLocal, recently_wrote, session_factory
+from app.graphql.loaders import load_annotations, load_chunks
+
+
+class GraphQLContext(BaseContext):
+    """Request-scoped state shared by all resolvers of one GraphQL request
+
+    Holds a single lazily-opened database session (the unit of work for the
+    request; a replica session for queries) and the DataLoaders that read
+    through it.
+    """
+
+    def __init__(self, session: Optional[AsyncSession] = None):
+        super().__init__()
+        # A session passed in is borrowed and left open by close()
+        self._session: Optional[AsyncSession] = session
+        self._owns_session = session is None
+        # Sibling root fields resolve concurrently, but a session is not
+        # safe for concurrent use, so access is serialized
+        self._session_lock = asyncio.Lock()
+        # Set per operation by ReadReplicaExtension; queries may read from a replica
+        self.read_only = False
+        self.used_replica = False
+        # Entity tags read by this request, for the result cache
+        self.cache_tags: Set[str] = set()
+        self.annotations_loader = DataLoader(load_fn=partial(load_annotations, self))
+        self.chunks_loader = DataLoader(load_fn=partial(load_chunks, self))
+
+    @asynccontextmanager
+    async def db(self) -> AsyncIterator[AsyncSession]:
+        """Exclusive access to the request's session, opening it on first use"""
+        async with self._session_lock:
+            if self._session is None:
+                factory = session_factory(self.read_only and not recently_wrote(self.request))
+                self.used_replica = factory is ReplicaSessionLocal
+                self._session = factory()
+            yield self._session
+
+    def tag(self, *tags: str):
+        """Record entities the response depends on"""
+        self.cache_tags.update(tags)
+
+    def forget_annotations(self, video_id):
+        """Drop a video's cached annotations after a write in this request"""
+        if self.annotations_loader.cache_map.get(video_id) is not None:
+            self.annotations_loader.clear(video_id)
+
+    async def close(self):
+        """Release the session and its pooled connection"""
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+            self._session = None
+
+
+async def get_context() -> AsyncIterator[GraphQLContext]:
+    """Build a fresh context per request and close its session after the response"""
+    context = GraphQLContext()
+    try:
+        yield context
+    finally:
+        await context.close()
@@ -0,0 +1,88 @@
+"""
+Strawberry schema extensions
+"""
+import hashlib
+import json
+import time
+from functools import lru_cache
+from typing import Iterator
+
+from graphql import ExecutionResult as GraphQLExecutionResult, print_ast
+from strawberry.extensions import SchemaExtension
+from strawberry.schema.execute import parse_document
+from strawberry.types.graphql import OperationType
+
+from app.core.config import settings
+from app.core.database import stick_to_primary
+from app.core.result_cache import result_cache
+
+
+@lru_cache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+def _normalized_query(query: str) -> str:
+    # Printing the AST drops whitespace and comment differences
+    return print_ast(parse_document(query))
+
+
+def result_cache_key(query, variables, operation_name) -> str:
+    """Key on the normalized query so formatting differences share an entry"""
+    payload = json.dumps(
+        [_normalized_query(query), variables or {}, operation_name],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCacheExtension(SchemaExtension):
+    """Serves repeated queries from the tag-invalidated result cache
+
+    Resolvers record the entities they read on the context (see
+    GraphQLContext.tag); only error-free query results are stored.
+    """
+
+    async def on_execute(self):
+        execution_context = self.execution_context
+        context = execution_context.context
+        if (
+            not settings.GRAPHQL_CACHE_ENABLED
+            or execution_context.operation_type != OperationType.QUERY
+            or not hasattr(context, "cache_tags")
+        ):
+            yield
+            return
+
+        key = result_cache_key(
+            execution_context.query,
+            execution_context.variables,
+            execution_context.operation_name,
+        )
+        cached = await result_cache.get(key)
+        if cached is not None:
+            # Setting the result skips execution entirely
+            execution_context.result = GraphQLExecutionResult(data=cached, errors=None)
+            yield
+            return
+
+        generation = await result_cache.generation()
+        yield
+        result = execution_context.result
+        if result is None or result.errors or result.data is None:
+            return
+        if getattr(context, "used_replica", False):
+            # A lagging replica may not show a write invalidated moments ago
+            if time.time() - await result_cache.invalidated_at() < settings.REPLICA_MAX_LAG:
+                return
+        await result_cache.set(key, result.data, context.cache_tags, generation)
+
+
+class ReadReplicaExtension(SchemaExtension):
+    """Lets queries read from the replica; mutations pin the client to the primary"""
+
+    def on_execute(self) -> Iterator[None]:
+        context = self.execution_context.context
+        if hasattr(context, "read_only"):
+            operation_type = self.execution_context.operation_type
+            context.read_only = operation_type == OperationType.QUERY
+            if operation_type == OperationType.MUTATION:
+                stick_to_primary(context.response)
+        yield
@@ -0,0 +1,50 @@
+"""
+GraphQL DataLoaders batching child rows by video id
+"""
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, List
+from uuid import UUID
+
+from sqlalchemy import select
+
+from app.core.result_cache import annotations_tag, chunks_tag
+from app.graphql.projection import annotation_projection, chunk_projection
+from app.graphql.types import Annotation, VideoChunk
+
+if TYPE_CHECKING:
+    from app.graphql.context import GraphQLContext
+
+
+async def load_annotations(context: "GraphQLContext", video_ids: List[UUID]) -> List[List[Annotation]]:
+    """Load active annotations for a batch of videos in one query"""
+    table = annotation_projection.table
+    context.tag(*(annotations_tag(video_id) for video_id in video_ids))
+    async with context.db() as db:
+        result = await db.execute(
+            select(*annotation_projection.columns())
+            .where(table.c.videoId.in_(video_ids))
+            .where(table.c.isActive == True)
+        )
+        rows = result.mappings().all()
+    by_video: Dict[UUID, List[Annotation]] = defaultdict(list)
+    for row in rows:
+        by_video[row["videoId"]].append(annotation_projection.build(row))
+    return [by_video.get(video_id, []) for video_id in video_ids]
+
+
+async def load_chunks(context: "GraphQLContext", video_ids: List[UUID]) -> List[List[VideoChunk]]:
+    """Load active chunks for a batch of videos in one query"""
+    table = chunk_projection.table
+    context.tag(*(chunks_tag(video_id) for video_id in video_ids))
+    async with context.db() as db:
+        result = await db.execute(
+            select(*chunk_projection.columns())
+            .where(table.c.video_id.in_(video_ids))
+            .where(table.c.isActive == True)
+            .order_by(table.c.video_id, table.c.chunk_index)
+        )
+        rows = result.mappings().all()
+    by_video: Dict[UUID, List[VideoChunk]] = defaultdict(list)
+    for row in rows:
+        by_video[row["video_id"]].append(chunk_projection.build(row))
+    return [by_video.get(video_id, []) for video_id in video_ids]
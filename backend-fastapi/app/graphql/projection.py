@@ -0,0 +1,178 @@
+"""
+Column projection driven by the GraphQL selection set
+"""
+import dataclasses
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Type
+from uuid import UUID
+
+from sqlalchemy import Column, Table
+from strawberry.types import Info
+from strawberry.types.nodes import FragmentSpread, InlineFragment, SelectedField
+from strawberry.utils.str_converters import to_camel_case
+
+from app.models.annotation import Annotation as AnnotationModel
+from app.models.video import Video as VideoModel
+from app.models.video_chunk import VideoChunk as VideoChunkModel
+from app.graphql.types import Annotation, Video, VideoChunk
+
+
+def _collect_names(selections: Iterable[Any], names: Set[str]) -> None:
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            names.add(selection.name)
+        elif isinstance(selection, (FragmentSpread, InlineFragment)):
+            _collect_names(selection.selections, names)
+
+
+def _descend(selections: Iterable[Any], name: str) -> List[Any]:
+    found: List[Any] = []
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            if selection.name == name:
+                found.extend(selection.selections)
+        elif isinstance(selection, (FragmentSpread, InlineFragment)):
+            found.extend(_descend(selection.selections, name))
+    return found
+
+
+def selected_field_names(info: Info, path: Tuple[str, ...] = ()) -> Set[str]:
+    """GraphQL names of the fields selected below the field being resolved
+
+    `path` descends through nested selections first, e.g. ("edges", "node")
+    for the nodes of a connection.
+    """
+    selections: List[Any] = []
+    for field in info.selected_fields:
+        selections.extend(field.selections)
+    for name in path:
+        selections = _descend(selections, name)
+    names: Set[str] = set()
+    _collect_names(selections, names)
+    return names
+
+
+class Projection:
+    """Maps a Strawberry output type onto the table columns it is built from"""
+
+    def __init__(
+        self,
+        table: Table,
+        output_type: Type,
+        columns: Dict[str, str],
+        dependencies: Optional[Dict[str, Tuple[str, ...]]] = None,
+        defaults: Optional[Dict[str, Any]] = None,
+        always: Tuple[str, ...] = ("id",),
+    ):
+        self.table = table
+        self.output_type = output_type
+        self.defaults = defaults or {}
+        self.always = always
+        self.init_fields = [f.name for f in dataclasses.fields(output_type) if f.init]
+
+        # GraphQL field name -> columns needed to resolve it
+        self.graphql_columns: Dict[str, Tuple[str, ...]] = {}
+        for field in output_type.__strawberry_definition__.fields:
+            graphql_name = field.graphql_name or to_camel_case(field.python_name)
+            needed = (columns[field.python_name],) if field.python_name in columns else ()
+            needed += (dependencies or {}).get(field.python_name, ())
+            self.graphql_columns[graphql_name] = needed
+
+        # Column key -> Python attribute on the output type
+        self.column_fields = {column: field for field, column in columns.items()}
+
+    def columns(self, names: Optional[Set[str]] = None) -> List[Column]:
+        """Columns needed for the given GraphQL field names (all columns if None)"""
+        if names is None:
+            wanted = set(self.column_fields)
+        else:
+            wanted = set(self.always)
+            for name in names:
+                wanted.update(self.graphql_columns.get(name, ()))
+        # Table order keeps the SQL text stable, so compiled/prepared statements are reused
+        return [column for column in self.table.c if column.key in wanted]
+
+    def columns_for(self, info: Info, path: Tuple[str, ...] = ()) -> List[Column]:
+        """Columns needed for the current field's selection set"""
+        return self.columns(selected_field_names(info, path))
+
+    def build(self, row: Mapping[str, Any]) -> Any:
+        """Build the output type from a row; unselected fields are left as None"""
+        values = dict.fromkeys(self.init_fields)
+        for column, value in row.items():
+            field = self.column_fields.get(column)
+            if field is None:
+                continue
+            if isinstance(value, UUID):
+                value = str(value)
+            if value is None and field in self.defaults:
+                value = self.defaults[field]
+            values[field] = value
+        return self.output_type(**values)
+
+
+video_projection = Projection(
+    VideoModel.__table__,
+    Video,
+    columns={
+        "id": "id",
+        "title": "title",
+        "description": "description",
+        "filename": "filename",
+        "original_name": "originalName",
+        "mime_type": "mimeType",
+        "size": "size",
+        "duration": "duration",
+        "views": "views",
+        "is_active": "isActive",
+        "is_production": "isProduction",
+        "total_duration": "totalDuration",
+        "case_id": "caseId",
+        "source_type": "sourceType",
+        "created_at": "createdAt",
+        "updated_at": "updatedAt",
+    },
+    dependencies={
+        "chunks": ("isProduction",),
+        "file_url": ("filename",),
+    },
+    defaults={"views": 0, "is_production": False},
+)
+
+annotation_projection = Projection(
+    AnnotationModel.__table__,
+    Annotation,
+    columns={
+        "id": "id",
+        "title": "title",
+        "description": "description",
+        "start_time": "startTime",
+        "end_time": "endTime",
+        "type": "type",
+        "color": "color",
+        "is_active": "isActive",
+        "video_id": "videoId",
+        "created_at": "createdAt",
+        "updated_at": "updatedAt",
+    },
+)
+
+chunk_projection = Projection(
+    VideoChunkModel.__table__,
+    VideoChunk,
+    columns={
+        "id": "id",
+        "video_id": "video_id",
+        "chunk_index": "chunk_index",
+        "filename": "filename",
+        "start_time": "start_time",
+        "end_time": "end_time",
+        "duration": "duration",
+        "size": "size",
+        "fps": "fps",
+        "width": "width",
+        "height": "height",
+        "is_active": "isActive",
+        "created_at": "createdAt",
+        "updated_at": "updatedAt",
+    },
+)
@@ -1,198 +1,94 @@
 """
 GraphQL Resolvers
+
+All resolvers of a request share the session held by the request context.
 """
 import strawberry
 from typing import List, Optional
 from uuid import UUID
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Numeric, cast, select
+from strawberry.types import Info
 
-from app.core.database import get_db
 from app.models.video import Video as VideoModel
-from app.models.annotation import Annotation as AnnotationModel
-from app.models.video_chunk import VideoChunk as VideoChunkModel
-from app.graphql.types import Video, Annotation, VideoChunk, CreateAnnotationInput
+from app.models.annotation import Annotation as AnnotationModel, time_range
+from app.schemas.annotation import AnnotationCreate
+from app.services.annotation_bulk import AnnotationBulkService
+from app.core.pagination import encode_cursor, keyset_page, split_page
+from app.core.result_cache import VIDEO_LIST_TAG, annotations_tag, invalidate, video_tag
+from app.graphql.types import Video, Annotation, CreateAnnotationInput, PageInfo, VideoConnection, VideoEdge
+from app.graphql.projection import annotation_projection, selected_field_names, video_projection
+
+MAX_PAGE_SIZE = 100
 
 
-async def get_videos() -> List[Video]:
+async def get_videos(info: Info) -> List[Video]:
     """Get all videos"""
-    async for db in get_db():
-        # Get videos
+    info.context.tag(VIDEO_LIST_TAG)
+    async with info.context.db() as db:
+        # Only the columns the selection set needs; annotations and chunks
+        # are resolved per field through the request's loaders
         result = await db.execute(
-            select(VideoModel).where(VideoModel.isActive == True)
-        )
-        videos = result.scalars().all()
-        
-        # Get all annotations for these videos
-        video_ids = [video.id for video in videos]
-        ann_result = await db.execute(
-            select(AnnotationModel)
-            .where(AnnotationModel.videoId.in_(video_ids))
-            .where(AnnotationModel.isActive == True)
+            select(*video_projection.columns_for(info))
+            .where(VideoModel.isActive == True)
         )
-        all_annotations = ann_result.scalars().all()
-        
-        # Group annotations by video_id
-        annotations_by_video = {}
-        for ann in all_annotations:
-            if ann.videoId not in annotations_by_video:
-                annotations_by_video[ann.videoId] = []
-            annotations_by_video[ann.videoId].append(
-                Annotation(
-                    id=str(ann.id),
-                    title=ann.title,
-                    description=ann.description,
-                    start_time=ann.startTime,
-                    end_time=ann.endTime,
-                    type=ann.type,
-                    color=ann.color,
-                    is_active=ann.isActive,
-                    video_id=str(ann.videoId),
-                    created_at=ann.createdAt,
-                    updated_at=ann.updatedAt,
-                )
-            )
-        
-        return [
-            Video(
-                id=str(video.id),
-                title=video.title,
-                description=video.description,
-                filename=video.filename,
-                original_name=video.originalName,
-                mime_type=video.mimeType,
-                size=video.size,
-                duration=video.duration,
-                views=video.views or 0,
-                is_active=video.isActive,
-                is_production=video.isProduction or False,
-                total_duration=video.totalDuration,
-                case_id=video.caseId,
-                source_type=video.sourceType,
-                created_at=video.createdAt,
-                updated_at=video.updatedAt,
-                annotations=annotations_by_video.get(video.id, []),
-                chunks=[],  # Will be populated separately for production videos
-            )
-            for video in videos
-        ]
+        rows = result.mappings().all()
+    return [video_projection.build(row) for row in rows]
 
 
-async def get_video(id: strawberry.ID) -> Optional[Video]:
+async def get_video(id: strawberry.ID, info: Info) -> Optional[Video]:
     """Get a single video by ID"""
-    async for db in get_db():
+    info.context.tag(video_tag(id))
+    async with info.context.db() as db:
         result = await db.execute(
-            select(VideoModel).where(VideoModel.id == UUID(id))
+            select(*video_projection.columns_for(info))
+            .where(VideoModel.id == UUID(id))
         )
-        video = result.scalar_one_or_none()
-        if not video:
-            return None
-        
-        # Get annotations for this video
-        ann_result = await db.execute(
-            select(AnnotationModel)
-            .where(AnnotationModel.videoId == video.id)
-            .where(AnnotationModel.isActive == True)
-        )
-        annotations = ann_result.scalars().all()
-        
-        # Get chunks for production videos
-        chunks = []
-        if video.isProduction:
-            chunk_result = await db.execute(
-                select(VideoChunkModel)
-                .where(VideoChunkModel.video_id == video.id)
-                .where(VideoChunkModel.isActive == True)
-                .order_by(VideoChunkModel.chunk_index)
-            )
-            chunk_models = chunk_result.scalars().all()
-            chunks = [
-                VideoChunk(
-                    id=str(chunk.id),
-                    video_id=str(chunk.video_id),
-                    chunk_index=chunk.chunk_index,
-                    filename=chunk.filename,
-                    start_time=chunk.start_time,
-                    end_time=chunk.end_time,
-                    duration=chunk.duration,
-                    size=chunk.size,
-                    fps=chunk.fps,
-                    width=chunk.width,
-                    height=chunk.height,
-                    is_active=chunk.isActive,
-                    created_at=chunk.createdAt,
-                    updated_at=chunk.updatedAt,
-                )
-                for chunk in chunk_models
-            ]
+        row = result.mappings().one_or_none()
+    if not row:
+        return None
+    
+    return video_projection.build(row)
 
-        return Video(
-            id=str(video.id),
-            title=video.title,
-            description=video.description,
-            filename=video.filename,
-            original_name=video.originalName,
-            mime_type=video.mimeType,
-            size=video.size,
-            duration=video.duration,
-            views=video.views or 0,
-            is_active=video.isActive,
-            is_production=video.isProduction or False,
-            total_duration=video.totalDuration,
-            case_id=video.caseId,
-            source_type=video.sourceType,
-            created_at=video.createdAt,
-            updated_at=video.updatedAt,
-            annotations=[
-                Annotation(
-                    id=str(ann.id),
-                    title=ann.title,
-                    description=ann.description,
-                    start_time=ann.startTime,
-                    end_time=ann.endTime,
-                    type=ann.type,
-                    color=ann.color,
-                    is_active=ann.isActive,
-                    video_id=str(ann.videoId),
-                    created_at=ann.createdAt,
-                    updated_at=ann.updatedAt,
-                )
-                for ann in annotations
-            ],
-            chunks=chunks,
-        )
 
+async def get_annotations_by_video(
+    video_id: strawberry.ID,
+    info: Info,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> List[Annotation]:
+    """Get annotations for a video, optionally only those overlapping [start, end]"""
+    if start is None and end is None:
+        return await info.context.annotations_loader.load(UUID(video_id))
+    if start is None or end is None or end < start:
+        raise ValueError("Both start and end are required, with start <= end")
+    
+    overlaps = time_range(AnnotationModel.startTime, AnnotationModel.endTime).op("&&")(time_range(start, end))
+    return await _annotations_where(info, UUID(video_id), overlaps, AnnotationModel.startTime)
 
-async def get_annotations_by_video(video_id: strawberry.ID) -> List[Annotation]:
-    """Get all annotations for a video"""
-    async for db in get_db():
+
+async def get_annotations_at(video_id: strawberry.ID, time: float, info: Info) -> List[Annotation]:
+    """Get the annotations active at a playback time, latest-starting first"""
+    covers = time_range(AnnotationModel.startTime, AnnotationModel.endTime).op("@>")(cast(time, Numeric))
+    return await _annotations_where(info, UUID(video_id), covers, AnnotationModel.startTime.desc())
+
+
+async def _annotations_where(info: Info, video_id: UUID, condition, order) -> List[Annotation]:
+    info.context.tag(annotations_tag(video_id))
+    async with info.context.db() as db:
         result = await db.execute(
-            select(AnnotationModel)
-            .where(AnnotationModel.videoId == UUID(video_id))
+            select(*annotation_projection.columns_for(info))
+            .where(AnnotationModel.videoId == video_id)
             .where(AnnotationModel.isActive == True)
+            .where(condition)
+            .order_by(order)
         )
-        annotations = result.scalars().all()
-        return [
-            Annotation(
-                id=str(ann.id),
-                title=ann.title,
-                description=ann.description,
-                start_time=ann.startTime,
-                end_time=ann.endTime,
-                type=ann.type,
-                color=ann.color,
-                is_active=ann.isActive,
-                video_id=str(ann.videoId),
-                created_at=ann.createdAt,
-                updated_at=ann.updatedAt,
-            )
-            for ann in annotations
-        ]
+        rows = result.mappings().all()
+    return [annotation_projection.build(row) for row in rows]
 
 
-async def create_annotation(create_annotation_input: CreateAnnotationInput) -> Annotation:
+async def create_annotation(create_annotation_input: CreateAnnotationInput, info: Info) -> Annotation:
     """Create a new annotation"""
-    async for db in get_db():
+    async with info.context.db() as db:
         annotation = AnnotationModel(
             title=create_annotation_input.title,
             description=create_annotation_input.description,
@@ -206,124 +102,96 @@ async def create_annotation(create_annotation_input: CreateAnnotationInput) -> A
         db.add(annotation)
         await db.commit()
         await db.refresh(annotation)
-        
-        return Annotation(
-            id=str(annotation.id),
-            title=annotation.title,
-            description=annotation.description,
-            start_time=annotation.startTime,
-            end_time=annotation.endTime,
-            type=annotation.type,
-            color=annotation.color,
-            is_active=annotation.isActive,
-            video_id=str(annotation.videoId),
-            created_at=annotation.createdAt,
-            updated_at=annotation.updatedAt,
+    
+    # Later reads in this request must not see a stale cached list
+    info.context.forget_annotations(annotation.videoId)
+    await invalidate(annotations_tag(annotation.videoId))
+    return Annotation.from_model(annotation)
+
+
+async def create_annotations(create_annotations_input: List[CreateAnnotationInput], info: Info) -> List[Annotation]:
+    """Create many annotations in one bulk load; those for unknown videos are skipped"""
+    annotations = [
+        AnnotationCreate(
+            title=item.title,
+            description=item.description,
+            startTime=item.start_time,
+            endTime=item.end_time,
+            type=item.type,
+            color=item.color,
+            videoId=UUID(item.video_id),
         )
+        for item in create_annotations_input
+    ]
+    async with info.context.db() as db:
+        rows = await AnnotationBulkService(db).create_many(annotations)
+    
+    for video_id in {row["videoId"] for row in rows}:
+        info.context.forget_annotations(video_id)
+    return [annotation_projection.build(row) for row in rows]
 
 
-async def get_production_videos() -> List[Video]:
-    """Get all production videos with chunks"""
-    async for db in get_db():
-        # Get production videos
+async def get_production_videos(info: Info) -> List[Video]:
+    """Get all production videos"""
+    info.context.tag(VIDEO_LIST_TAG)
+    async with info.context.db() as db:
         result = await db.execute(
-            select(VideoModel)
+            select(*video_projection.columns_for(info))
             .where(VideoModel.isActive == True)
             .where(VideoModel.isProduction == True)
         )
-        videos = result.scalars().all()
-        
-        # Get all annotations for these videos
-        video_ids = [video.id for video in videos]
-        ann_result = await db.execute(
-            select(AnnotationModel)
-            .where(AnnotationModel.videoId.in_(video_ids))
-            .where(AnnotationModel.isActive == True)
-        )
-        all_annotations = ann_result.scalars().all()
-        
-        # Group annotations by video_id
-        annotations_by_video = {}
-        for ann in all_annotations:
-            if ann.videoId not in annotations_by_video:
-                annotations_by_video[ann.videoId] = []
-            annotations_by_video[ann.videoId].append(
-                Annotation(
-                    id=str(ann.id),
-                    title=ann.title,
-                    description=ann.description,
-                    start_time=ann.startTime,
-                    end_time=ann.endTime,
-                    type=ann.type,
-                    color=ann.color,
-                    is_active=ann.isActive,
-                    video_id=str(ann.videoId),
-                    created_at=ann.createdAt,
-                    updated_at=ann.updatedAt,
-                )
-            )
-        
-        # Get chunks for all production videos
-        chunk_result = await db.execute(
-            select(VideoChunkModel)
-            .where(VideoChunkModel.video_id.in_(video_ids))
-            .where(VideoChunkModel.isActive == True)
-            .order_by(VideoChunkModel.video_id, VideoChunkModel.chunk_index)
-        )
-        all_chunks = chunk_result.scalars().all()
-        
-        # Group chunks by video_id
-        chunks_by_video = {}
-        for chunk in all_chunks:
-            if chunk.video_id not in chunks_by_video:
-                chunks_by_video[chunk.video_id] = []
-            chunks_by_video[chunk.video_id].append(
-                VideoChunk(
-                    id=str(chunk.id),
-                    video_id=str(chunk.video_id),
-                    chunk_index=chunk.chunk_index,
-                    filename=chunk.filename,
-                    start_time=chunk.start_time,
-                    end_time=chunk.end_time,
-                    duration=chunk.duration,
-                    size=chunk.size,
-                    fps=chunk.fps,
-                    width=chunk.width,
-                    height=chunk.height,
-                    is_active=chunk.isActive,
-                    created_at=chunk.createdAt,
-                    updated_at=chunk.updatedAt,
-                )
-            )
-        
-        return [
-            Video(
-                id=str(video.id),
-                title=video.title,
-                description=video.description,
-                filename=video.filename,
-                original_name=video.originalName,
-                mime_type=video.mimeType,
-                size=video.size,
-                duration=video.duration,
-                views=video.views or 0,
-                is_active=video.isActive,
-                is_production=video.isProduction or False,
-                total_duration=video.totalDuration,
-                case_id=video.caseId,
-                source_type=video.sourceType,
-                created_at=video.createdAt,
-                updated_at=video.updatedAt,
-                annotations=annotations_by_video.get(video.id, []),
-                chunks=chunks_by_video.get(video.id, []),
-            )
-            for video in videos
-        ]
+        rows = result.mappings().all()
+    return [video_projection.build(row) for row in rows]
+
+
+async def _video_connection(info: Info, filters: list, first: int, after: Optional[str]) -> VideoConnection:
+    """Newest-first page of videos matching filters, continuing after the cursor"""
+    first = max(1, min(first, MAX_PAGE_SIZE))
+    info.context.tag(VIDEO_LIST_TAG)
+    # The sort key is always fetched so edge cursors can be built
+    names = selected_field_names(info, ("edges", "node")) | {"createdAt"}
+    columns = video_projection.columns(names)
+    query = keyset_page(
+        select(*columns).where(*filters), VideoModel.createdAt, VideoModel.id, after, first
+    )
+    async with info.context.db() as db:
+        result = await db.execute(query)
+        rows = result.mappings().all()
+    rows, next_cursor = split_page(rows, first, key=lambda row: (row["createdAt"], row["id"]))
+    
+    edges = [
+        VideoEdge(cursor=encode_cursor(row["createdAt"], row["id"]), node=video_projection.build(row))
+        for row in rows
+    ]
+    return VideoConnection(
+        edges=edges,
+        page_info=PageInfo(
+            has_next_page=next_cursor is not None,
+            has_previous_page=after is not None,
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+        ),
+        count_query=select(VideoModel.id).where(*filters),
+    )
+
+
+async def get_videos_connection(info: Info, first: int = 20, after: Optional[str] = None) -> VideoConnection:
+    """Get active videos as a cursor-paginated connection"""
+    return await _video_connection(info, [VideoModel.isActive == True], first, after)
+
+
+async def get_production_videos_connection(
+    info: Info, first: int = 20, after: Optional[str] = None
+) -> VideoConnection:
+    """Get active production videos as a cursor-paginated connection"""
+    return await _video_connection(
+        info, [VideoModel.isActive == True, VideoModel.isProduction == True], first, after
+    )
 
 
-async def delete_annotation(id: strawberry.ID) -> bool:
+async def delete_annotation(id: strawberry.ID, info: Info) -> bool:
     """Delete an annotation by ID"""
-    async for db in get_db():
+    async with info.context.db() as db:
         result = await db.execute(
             select(AnnotationModel)
             .where(AnnotationModel.id == UUID(id))
@@ -335,5 +203,7 @@ async def delete_annotation(id: strawberry.ID) -> bool:
             # Soft delete - set isActive to False
             annotation.isActive = False
             await db.commit()
+            info.context.forget_annotations(annotation.videoId)
+            await invalidate(annotations_tag(annotation.videoId))
             return True
         return False
@@ -0,0 +1,91 @@
+"""
+GraphQL HTTP router with automatic persisted queries (APQ)
+
+Clients send only the sha256 of a known document. An unknown hash is
+answered with PERSISTED_QUERY_NOT_FOUND, and the client retries once with the
+full text, which registers it for every later request.
+"""
+import hashlib
+import json
+from typing import Any
+
+import orjson
+from graphql import GraphQLError
+from strawberry.fastapi import GraphQLRouter
+from strawberry.http import GraphQLRequestData
+from strawberry.http.exceptions import HTTPException
+from strawberry.types import ExecutionResult
+
+from app.core.cache import build_cache
+from app.core.config import settings
+
+# sha256 hex digest -> query text
+persisted_queries = build_cache("persisted_queries", max_entries=settings.GRAPHQL_APQ_MAX_ENTRIES)
+
+
+class PersistedQueryNotFound(Exception):
+    """The client sent a hash this worker has not registered yet"""
+
+
+class PersistedQueryRouter(GraphQLRouter):
+    """GraphQLRouter that resolves Apollo-style persisted query hashes"""
+
+    def encode_json(self, response_data) -> bytes:
+        # Resolved results are plain dicts and lists; orjson encodes them several times faster
+        return orjson.dumps(response_data)
+
+    def should_render_graphql_ide(self, request) -> bool:
+        # Hash-only GET requests carry no query but are not IDE page loads
+        return "extensions" not in request.query_params and super().should_render_graphql_ide(request)
+
+    async def _request_extensions(self, request) -> Any:
+        if request.method == "GET":
+            raw = request.query_params.get("extensions")
+            try:
+                return json.loads(raw) if raw else {}
+            except ValueError as e:
+                raise HTTPException(400, "Unable to parse extensions as JSON") from e
+        if "application/json" in (request.content_type or ""):
+            body = await request.get_body()
+            # Skip re-decoding bodies that cannot carry a persisted query
+            if b"persistedQuery" in (body if isinstance(body, bytes) else body.encode()):
+                data = self.parse_json(body)
+                if isinstance(data, dict):
+                    return data.get("extensions") or {}
+        return {}
+
+    async def parse_http_body(self, request) -> GraphQLRequestData:
+        request_data = await super().parse_http_body(request)
+        if not settings.GRAPHQL_APQ_ENABLED:
+            return request_data
+
+        extensions = await self._request_extensions(request)
+        if not isinstance(extensions, dict):
+            raise HTTPException(400, "extensions must be a JSON object")
+        persisted = extensions.get("persistedQuery")
+        if not persisted:
+            return request_data
+        if not isinstance(persisted, dict):
+            raise HTTPException(400, "persistedQuery must be a JSON object")
+        if persisted.get("version") != 1:
+            raise HTTPException(400, "Unsupported persisted query version")
+        sha256 = persisted.get("sha256Hash")
+
+        if request_data.query is None:
+            query = persisted_queries.get(sha256)
+            if query is None:
+                raise PersistedQueryNotFound()
+            request_data.query = query
+        else:
+            if hashlib.sha256(request_data.query.encode()).hexdigest() != sha256:
+                raise HTTPException(400, "provided sha does not match query")
+            persisted_queries.set(sha256, request_data.query)
+        return request_data
+
+    async def execute_operation(self, request, context, root_value) -> ExecutionResult:
+        try:
+            return await super().execute_operation(request, context, root_value)
+        except PersistedQueryNotFound:
+            # Answered as a normal GraphQL error so clients retry with the text
+            error = GraphQLError("PersistedQueryNotFound", extensions={"code": "PERSISTED_QUERY_NOT_FOUND"})
+            return ExecutionResult(data=None, errors=[error])
@@ -2,12 +2,16 @@
 GraphQL Schema using Strawberry
 """
 import strawberry
+from strawberry.extensions import ParserCache, ValidationCache
 from typing import List, Optional
 from uuid import UUID
 from datetime import datetime
 
-from app.graphql.types import Video, Annotation, CreateAnnotationInput
+from app.core.config import settings
+from app.graphql.extensions import ReadReplicaExtension, ResultCacheExtension
+from app.graphql.types import Video, Annotation, CreateAnnotationInput, VideoConnection
 from app.graphql.resolvers import get_videos, get_video, get_annotations_by_video, create_annotation, get_production_videos, delete_annotation
+from app.graphql.resolvers import get_videos_connection, get_production_videos_connection, get_annotations_at, create_annotations
 
 
 @strawberry.type
@@ -18,10 +22,22 @@ class Query:
         resolver=get_production_videos,
         name="productionVideos"
     )
+    videos_connection: VideoConnection = strawberry.field(
+        resolver=get_videos_connection,
+        name="videosConnection"
+    )
+    production_videos_connection: VideoConnection = strawberry.field(
+        resolver=get_production_videos_connection,
+        name="productionVideosConnection"
+    )
     annotations_by_video: List[Annotation] = strawberry.field(
         resolver=get_annotations_by_video,
         name="annotationsByVideo"
     )
+    annotations_at: List[Annotation] = strawberry.field(
+        resolver=get_annotations_at,
+        name="annotationsAt"
+    )
 
 
 @strawberry.type
@@ -30,10 +46,24 @@ class Mutation:
         resolver=create_annotation,
         name="createAnnotation"
     )
+    create_annotations: List[Annotation] = strawberry.field(
+        resolver=create_annotations,
+        name="createAnnotations"
+    )
     remove_annotation: bool = strawberry.field(
         resolver=delete_annotation,
         name="removeAnnotation"
     )
 
 
-schema = strawberry.Schema(query=Query, mutation=Mutation)
+schema = strawberry.Schema(
+    query=Query,
+    mutation=Mutation,
+    extensions=[
+        # Parse and validate each distinct query text once per worker
+        ParserCache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE),
+        ValidationCache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE),
+        ReadReplicaExtension,
+        ResultCacheExtension,
+    ],
+)
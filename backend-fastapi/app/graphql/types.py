@@ -2,10 +2,13 @@
 GraphQL Types
 """
 import strawberry
-from typing import Optional, List
+from strawberry.types import Info
+from typing import Any, Optional, List
 from uuid import UUID
 from datetime import datetime
 
+from app.core.pagination import count_rows
+
 
 @strawberry.type
 class VideoChunk:
@@ -25,6 +28,37 @@ class VideoChunk:
     updated_at: datetime = strawberry.field(name="updatedAt")
 
 
+@strawberry.type
+class Annotation:
+    id: strawberry.ID
+    title: str
+    description: Optional[str]
+    start_time: float = strawberry.field(name="startTime")
+    end_time: float = strawberry.field(name="endTime")
+    type: Optional[str]
+    color: Optional[str]
+    is_active: bool = strawberry.field(name="isActive")
+    video_id: strawberry.ID = strawberry.field(name="videoId")
+    created_at: datetime = strawberry.field(name="createdAt")
+    updated_at: datetime = strawberry.field(name="updatedAt")
+
+    @classmethod
+    def from_model(cls, ann) -> "Annotation":
+        return cls(
+            id=str(ann.id),
+            title=ann.title,
+            description=ann.description,
+            start_time=ann.startTime,
+            end_time=ann.endTime,
+            type=ann.type,
+            color=ann.color,
+            is_active=ann.isActive,
+            video_id=str(ann.videoId),
+            created_at=ann.createdAt,
+            updated_at=ann.updatedAt,
+        )
+
+
 @strawberry.type
 class Video:
     id: strawberry.ID
@@ -43,8 +77,18 @@ class Video:
     source_type: Optional[str] = strawberry.field(name="sourceType")
     created_at: datetime = strawberry.field(name="createdAt")
     updated_at: datetime = strawberry.field(name="updatedAt")
-    annotations: List["Annotation"] = strawberry.field(default_factory=list)
-    chunks: List[VideoChunk] = strawberry.field(default_factory=list)
+
+    @strawberry.field
+    async def annotations(self, info: Info) -> List[Annotation]:
+        """Active annotations, batched per request by video id."""
+        return await info.context.annotations_loader.load(UUID(self.id))
+
+    @strawberry.field
+    async def chunks(self, info: Info) -> List[VideoChunk]:
+        """Active chunks of production videos, batched per request by video id."""
+        if not self.is_production:
+            return []
+        return await info.context.chunks_loader.load(UUID(self.id))
     
     @strawberry.field
     def file_url(self) -> str:
@@ -52,18 +96,30 @@ class Video:
 
 
 @strawberry.type
-class Annotation:
-    id: strawberry.ID
-    title: str
-    description: Optional[str]
-    start_time: float = strawberry.field(name="startTime")
-    end_time: float = strawberry.field(name="endTime")
-    type: Optional[str]
-    color: Optional[str]
-    is_active: bool = strawberry.field(name="isActive")
-    video_id: strawberry.ID = strawberry.field(name="videoId")
-    created_at: datetime = strawberry.field(name="createdAt")
-    updated_at: datetime = strawberry.field(name="updatedAt")
+class PageInfo:
+    has_next_page: bool = strawberry.field(name="hasNextPage")
+    has_previous_page: bool = strawberry.field(name="hasPreviousPage")
+    start_cursor: Optional[str] = strawberry.field(name="startCursor")
+    end_cursor: Optional[str] = strawberry.field(name="endCursor")
+
+
+@strawberry.type
+class VideoEdge:
+    cursor: str
+    node: Video
+
+
+@strawberry.type
+class VideoConnection:
+    edges: List[VideoEdge]
+    page_info: PageInfo = strawberry.field(name="pageInfo")
+    count_query: strawberry.Private[Any]
+
+    @strawberry.field(name="totalCount")
+    async def total_count(self, info: Info, exact: bool = False) -> Optional[int]:
+        """Matching videos; the planner's estimate unless exact is requested."""
+        async with info.context.db() as db:
+            return await count_rows(db, self.count_query, "exact" if exact else "estimate")
 
 
 @strawberry.input
@@ -6,17 +6,29 @@ Professional video player with advanced features including annotations and chapt
 from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
+import asyncio
 import os
 import uvicorn
 from pathlib import Path
 
+from app.core.cache import caches
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, Base, replica_monitor
+from app.core.invalidation import invalidation_bus
+from app.core.loop_watchdog import loop_watchdog
+from app.core.db_pool import pool_stats, slow_queries
+from app.core.metrics import CONTENT_TYPE, MetricsMiddleware, metrics
+from app.core.profiling import ProfilingMiddleware, profiler, require_profiling_token
+from app.core.request_context import RequestContextMiddleware
 from app.api.api_v1.api import api_router
 from app.graphql.schema import schema
-from strawberry.fastapi import GraphQLRouter
+from app.graphql.context import get_context
+from app.graphql.router import PersistedQueryRouter
+from app.services.preview_warmer import preview_warmer
+from app.services.readiness import readiness
+from app.services.view_counter import view_counter
 
 
 @asynccontextmanager
@@ -25,19 +37,49 @@ async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Starting FastAPI Video Player Backend...")
     
-    # Create database tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # The schema comes from `alembic upgrade head`; create_all is opt-in for scratch databases
+    if settings.DB_CREATE_TABLES:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
     
     # Create videos directory if it doesn't exist
     videos_dir = Path("videos")
     videos_dir.mkdir(exist_ok=True)
     
+    # Publish this worker's metrics for /metrics
+    metrics.start()
+    
+    # Report sync calls that block the event loop, with their stack and route
+    loop_watchdog.start(app)
+    
+    # Start background preview warming
+    if settings.PREVIEW_WARMING_ENABLED:
+        preview_warmer.start()
+    
+    # Start batched view count writes
+    view_counter.start()
+    
+    # Route reads to the read replica while its lag is within budget
+    replica_monitor.start()
+    
+    # Apply other workers' cache invalidations
+    invalidation_bus.start()
+    
+    # Warm pools and caches in the background; /ready reports 503 until done
+    readiness.start()
+    
     print("✅ FastAPI backend started successfully!")
     yield
     
     # Shutdown
     print("🛑 Shutting down FastAPI backend...")
+    await readiness.stop()
+    await preview_warmer.stop()
+    await view_counter.stop()
+    await replica_monitor.stop()
+    await invalidation_bus.stop()
+    await loop_watchdog.stop()
+    await metrics.stop()
 
 
 # Create FastAPI app
@@ -58,11 +100,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in cProfile of single requests (X-Profile-Token or PROFILING_SAMPLE_RATE)
+app.add_middleware(ProfilingMiddleware)
+
+# Lets database events and logs name the route they ran for
+app.add_middleware(RequestContextMiddleware)
+
+# Request latency and bytes served per route template
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 # GraphQL endpoint
-graphql_app = GraphQLRouter(schema)
+graphql_app = PersistedQueryRouter(schema, context_getter=get_context)
 app.include_router(graphql_app, prefix="/graphql")
 
 # Serve static video files
@@ -75,9 +127,71 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "video-player-api",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "read_replica": replica_monitor.stats(),
+        "cache_invalidation": invalidation_bus.stats()
     }
 
+# Readiness probe: only route traffic here once warm-up has finished
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint; 503 while the replica is still warming up."""
+    return JSONResponse(readiness.stats(), status_code=200 if readiness.ready else 503)
+
+# Connection pool occupancy and wait/hold time histograms, per engine
+@app.get("/internal/db-pool")
+async def db_pool_stats():
+    """Connection pool instrumentation."""
+    return {name: stats.stats() for name, stats in pool_stats.items()}
+
+# Occupancy and hit rates of the media and metadata caches (host-wide when shared)
+@app.get("/internal/caches")
+async def cache_stats():
+    """Cache instrumentation."""
+    return {name: cache.stats() for name, cache in caches.items()}
+
+# Statements slower than SLOW_QUERY_MS in this worker, with parameter types and route
+@app.get("/internal/slow-queries")
+async def slow_query_log():
+    """Slow-query log, newest first."""
+    return {"threshold_ms": settings.SLOW_QUERY_MS, "queries": list(reversed(slow_queries))}
+
+# Recent event-loop stalls in this worker, with the blocking stack and route
+@app.get("/internal/loop-stalls")
+async def loop_stalls():
+    """Event-loop watchdog report."""
+    return loop_watchdog.stats()
+
+# Stored request profiles (any worker's); guarded by PROFILING_TOKEN
+@app.get("/internal/profiles", dependencies=[Depends(require_profiling_token)])
+async def list_profiles():
+    """Recent request profiles, newest first."""
+    return {"profiler": profiler.stats(), "profiles": await asyncio.to_thread(profiler.recent)}
+
+@app.get("/internal/profiles/{profile_id}", dependencies=[Depends(require_profiling_token)])
+async def get_profile(profile_id: str):
+    """One profile: SQL/ffmpeg/other breakdown and top functions by cumulative time."""
+    profile = await asyncio.to_thread(profiler.get, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@app.get("/internal/profiles/{profile_id}/pstats", dependencies=[Depends(require_profiling_token)])
+async def download_profile(profile_id: str):
+    """Raw cProfile dump for pstats or snakeviz."""
+    path = profiler.pstats_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+# Prometheus scrape endpoint; merges every worker's metrics under gunicorn
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text exposition."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(await metrics.render(), media_type=CONTENT_TYPE)
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -86,7 +200,8 @@ async def root():
         "message": "Video Player API",
         "version": "1.0.0",
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "ready": "/ready"
     }
 
 
@@ -2,7 +2,7 @@
 Annotation database model.
 """
 
-from sqlalchemy import Column, String, Float, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, String, Float, Boolean, DateTime, Text, ForeignKey, Index, Numeric, DDL, cast, event, literal_column
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -11,6 +11,15 @@ import uuid
 from app.core.database import Base
 
 
+def time_range(start, end):
+    """Closed numrange over [start, end].
+    
+    Matches the expression indexed by ix_annotations_video_time_range, so
+    overlap (&&) and containment (@>) filters built on it can use the index.
+    """
+    return func.numrange(cast(start, Numeric), cast(end, Numeric), literal_column("'[]'"))
+
+
 class Annotation(Base):
     """Annotation model."""
     
@@ -31,5 +40,25 @@ class Annotation(Base):
     # Relationships
     video = relationship("Video", back_populates="annotations")
     
+    __table_args__ = (
+        # Per-video lists ordered by start time
+        Index("ix_annotations_video_id_start_time", videoId, startTime),
+        # Time-window lookups per video; needs btree_gist for the uuid column
+        Index(
+            "ix_annotations_video_time_range",
+            videoId,
+            time_range(startTime, endTime),
+            postgresql_using="gist",
+        ).ddl_if(dialect="postgresql"),
+    )
+    
     def __repr__(self):
-        return f"<Annotation(id={self.id}, title='{self.title}', video_id={self.video_id})>"
+        return f"<Annotation(id={self.id}, title='{self.title}', video_id={self.videoId})>"
+
+
+# create_all builds the GiST index above, which requires the extension first
+event.listen(
+    Annotation.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS btree_gist").execute_if(dialect="postgresql"),
+)
@@ -2,7 +2,7 @@
 Video database model.
 """
 
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, Text
+from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, Text, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -37,5 +37,12 @@ class Video(Base):
     annotations = relationship("Annotation", back_populates="video", cascade="all, delete-orphan")
     chunks = relationship("VideoChunk", back_populates="video", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Keyset pagination, newest first
+        Index("ix_videos_created_at_id", "createdAt", "id"),
+        # Production listings
+        Index("ix_videos_production_active_created_at", "isProduction", "isActive", "createdAt", "id"),
+    )
+    
     def __repr__(self):
         return f"<Video(id={self.id}, title='{self.title}')>"
@@ -0,0 +1,96 @@
+"""
+Fast-path serializers for list payloads.
+
+Large read-only listings skip ORM instances and Pydantic validation: a Core
+query selects exactly the columns of the response shape, a serializer built
+once per shape zips each row into a dict keyed by the API field names, and
+orjson encodes the result (UUIDs and datetimes natively). The output matches
+the corresponding Pydantic response schemas.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import orjson
+from fastapi import Response
+from sqlalchemy import func, select
+from sqlalchemy.sql import ColumnElement, Select
+
+from app.models.annotation import Annotation
+from app.models.video import Video
+
+# Same timestamp format as Pydantic ("...Z" for UTC)
+JSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class RowSerializer:
+    """Converts rows of one fixed select list into JSON-ready dicts."""
+
+    __slots__ = ("keys", "columns")
+
+    def __init__(self, fields: Dict[str, ColumnElement]):
+        self.keys = tuple(fields)
+        # Labels keep the row order aligned with self.keys
+        self.columns = tuple(column.label(key) for key, column in fields.items())
+
+    def select(self) -> Select:
+        return select(*self.columns)
+
+    def dump(self, row: Sequence[Any]) -> Dict[str, Any]:
+        return dict(zip(self.keys, row))
+
+    def dump_all(self, rows: Sequence[Sequence[Any]]) -> List[Dict[str, Any]]:
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in rows]
+
+
+@dataclass(slots=True)
+class VideoPage:
+    """Video listing payload; serialized by orjson as-is."""
+
+    videos: List[Dict[str, Any]]
+    total: Optional[int]
+    page: Optional[int]
+    size: int
+    next_cursor: Optional[str] = None
+
+
+def json_response(payload: Any, status_code: int = 200) -> Response:
+    """Encode a payload of dicts, lists and dataclasses with orjson."""
+    return Response(
+        content=orjson.dumps(payload, option=JSON_OPTIONS),
+        status_code=status_code,
+        media_type="application/json",
+    )
+
+
+# Field order follows app.schemas.annotation.Annotation
+annotation_serializer = RowSerializer({
+    "title": Annotation.title,
+    "description": Annotation.description,
+    "startTime": Annotation.startTime,
+    "endTime": Annotation.endTime,
+    "type": func.coalesce(Annotation.type, "chapter"),
+    "color": func.coalesce(Annotation.color, "#3B82F6"),
+    "isActive": func.coalesce(Annotation.isActive, True),
+    "videoId": Annotation.videoId,
+    "id": Annotation.id,
+    "created_at": Annotation.createdAt,
+    "updated_at": Annotation.updatedAt,
+})
+
+# Field order follows app.schemas.video.Video; annotations are attached separately
+video_serializer = RowSerializer({
+    "title": Video.title,
+    "description": Video.description,
+    "filename": Video.filename,
+    "originalName": Video.originalName,
+    "mimeType": Video.mimeType,
+    "size": Video.size,
+    "duration": Video.duration,
+    "views": func.coalesce(Video.views, 0),
+    "isActive": func.coalesce(Video.isActive, True),
+    "id": Video.id,
+    "created_at": Video.createdAt,
+    "updated_at": Video.updatedAt,
+})
@@ -50,6 +50,7 @@ class Video(VideoBase):
 class VideoList(BaseModel):
     """Schema for video list response."""
     videos: List[Video]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     size: int
+    next_cursor: Optional[str] = None
@@ -0,0 +1,243 @@
+"""
+Bulk annotation import and export.
+
+Imports validate rows off the upload in a worker thread, stream them into a
+temporary staging table with asyncpg's binary COPY and merge them into
+``annotations`` with a single INSERT ... SELECT, so a load costs a handful of
+round trips whatever its size. Exports stream rows from a server-side cursor.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import session_factory
+from app.core.result_cache import annotations_tag, invalidate
+from app.models.annotation import Annotation
+from app.schemas.annotation import AnnotationCreate
+
+STAGING_TABLE = "annotations_staging"
+COPY_COLUMNS = ("id", "videoId", "title", "description", "startTime", "endTime", "type", "color", "isActive")
+EXPORT_COLUMNS = COPY_COLUMNS + ("createdAt", "updatedAt")
+BATCH_SIZE = 10_000
+MAX_REPORTED_ERRORS = 20
+
+_quoted = ", ".join(f'"{name}"' for name in COPY_COLUMNS)
+_returned = ", ".join(f'"{name}"' for name in EXPORT_COLUMNS)
+
+# Rows for unknown videos drop out of the join instead of failing the FK for
+# the whole batch; re-imported ids are skipped
+MERGE_SQL = f"""
+    INSERT INTO annotations ({_quoted})
+    SELECT {", ".join(f's."{name}"' for name in COPY_COLUMNS)}
+    FROM {STAGING_TABLE} s
+    JOIN videos v ON v.id = s."videoId"
+    ON CONFLICT (id) DO NOTHING
+    RETURNING {_returned}
+"""
+
+
+def _ndjson_rows(stream: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, e
+
+
+def _csv_rows(stream: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    reader = csv.DictReader(stream)
+    for row in reader:
+        # Empty cells fall back to the schema defaults
+        yield reader.line_num, {
+            key: value for key, value in row.items() if key is not None and value not in ("", None)
+        }
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+        )
+    return str(error)
+
+
+def to_record(data: Dict[str, Any], default_video_id: Optional[uuid.UUID] = None) -> tuple:
+    """Validate one annotation and return it as a COPY record."""
+    if default_video_id is not None and not data.get("videoId"):
+        data = {**data, "videoId": default_video_id}
+    annotation = AnnotationCreate.model_validate(data)
+    if annotation.endTime < annotation.startTime:
+        raise ValueError("endTime must not be before startTime")
+    annotation_id = uuid.UUID(str(data["id"])) if data.get("id") else uuid.uuid4()
+    return (
+        annotation_id,
+        annotation.videoId,
+        annotation.title,
+        annotation.description,
+        annotation.startTime,
+        annotation.endTime,
+        annotation.type,
+        annotation.color,
+        annotation.isActive,
+    )
+
+
+def read_batches(
+    stream: Iterable[str], fmt: str, default_video_id: Optional[uuid.UUID] = None
+) -> Iterator[Tuple[List[tuple], List[Tuple[int, str]]]]:
+    """Parse and validate an NDJSON or CSV stream into batches of (records, errors)."""
+    rows = _csv_rows(stream) if fmt == "csv" else _ndjson_rows(stream)
+    records: List[tuple] = []
+    errors: List[Tuple[int, str]] = []
+    for line_no, data in rows:
+        try:
+            if isinstance(data, Exception):
+                raise data
+            if not isinstance(data, dict):
+                raise ValueError("Expected an object per line")
+            records.append(to_record(data, default_video_id))
+        except ValueError as e:
+            errors.append((line_no, _describe(e)))
+        if len(records) >= BATCH_SIZE:
+            yield records, errors
+            records, errors = [], []
+    if records or errors:
+        yield records, errors
+
+
+class AnnotationBulkService:
+    """Bulk annotation loading through a COPY-fed staging table."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _stage(self, batches: AsyncIterator[List[tuple]]) -> int:
+        # ON COMMIT DROP scopes the staging table to this transaction
+        await self.db.execute(text(
+            f"CREATE TEMP TABLE {STAGING_TABLE} (LIKE annotations INCLUDING DEFAULTS) ON COMMIT DROP"
+        ))
+        # COPY goes straight through the asyncpg connection, inside the
+        # transaction SQLAlchemy has just begun on it
+        connection = await self.db.connection()
+        raw = await connection.get_raw_connection()
+        staged = 0
+        async for records in batches:
+            if records:
+                await raw.driver_connection.copy_records_to_table(
+                    STAGING_TABLE, records=records, columns=COPY_COLUMNS
+                )
+                staged += len(records)
+        return staged
+
+    async def _load(self, batches: AsyncIterator[List[tuple]]) -> Tuple[int, List[Dict[str, Any]]]:
+        try:
+            staged = await self._stage(batches)
+            result = await self.db.execute(text(MERGE_SQL))
+            inserted = [dict(row) for row in result.mappings().all()]
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        await invalidate(*{annotations_tag(row["videoId"]) for row in inserted})
+        return staged, inserted
+
+    async def import_stream(
+        self, stream: Iterable[str], fmt: str, default_video_id: Optional[uuid.UUID] = None
+    ) -> Dict[str, Any]:
+        """Import an NDJSON or CSV stream. Invalid rows are skipped and reported."""
+        reader = read_batches(stream, fmt, default_video_id)
+        rejected = 0
+        errors: List[Dict[str, Any]] = []
+
+        async def batches() -> AsyncIterator[List[tuple]]:
+            nonlocal rejected
+            while True:
+                # Parsing and validation stay off the event loop
+                batch = await asyncio.to_thread(next, reader, None)
+                if batch is None:
+                    return
+                records, batch_errors = batch
+                rejected += len(batch_errors)
+                for line_no, message in batch_errors[: MAX_REPORTED_ERRORS - len(errors)]:
+                    errors.append({"line": line_no, "error": message})
+                yield records
+
+        staged, inserted = await self._load(batches())
+        return {
+            "received": staged + rejected,
+            "inserted": len(inserted),
+            "skipped": staged - len(inserted),
+            "rejected": rejected,
+            "errors": errors,
+            "video_ids": sorted({str(row["videoId"]) for row in inserted}),
+        }
+
+    async def create_many(self, annotations: List[AnnotationCreate]) -> List[Dict[str, Any]]:
+        """Insert validated annotations in one load. Returns the inserted rows.
+
+        Annotations for videos that do not exist are skipped.
+        """
+        if not annotations:
+            return []
+        records = [to_record(annotation.model_dump()) for annotation in annotations]
+
+        async def batches() -> AsyncIterator[List[tuple]]:
+            yield records
+
+        _, inserted = await self._load(batches())
+        return inserted
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def export_annotations(
+    video_id: Optional[uuid.UUID] = None, fmt: str = "ndjson", read_only: bool = False
+) -> AsyncIterator[str]:
+    """Stream active annotations as NDJSON or CSV, one chunk per fetched partition.
+
+    With read_only the export reads from the replica when one is healthy.
+    """
+    table = Annotation.__table__
+    query = (
+        select(*[table.c[name] for name in EXPORT_COLUMNS])
+        .where(table.c.isActive == True)
+        .order_by(table.c.videoId, table.c.startTime)
+        .execution_options(yield_per=1000)
+    )
+    if video_id is not None:
+        query = query.where(table.c.videoId == video_id)
+
+    # Own session: the response body outlives the request handler
+    async with session_factory(read_only)() as db:
+        result = await db.stream(query)
+        if fmt == "csv":
+            yield ",".join(EXPORT_COLUMNS) + "\r\n"
+        async for partition in result.mappings().partitions():
+            buffer = io.StringIO()
+            if fmt == "csv":
+                writer = csv.writer(buffer)
+                for row in partition:
+                    writer.writerow([
+                        value.isoformat() if isinstance(value, datetime) else value
+                        for value in row.values()
+                    ])
+            else:
+                for row in partition:
+                    buffer.write(json.dumps(dict(row), default=_json_default))
+                    buffer.write("\n")
+            yield buffer.getvalue()
@@ -3,11 +3,12 @@ Annotation service for business logic.
 """
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import Numeric, cast, select
 from typing import List, Optional
 from uuid import UUID
 
-from app.models.annotation import Annotation
+from app.core.result_cache import annotations_tag, invalidate
+from app.models.annotation import Annotation, time_range
 from app.schemas.annotation import AnnotationCreate, AnnotationUpdate
 
 
@@ -23,6 +24,7 @@ class AnnotationService:
         self.db.add(annotation)
         await self.db.commit()
         await self.db.refresh(annotation)
+        await invalidate(annotations_tag(annotation.videoId))
         return annotation
     
     async def get_by_id(self, annotation_id: UUID) -> Optional[Annotation]:
@@ -36,8 +38,30 @@ class AnnotationService:
         """Get all annotations for a video."""
         result = await self.db.execute(
             select(Annotation)
-            .where(Annotation.video_id == video_id)
-            .order_by(Annotation.start_time)
+            .where(Annotation.videoId == video_id)
+            .order_by(Annotation.startTime)
+        )
+        return result.scalars().all()
+    
+    async def get_overlapping(self, video_id: UUID, start: float, end: float) -> List[Annotation]:
+        """Get active annotations overlapping the window [start, end]."""
+        result = await self.db.execute(
+            select(Annotation)
+            .where(Annotation.videoId == video_id)
+            .where(Annotation.isActive == True)
+            .where(time_range(Annotation.startTime, Annotation.endTime).op("&&")(time_range(start, end)))
+            .order_by(Annotation.startTime)
+        )
+        return result.scalars().all()
+    
+    async def get_at_time(self, video_id: UUID, time: float) -> List[Annotation]:
+        """Get active annotations covering a playback time, latest-starting first."""
+        result = await self.db.execute(
+            select(Annotation)
+            .where(Annotation.videoId == video_id)
+            .where(Annotation.isActive == True)
+            .where(time_range(Annotation.startTime, Annotation.endTime).op("@>")(cast(time, Numeric)))
+            .order_by(Annotation.startTime.desc())
         )
         return result.scalars().all()
     
@@ -57,6 +81,7 @@ class AnnotationService:
         
         await self.db.commit()
         await self.db.refresh(annotation)
+        await invalidate(annotations_tag(annotation.videoId))
         return annotation
     
     async def delete(self, annotation_id: UUID) -> bool:
@@ -71,4 +96,5 @@ class AnnotationService:
         
         await self.db.delete(annotation)
         await self.db.commit()
+        await invalidate(annotations_tag(annotation.videoId))
         return True
@@ -0,0 +1,503 @@
+"""
+Frame atlas service for decoder-free timeline previews.
+
+Each video gets a downscaled frame atlas: every chunk is decoded once at a low
+frame rate and the RGB frames are appended to a raw ``uint8`` file laid out as
+``(N, H, W, 3)``. A small JSON index next to it records the array shape and the
+frame range covered by each chunk, so the atlas can be memory-mapped with NumPy
+and grown incrementally as chunks are added. A full rebuild writes a new atlas
+file under a fresh generation id and the index names the file it describes, so
+publishing the index is the single step that switches readers over.
+
+Builds and sprite sheets for a video run under an ``flock`` on its
+``_atlas.lock`` file, so workers and threads never write the same atlas at
+once; readers only ever see files renamed into place.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import uuid
+from bisect import bisect_right
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core.cache import build_cache
+from app.core.config import settings
+from app.core.invalidation import invalidation_bus
+from app.core.lazy import lazy_import
+from app.core.metrics import ffmpeg_job
+from app.core.result_cache import atlas_tag, invalidate, tagged_ids
+from app.models.video_chunk import VideoChunk
+from app.services.image_encoding import bound_width, encode_image
+
+ffmpeg = lazy_import("ffmpeg")
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+ATLAS_VERSION = 2
+
+# Encoded previews and open memory maps are shared by every service instance
+_preview_cache = build_cache(
+    "frame_atlas_previews",
+    max_entries=50_000,
+    max_bytes=settings.PREVIEW_CACHE_MAX_BYTES,
+)
+_atlas_handles: Dict[str, Tuple[float, np.memmap, Dict[str, Any]]] = {}
+_atlas_handles_lock = threading.Lock()
+
+
+def previews_shared() -> bool:
+    """Whether encoded previews are cached host-wide rather than in this worker only."""
+    from app.core.shared_cache import SharedCache
+    return isinstance(_preview_cache, SharedCache)
+
+
+# CPU seconds of the ffmpeg processes each thread has run, for the warmer's budget
+_ffmpeg_cpu = threading.local()
+
+
+def ffmpeg_cpu_seconds() -> float:
+    """CPU time of the atlas decodes run by the calling thread."""
+    return getattr(_ffmpeg_cpu, "seconds", 0.0)
+
+
+def _run_ffmpeg(stream) -> bytes:
+    """Run an ffmpeg graph and return its stdout, counting its CPU time for this thread.
+
+    The process is reaped with wait4 so its own rusage is known; RUSAGE_CHILDREN
+    would also count decodes other threads ran meanwhile.
+    """
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            ffmpeg.compile(stream), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=stderr
+        )
+        with process.stdout:
+            out = process.stdout.read()
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        _ffmpeg_cpu.seconds = ffmpeg_cpu_seconds() + usage.ru_utime + usage.ru_stime
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise ffmpeg.Error("ffmpeg", out, stderr.read())
+    return out
+
+
+def _tmp_path(path: Path) -> Path:
+    """Private temporary name next to path, so concurrent writers never share one."""
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+@invalidation_bus.subscribe
+def _drop_atlas_caches(tags):
+    """Forget mappings and previews of atlases rebuilt by any worker."""
+    if tags is None:
+        with _atlas_handles_lock:
+            _atlas_handles.clear()
+        _preview_cache.clear()
+        return
+    for video_id in tagged_ids(tags, "atlas"):
+        with _atlas_handles_lock:
+            _atlas_handles.pop(video_id, None)
+        _preview_cache.invalidate_group(video_id)
+
+
+class FrameAtlasService:
+    """Builds and serves per-video downscaled frame atlases."""
+
+    def __init__(
+        self,
+        fps: float = settings.FRAME_ATLAS_FPS,
+        width: int = settings.FRAME_ATLAS_WIDTH,
+        height: int = settings.FRAME_ATLAS_HEIGHT,
+    ):
+        self.chunks_dir = Path("videos/chunks")
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.frame_bytes = width * height * 3
+
+    def atlas_path(self, video_id: uuid.UUID, generation: str) -> Path:
+        """Path of one generation of the raw frame array for a video."""
+        return self.chunks_dir / f"{video_id}_atlas.{generation}.u8"
+
+    def index_path(self, video_id: uuid.UUID) -> Path:
+        """Path of the JSON index describing the frame array."""
+        return self.chunks_dir / f"{video_id}_atlas.json"
+
+    @contextmanager
+    def atlas_lock(self, video_id: uuid.UUID) -> Iterator[None]:
+        """Hold the video's atlas lock, across processes and threads."""
+        fd = os.open(self.chunks_dir / f"{video_id}_atlas.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _read_index(self, video_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+        index_path = self.index_path(video_id)
+        if not index_path.exists():
+            return None
+        with open(index_path, "r") as f:
+            index = json.load(f)
+        if (
+            index.get("version") != ATLAS_VERSION
+            or index.get("fps") != self.fps
+            or index.get("width") != self.width
+            or index.get("height") != self.height
+        ):
+            return None
+        return index
+
+    def _write_index(self, video_id: uuid.UUID, index: Dict[str, Any]):
+        index_path = self.index_path(video_id)
+        tmp_path = _tmp_path(index_path)
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+
+    def _decode_chunk(self, chunk_path: Path) -> np.ndarray:
+        """Decode a chunk into low-rate, letterboxed RGB frames."""
+        w, h = self.width, self.height
+        with ffmpeg_job("atlas") as job:
+            out = _run_ffmpeg(
+                ffmpeg
+                .input(str(chunk_path))
+                .output(
+                    'pipe:',
+                    format='rawvideo',
+                    pix_fmt='rgb24',
+                    vf=(
+                        f'fps={self.fps},'
+                        f'scale={w}:{h}:force_original_aspect_ratio=decrease,'
+                        f'pad={w}:{h}:(ow-iw)/2:(oh-ih)/2'
+                    ),
+                )
+            )
+            job.media_seconds = len(out) // self.frame_bytes / self.fps
+        usable = len(out) - len(out) % self.frame_bytes
+        return np.frombuffer(out[:usable], dtype=np.uint8).reshape(-1, h, w, 3)
+
+    def build_atlas(self, video_id: uuid.UUID, chunks: List[Tuple[int, str, float, float, int]]) -> int:
+        """Append frames for chunks not yet in the atlas. Runs in a worker thread.
+
+        A sprite sheet built from the previous atlas is removed when frames are added.
+        """
+        with self.atlas_lock(video_id):
+            added = self._build_atlas(video_id, chunks)
+            if added:
+                # The sprite sheet no longer covers the whole atlas
+                self.sprite_path(video_id).unlink(missing_ok=True)
+                self.sprite_meta_path(video_id).unlink(missing_ok=True)
+        return added
+
+    def _build_atlas(self, video_id: uuid.UUID, chunks: List[Tuple[int, str, float, float, int]]) -> int:
+        index = self._read_index(video_id)
+
+        # A chunk that was re-encoded invalidates the frame offsets after it,
+        # so fall back to a full rebuild in that case.
+        if index is not None:
+            current = {str(c[0]): c for c in chunks}
+            for key, entry in index["chunks"].items():
+                chunk = current.get(key)
+                if chunk is None or chunk[1] != entry["filename"] or chunk[4] != entry["size"]:
+                    index = None
+                    break
+        rebuild = index is None or not self.atlas_path(video_id, index["generation"]).exists()
+        if rebuild:
+            index = {
+                "version": ATLAS_VERSION,
+                "generation": uuid.uuid4().hex,
+                "fps": self.fps,
+                "width": self.width,
+                "height": self.height,
+                "frames": 0,
+                "chunks": {},
+            }
+        atlas_path = self.atlas_path(video_id, index["generation"])
+
+        if not rebuild:
+            # Appending leaves the frames the published index covers untouched
+            added = self._append_chunks(atlas_path, index, chunks)
+            self._write_index(video_id, index)
+            return added
+
+        # Readers keep using the old generation until the index naming the new
+        # one is renamed into place; open memory maps keep the old inode
+        atlas_path.touch()
+        try:
+            added = self._append_chunks(atlas_path, index, chunks)
+            self._write_index(video_id, index)
+        except BaseException:
+            atlas_path.unlink(missing_ok=True)
+            raise
+        for stale in self.chunks_dir.glob(f"{video_id}_atlas*.u8"):
+            if stale != atlas_path:
+                stale.unlink(missing_ok=True)
+        return added
+
+    def _append_chunks(self, atlas_path: Path, index: Dict[str, Any], chunks: List[Tuple[int, str, float, float, int]]) -> int:
+        """Decode chunks missing from index onto the end of the atlas file, updating index."""
+        added = 0
+        for chunk_index, filename, start_time, end_time, size in chunks:
+            if str(chunk_index) in index["chunks"]:
+                continue
+            chunk_path = self.chunks_dir / filename
+            if not chunk_path.exists():
+                continue
+
+            frames = self._decode_chunk(chunk_path)
+            with open(atlas_path, "r+b") as f:
+                f.seek(index["frames"] * self.frame_bytes)
+                f.write(frames.tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+
+            index["chunks"][str(chunk_index)] = {
+                "filename": filename,
+                "start_time": start_time,
+                "end_time": end_time,
+                "size": size,
+                "offset": index["frames"],
+                "count": int(frames.shape[0]),
+            }
+            index["frames"] += int(frames.shape[0])
+            added += int(frames.shape[0])
+        return added
+
+    async def update_atlas(self, video_id: uuid.UUID, chunks: List[VideoChunk]) -> int:
+        """Decode any chunks missing from the atlas and append their frames."""
+        try:
+            chunk_info = [
+                (c.chunk_index, c.filename, c.start_time, c.end_time, c.size)
+                for c in sorted(chunks, key=lambda c: c.chunk_index)
+            ]
+            added = await asyncio.to_thread(self.build_atlas, video_id, chunk_info)
+            await invalidate(atlas_tag(video_id))
+            print(f"🖼️ Frame atlas for {video_id} updated: {added} new frames")
+            return added
+        except Exception as e:
+            print(f"Error updating frame atlas for {video_id}: {e}")
+            return 0
+
+    def load_atlas(self, video_id: uuid.UUID) -> Optional[Tuple[np.memmap, Dict[str, Any]]]:
+        """Memory-map the atlas for a video, reusing an open mapping when current."""
+        key = str(video_id)
+        index_path = self.index_path(video_id)
+        try:
+            mtime = index_path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+        with _atlas_handles_lock:
+            cached = _atlas_handles.get(key)
+            if cached and cached[0] == mtime:
+                return cached[1], cached[2]
+
+        index = self._read_index(video_id)
+        if not index or index["frames"] == 0:
+            return None
+        try:
+            # The index names its atlas generation, so a rebuild never pairs
+            # these offsets with another build's frames
+            with open(self.atlas_path(video_id, index["generation"]), "rb") as f:
+                atlas = np.memmap(f, dtype=np.uint8, mode="r", shape=(index["frames"], self.height, self.width, 3))
+        except FileNotFoundError:
+            return None
+        index["_starts"] = sorted(
+            (entry["start_time"], entry["offset"], entry["count"])
+            for entry in index["chunks"].values()
+        )
+        with _atlas_handles_lock:
+            _atlas_handles[key] = (mtime, atlas, index)
+        return atlas, index
+
+    def frame_index_for_time(self, index: Dict[str, Any], time_seconds: float) -> Optional[int]:
+        """Map a timestamp to a row of the atlas."""
+        starts = index["_starts"]
+        pos = bisect_right(starts, (time_seconds, float("inf"), 0)) - 1
+        if pos < 0:
+            return None
+        start_time, offset, count = starts[pos]
+        if count == 0:
+            return None
+        local = int((time_seconds - start_time) * self.fps)
+        return offset + max(0, min(local, count - 1))
+
+    def _encode(self, frame: np.ndarray, fmt: str, width: Optional[int] = None) -> bytes:
+        return encode_image(Image.fromarray(np.ascontiguousarray(frame)), fmt, width)
+
+    async def get_preview(
+        self,
+        video_id: uuid.UUID,
+        time_seconds: float,
+        fmt: str = "jpeg",
+        width: Optional[int] = None,
+    ) -> Optional[bytes]:
+        """Return an encoded preview for the given time, sliced from the atlas."""
+        loaded = self.load_atlas(video_id)
+        if loaded is None:
+            return None
+        atlas, index = loaded
+        frame_index = self.frame_index_for_time(index, time_seconds)
+        if frame_index is None:
+            return None
+
+        width = bound_width(width, native=self.width)
+        cache_key = (str(video_id), "frame", frame_index, fmt, width)
+        cached = _preview_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        data = await asyncio.to_thread(self._encode, atlas[frame_index], fmt, width)
+        _preview_cache.set(cache_key, data)
+        return data
+
+    def warm_grid(
+        self,
+        video_id: uuid.UUID,
+        grid_seconds: float,
+        formats: List[str],
+        width: Optional[int] = None,
+    ) -> int:
+        """Pre-encode previews every grid_seconds into the preview cache.
+
+        Synchronous so it can run on a background worker thread. Returns the
+        number of previews encoded.
+        """
+        loaded = self.load_atlas(video_id)
+        if loaded is None:
+            return 0
+        atlas, index = loaded
+        width = bound_width(width, native=self.width)
+        duration = self._duration(index)
+
+        encoded = 0
+        for time_seconds in np.arange(0, duration, grid_seconds):
+            frame_index = self.frame_index_for_time(index, float(time_seconds))
+            if frame_index is None:
+                continue
+            for fmt in formats:
+                cache_key = (str(video_id), "frame", frame_index, fmt, width)
+                if cache_key in _preview_cache:
+                    continue
+                _preview_cache.set(cache_key, self._encode(atlas[frame_index], fmt, width))
+                encoded += 1
+        return encoded
+
+    @staticmethod
+    def _duration(index: Dict[str, Any]) -> float:
+        return max((entry["end_time"] for entry in index["chunks"].values()), default=0.0)
+
+    def sprite_path(self, video_id: uuid.UUID) -> Path:
+        """Path of the timeline sprite sheet for a video."""
+        return self.chunks_dir / f"{video_id}_sprite.jpg"
+
+    def sprite_meta_path(self, video_id: uuid.UUID) -> Path:
+        """Path of the JSON sidecar describing the sprite sheet layout."""
+        return self.chunks_dir / f"{video_id}_sprite.json"
+
+    def load_sprite_meta(self, video_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+        """Return the sprite sheet layout if a sheet has been built."""
+        meta_path = self.sprite_meta_path(video_id)
+        if not meta_path.exists() or not self.sprite_path(video_id).exists():
+            return None
+        with open(meta_path, "r") as f:
+            return json.load(f)
+
+    def build_sprite_sheet(
+        self,
+        video_id: uuid.UUID,
+        interval: float,
+        columns: int,
+    ) -> Optional[Dict[str, Any]]:
+        """Tile one atlas frame every interval seconds into a JPEG sprite sheet.
+
+        Synchronous so it can run on a background worker thread.
+        """
+        with self.atlas_lock(video_id):
+            # Another worker may have built it while we waited for the lock
+            return self.load_sprite_meta(video_id) or self._build_sprite_sheet(video_id, interval, columns)
+
+    def _build_sprite_sheet(self, video_id: uuid.UUID, interval: float, columns: int) -> Optional[Dict[str, Any]]:
+        loaded = self.load_atlas(video_id)
+        if loaded is None:
+            return None
+        atlas, index = loaded
+
+        times = np.arange(0, self._duration(index), interval)
+        rows = [self.frame_index_for_time(index, float(t)) for t in times]
+        rows = [r for r in rows if r is not None]
+        if not rows:
+            return None
+
+        count = len(rows)
+        grid_rows = -(-count // columns)
+        tiles = np.zeros((grid_rows * columns, self.height, self.width, 3), dtype=np.uint8)
+        tiles[:count] = atlas[rows]
+        # (rows * cols, H, W, 3) -> (rows * H, cols * W, 3)
+        sheet = (
+            tiles.reshape(grid_rows, columns, self.height, self.width, 3)
+            .transpose(0, 2, 1, 3, 4)
+            .reshape(grid_rows * self.height, columns * self.width, 3)
+        )
+
+        sprite_path = self.sprite_path(video_id)
+        tmp_path = _tmp_path(sprite_path)
+        Image.fromarray(sheet).save(tmp_path, format="JPEG", quality=75)
+        os.replace(tmp_path, sprite_path)
+
+        meta = {
+            "interval": interval,
+            "columns": columns,
+            "rows": grid_rows,
+            "count": count,
+            "tile_width": self.width,
+            "tile_height": self.height,
+        }
+        meta_path = self.sprite_meta_path(video_id)
+        tmp_path = _tmp_path(meta_path)
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+        return meta
+
+    async def get_strip(self, video_id: uuid.UUID, count: int = 20, fmt: str = "jpeg") -> Optional[bytes]:
+        """Return a horizontal strip of evenly spaced atlas frames."""
+        loaded = self.load_atlas(video_id)
+        if loaded is None:
+            return None
+        atlas, index = loaded
+
+        cache_key = (str(video_id), "strip", count, fmt)
+        cached = _preview_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        rows = np.linspace(0, index["frames"] - 1, num=count).astype(np.int64)
+        # (count, H, W, 3) -> (H, count * W, 3)
+        strip = atlas[rows].transpose(1, 0, 2, 3).reshape(self.height, count * self.width, 3)
+        data = await asyncio.to_thread(self._encode, strip, fmt)
+        _preview_cache.set(cache_key, data)
+        return data
+
+    @staticmethod
+    def cache_stats() -> Dict[str, Any]:
+        """Return statistics for the encoded preview cache."""
+        return _preview_cache.stats()
+
+
+@lru_cache
+def get_frame_atlas_service() -> FrameAtlasService:
+    """Process-wide instance, built on first use; inject with Depends."""
+    return FrameAtlasService()
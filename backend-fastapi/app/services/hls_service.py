@@ -2,20 +2,61 @@
 HLS (HTTP Live Streaming) service for video streaming.
 """
 
+from __future__ import annotations
+
 import os
 import uuid
 import asyncio
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 import aiofiles
-import ffmpeg
-import m3u8
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.schemas.video_chunk import VideoChunkCreate
 from app.models.video_chunk import VideoChunk
+from app.core.cache import build_cache
+from app.core.config import settings
+from app.core.invalidation import invalidation_bus
+from app.core.lazy import lazy_import
+from app.core.metrics import ffmpeg_job
+from app.core.result_cache import hls_tag, invalidate, tagged_ids
+from app.services.image_encoding import bound_width, transcode_image
+
+ffmpeg = lazy_import("ffmpeg")
+m3u8 = lazy_import("m3u8")
+
+# Encoded thumbnail variants, keyed by (video_id, timestamp, format, width)
+_thumbnail_cache = build_cache(
+    "hls_thumbnails",
+    max_entries=20_000,
+    max_bytes=settings.PREVIEW_CACHE_MAX_BYTES,
+)
+
+# Playlist text, keyed by (video_id, quality); "master" for the master playlist
+_playlist_cache = build_cache("hls_playlists", max_entries=settings.HLS_PLAYLIST_CACHE_MAX_ENTRIES)
+
+# Segment bytes, keyed by (video_id, quality, segment)
+_segment_cache = build_cache(
+    "hls_segments",
+    max_entries=20_000,
+    max_bytes=settings.HLS_SEGMENT_CACHE_MAX_BYTES,
+)
+
+
+@invalidation_bus.subscribe
+def _drop_stream_caches(tags):
+    """Forget playlists, segments and thumbnails of streams regenerated or removed by any worker."""
+    caches = (_playlist_cache, _segment_cache, _thumbnail_cache)
+    if tags is None:
+        for cache in caches:
+            cache.clear()
+        return
+    for video_id in tagged_ids(tags, "hls"):
+        for cache in caches:
+            cache.invalidate_group(video_id)
 
 
 class HLSService:
@@ -60,13 +101,14 @@ class HLSService:
             for quality in self.quality_levels:
                 if quality["height"] <= original_height:
                     await self._create_quality_variant(
-                        video_id, video_path, quality, video_hls_dir, master_playlist
+                        video_id, video_path, quality, video_hls_dir, master_playlist, duration
                     )
             
             # Save master playlist
             master_playlist_path = video_hls_dir / "playlist.m3u8"
             with open(master_playlist_path, 'w') as f:
                 f.write(master_playlist.dumps())
+            await invalidate(hls_tag(video_id))
             
             # Generate thumbnail sprites for timeline preview
             await self._generate_thumbnail_sprites(video_id, video_path, video_hls_dir)
@@ -88,7 +130,8 @@ class HLSService:
         video_path: Path, 
         quality: Dict[str, Any], 
         output_dir: Path,
-        master_playlist: m3u8.M3U8
+        master_playlist: m3u8.M3U8,
+        duration: Optional[float] = None
     ):
         """Create a quality variant for HLS streaming."""
         try:
@@ -104,26 +147,27 @@ class HLSService:
             # Generate segments
             segment_pattern = quality_dir / "segment_%03d.ts"
             
-            (
-                ffmpeg
-                .input(str(video_path))
-                .output(
-                    str(segment_pattern),
-                    vcodec='libx264',
-                    acodec='aac',
-                    preset='fast',
-                    crf=23,
-                    vf=f'scale=-2:{quality["height"]}',
-                    b=f'{quality["bitrate"]}',
-                    segment_time=self.chunk_duration,
-                    segment_list_flags='+live',
-                    segment_list_type='m3u8',
-                    segment_list=str(quality_dir / "playlist.m3u8"),
-                    f='segment'
+            with ffmpeg_job("hls_variant", media_seconds=duration):
+                (
+                    ffmpeg
+                    .input(str(video_path))
+                    .output(
+                        str(segment_pattern),
+                        vcodec='libx264',
+                        acodec='aac',
+                        preset='fast',
+                        crf=23,
+                        vf=f'scale=-2:{quality["height"]}',
+                        b=f'{quality["bitrate"]}',
+                        segment_time=self.chunk_duration,
+                        segment_list_flags='+live',
+                        segment_list_type='m3u8',
+                        segment_list=str(quality_dir / "playlist.m3u8"),
+                        f='segment'
+                    )
+                    .overwrite_output()
+                    .run(quiet=True)
                 )
-                .overwrite_output()
-                .run(quiet=True)
-            )
             
             # Add variant to master playlist
             variant_uri = f"{quality['name']}/playlist.m3u8"
@@ -165,19 +209,20 @@ class HLSService:
                 
                 thumbnail_path = thumbnails_dir / f"{i}.jpg"
                 
-                (
-                    ffmpeg
-                    .input(str(video_path), ss=timestamp)
-                    .output(
-                        str(thumbnail_path),
-                        vframes=1,
-                        format='image2',
-                        vcodec='mjpeg',
-                        vf='scale=160:90'
+                with ffmpeg_job("hls_thumbnail"):
+                    (
+                        ffmpeg
+                        .input(str(video_path), ss=timestamp)
+                        .output(
+                            str(thumbnail_path),
+                            vframes=1,
+                            format='image2',
+                            vcodec='mjpeg',
+                            vf=f'scale={settings.HLS_THUMBNAIL_WIDTH}:-2'
+                        )
+                        .overwrite_output()
+                        .run(quiet=True)
                     )
-                    .overwrite_output()
-                    .run(quiet=True)
-                )
             
             # Create sprite sheet (optional - for more efficient loading)
             await self._create_sprite_sheet(thumbnails_dir, output_dir)
@@ -197,23 +242,44 @@ class HLSService:
     async def get_hls_playlist(self, video_id: uuid.UUID) -> str:
         """Get HLS master playlist content."""
         try:
-            video_hls_dir = self.hls_dir / str(video_id)
-            playlist_path = video_hls_dir / "playlist.m3u8"
-            
-            if not playlist_path.exists():
-                raise HTTPException(status_code=404, detail="HLS playlist not found")
-            
-            async with aiofiles.open(playlist_path, 'r') as f:
-                content = await f.read()
-            
-            return content
-            
+            return await self._read_playlist(video_id, "master", self.hls_dir / str(video_id) / "playlist.m3u8")
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Error getting HLS playlist: {e}")
             raise HTTPException(status_code=500, detail="Failed to get playlist")
 
+    async def get_variant_playlist(self, video_id: uuid.UUID, quality: str) -> str:
+        """Get the media playlist for one quality level."""
+        if quality not in {q["name"] for q in self.quality_levels}:
+            raise HTTPException(status_code=404, detail="Quality playlist not found")
+        try:
+            return await self._read_playlist(video_id, quality, self.hls_dir / str(video_id) / quality / "playlist.m3u8")
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Error getting {quality} playlist: {e}")
+            raise HTTPException(status_code=500, detail="Failed to get quality playlist")
+
+    async def _read_playlist(self, video_id: uuid.UUID, name: str, path: Path) -> str:
+        key = (str(video_id), name)
+        content = _playlist_cache.get(key)
+        if content is None:
+            if not path.exists():
+                raise HTTPException(status_code=404, detail="HLS playlist not found")
+            async with aiofiles.open(path, 'r') as f:
+                content = await f.read()
+            _playlist_cache.set(key, content, size=len(content))
+        return content
+
     async def get_hls_segment(self, video_id: uuid.UUID, quality: str, segment: str) -> bytes:
         """Get HLS segment content."""
+        if quality not in {q["name"] for q in self.quality_levels} or segment.startswith("."):
+            raise HTTPException(status_code=404, detail="Segment not found")
+        cache_key = (str(video_id), quality, segment)
+        cached = _segment_cache.get(cache_key)
+        if cached is not None:
+            return cached
         try:
             segment_path = self.hls_dir / str(video_id) / quality / segment
             
@@ -223,14 +289,29 @@ class HLSService:
             async with aiofiles.open(segment_path, 'rb') as f:
                 content = await f.read()
             
+            _segment_cache.set(cache_key, content)
             return content
             
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Error getting HLS segment: {e}")
             raise HTTPException(status_code=500, detail="Failed to get segment")
 
-    async def get_thumbnail(self, video_id: uuid.UUID, timestamp: int) -> bytes:
-        """Get thumbnail for specific timestamp."""
+    async def get_thumbnail(
+        self,
+        video_id: uuid.UUID,
+        timestamp: int,
+        fmt: str = "jpeg",
+        width: Optional[int] = None
+    ) -> bytes:
+        """Get thumbnail for specific timestamp, re-encoded to the requested format and width."""
+        width = bound_width(width, native=settings.HLS_THUMBNAIL_WIDTH)
+        cache_key = (str(video_id), timestamp, fmt, width)
+        cached = _thumbnail_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             thumbnails_dir = self.hls_dir / str(video_id) / "thumbnails"
             thumbnail_path = thumbnails_dir / f"{timestamp}.jpg"
@@ -241,8 +322,13 @@ class HLSService:
             async with aiofiles.open(thumbnail_path, 'rb') as f:
                 content = await f.read()
             
+            if fmt != "jpeg" or width < settings.HLS_THUMBNAIL_WIDTH:
+                content = await asyncio.to_thread(transcode_image, content, fmt, width)
+            _thumbnail_cache.set(cache_key, content)
             return content
             
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Error getting thumbnail: {e}")
             raise HTTPException(status_code=500, detail="Failed to get thumbnail")
@@ -254,5 +340,12 @@ class HLSService:
             if video_hls_dir.exists():
                 import shutil
                 shutil.rmtree(video_hls_dir)
+            await invalidate(hls_tag(video_id))
         except Exception as e:
             print(f"Error cleaning up HLS stream: {e}")
+
+
+@lru_cache
+def get_hls_service() -> HLSService:
+    """Process-wide instance, built on first use; inject with Depends."""
+    return HLSService()
@@ -0,0 +1,99 @@
+"""
+Image encoding and content negotiation for previews and thumbnails.
+"""
+
+from __future__ import annotations
+
+import io
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.lazy import lazy_import
+
+Image = lazy_import("PIL.Image")
+
+MEDIA_TYPES: Dict[str, str] = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+# Preferred order when the client accepts several formats equally
+FORMAT_PREFERENCE: List[str] = ["avif", "webp", "jpeg"]
+
+# Pillow save format name and encoder options per output format
+ENCODERS: Dict[str, Tuple[str, Dict[str, object]]] = {
+    "avif": ("AVIF", {"quality": 55, "speed": 8}),
+    "webp": ("WEBP", {"quality": 70, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 80, "optimize": True, "progressive": True}),
+}
+
+
+def supported_formats() -> List[str]:
+    """Formats the installed Pillow build can encode, in preference order."""
+    Image.init()
+    return [fmt for fmt in FORMAT_PREFERENCE if ENCODERS[fmt][0] in Image.SAVE]
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Pick the best output format for an ``Accept`` header.
+
+    Only explicitly listed image types count; wildcards fall back to JPEG,
+    which every client can decode.
+    """
+    if not accept:
+        return "jpeg"
+
+    qualities: Dict[str, float] = {}
+    for part in accept.split(","):
+        fields = [f.strip() for f in part.split(";")]
+        media_type = fields[0].lower()
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        qualities[media_type] = q
+
+    best, best_q = "jpeg", 0.0
+    for fmt in supported_formats():
+        q = qualities.get(MEDIA_TYPES[fmt], 0.0)
+        if q > best_q:
+            best, best_q = fmt, q
+    return best
+
+
+def bound_width(requested: Optional[int], native: Optional[int] = None) -> int:
+    """Snap a requested width to the allowed size ladder without upscaling."""
+    widths = sorted(settings.PREVIEW_WIDTHS)
+    if native:
+        widths = [w for w in widths if w <= native] or [native]
+    if requested is None:
+        return widths[-1]
+    for width in widths:
+        if width >= requested:
+            return width
+    return widths[-1]
+
+
+def encode_image(image: Image.Image, fmt: str, width: Optional[int] = None) -> bytes:
+    """Resize an image to width (keeping aspect ratio) and encode it as fmt."""
+    if width and image.width > width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.BILINEAR)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    save_format, options = ENCODERS[fmt]
+    buf = io.BytesIO()
+    image.save(buf, format=save_format, **options)
+    return buf.getvalue()
+
+
+def transcode_image(data: bytes, fmt: str, width: Optional[int] = None) -> bytes:
+    """Decode an encoded image and re-encode it at the requested format and width."""
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        return encode_image(image, fmt, width)
@@ -0,0 +1,141 @@
+"""
+Cancellation-aware scheduling for on-demand frame previews.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request
+
+from app.core.config import settings
+
+
+class PreviewCancelled(Exception):
+    """Raised when a preview job is abandoned before it finishes."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class PreviewScheduler:
+    """Bounded decode queue where the newest hover per session and video wins.
+
+    A preview job is cancelled, whether still queued or already decoding, when
+    the client disconnects or when a newer request arrives from the same
+    session for the same video. Sessions are named by the client in
+    ``X-Preview-Session`` (one id per player tab); requests without it are
+    only cancelled on disconnect, since clients behind one proxy or NAT
+    cannot be told apart.
+    """
+
+    def __init__(self, max_concurrency: int, poll_interval: float = 0.1):
+        self.poll_interval = poll_interval
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._active: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._cancel_reasons: Dict[asyncio.Task, str] = {}
+        self.max_concurrency = max_concurrency
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled_superseded = 0
+        self.cancelled_disconnected = 0
+
+    @staticmethod
+    def session_key(request: Request) -> Optional[str]:
+        """The client session a preview request belongs to, if the client named one."""
+        return request.headers.get("x-preview-session") or None
+
+    def _cancel(self, task: asyncio.Task, reason: str):
+        if not task.done() and task not in self._cancel_reasons:
+            self._cancel_reasons[task] = reason
+            task.cancel()
+
+    async def _execute(self, job: Callable[[], Awaitable[Any]]) -> Any:
+        self.queued += 1
+        waiting = True
+        try:
+            async with self._semaphore:
+                self.queued -= 1
+                waiting = False
+                self.running += 1
+                try:
+                    return await job()
+                finally:
+                    self.running -= 1
+        finally:
+            if waiting:
+                self.queued -= 1
+
+    async def _watch_disconnect(self, request: Request, task: asyncio.Task):
+        while not task.done():
+            if await request.is_disconnected():
+                self._cancel(task, "disconnected")
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    async def run(
+        self,
+        request: Request,
+        video_id: Any,
+        job: Callable[[], Awaitable[Any]],
+    ) -> Optional[Any]:
+        """Run a preview job, superseding any in-flight job for the same session and video."""
+        session = self.session_key(request)
+        key = (session, str(video_id)) if session is not None else None
+        previous = self._active.get(key) if key is not None else None
+        if previous is not None:
+            self._cancel(previous, "superseded")
+
+        task = asyncio.create_task(self._execute(job))
+        if key is not None:
+            self._active[key] = task
+        watcher = asyncio.create_task(self._watch_disconnect(request, task))
+        try:
+            result = await asyncio.shield(task)
+            self.completed += 1
+            return result
+        except asyncio.CancelledError:
+            reason = self._cancel_reasons.get(task)
+            if reason is None:
+                # The handler itself was cancelled; take the job down with it
+                self._cancel(task, "disconnected")
+                reason = "disconnected"
+                self._count_cancellation(reason)
+                raise
+            self._count_cancellation(reason)
+            raise PreviewCancelled(reason)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            watcher.cancel()
+            self._cancel_reasons.pop(task, None)
+            if key is not None and self._active.get(key) is task:
+                del self._active[key]
+
+    def _count_cancellation(self, reason: str):
+        if reason == "superseded":
+            self.cancelled_superseded += 1
+        else:
+            self.cancelled_disconnected += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return queue depth and cancellation counters."""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled_superseded": self.cancelled_superseded,
+            "cancelled_disconnected": self.cancelled_disconnected,
+        }
+
+
+# Process-wide scheduler shared by all preview requests
+preview_scheduler = PreviewScheduler(
+    max_concurrency=settings.PREVIEW_MAX_CONCURRENCY,
+    poll_interval=settings.PREVIEW_DISCONNECT_POLL_INTERVAL,
+)
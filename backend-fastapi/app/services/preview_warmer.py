@@ -0,0 +1,288 @@
+"""
+Popularity-driven background warming of preview frames and sprite sheets.
+
+Only one worker warms: the one holding an ``flock`` on the ``leader.lock``
+file in ``PREVIEW_WARMING_STATE_DIR``. The others retry the lock every cycle
+and take over if the leader exits. Warm requests (after ingest) may arrive in
+any worker, so they are queued as files in the ``requests`` directory there.
+"""
+
+import asyncio
+import fcntl
+import os
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.result_cache import atlas_tag, invalidate
+from app.models.video import Video
+from app.models.video_chunk import VideoChunk
+from app.services.frame_atlas import ffmpeg_cpu_seconds, get_frame_atlas_service, previews_shared
+from app.services.preview_scheduler import preview_scheduler
+
+
+def _lower_thread_priority():
+    """Renice the warming thread; ffmpeg processes it spawns inherit the niceness."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), settings.PREVIEW_WARMING_NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+def _cpu_seconds() -> float:
+    """CPU time used by this thread and the atlas decodes it ran."""
+    return time.thread_time() + ffmpeg_cpu_seconds()
+
+
+class PreviewWarmer:
+    """Precomputes previews for hot videos without competing with interactive requests.
+
+    Hot videos are ranked by queued warm requests, then by preview/stream
+    requests the leader has seen recently (its share of the host's traffic),
+    then by ``Video.views``. Work runs on a single low-priority thread, pauses
+    while interactive preview decodes are queued or running, and stops each
+    cycle once its CPU budget is spent.
+    """
+
+    def __init__(self):
+        self.state_dir = settings.PREVIEW_WARMING_STATE_DIR
+        self.requests_dir = os.path.join(self.state_dir, "requests")
+        self._requests: Deque[Tuple[float, str]] = deque()
+        self._leader_fd: Optional[int] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self.cycles = 0
+        self.videos_warmed = 0
+        self.previews_encoded = 0
+        self.sprites_built = 0
+        self.budget_exhausted = 0
+        self.last_cycle_cpu = 0.0
+
+    def record_request(self, video_id: Any):
+        """Note an interactive request for a video in the recent request log."""
+        now = time.monotonic()
+        self._requests.append((now, str(video_id)))
+        cutoff = now - settings.PREVIEW_WARMING_REQUEST_WINDOW
+        while self._requests and self._requests[0][0] < cutoff:
+            self._requests.popleft()
+
+    def request_warm(self, video_id: Any):
+        """Queue a video for warming on the leader's next cycle, e.g. right after ingest."""
+        try:
+            os.makedirs(self.requests_dir, exist_ok=True)
+            with open(os.path.join(self.requests_dir, str(uuid.UUID(str(video_id)))), "w"):
+                pass
+        except (OSError, ValueError) as e:
+            print(f"Error queueing preview warming for {video_id}: {e}")
+            return
+        self._wakeup.set()
+
+    def _take_requests(self) -> List[str]:
+        """Queued warm requests, oldest first, removed from the queue."""
+        try:
+            entries = sorted(os.scandir(self.requests_dir), key=lambda entry: entry.stat().st_mtime)
+        except FileNotFoundError:
+            return []
+        taken = []
+        for entry in entries:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                continue  # Taken by a previous leader
+            taken.append(entry.name)
+        return taken
+
+    def _try_lead(self) -> bool:
+        """Become the warming worker if no other worker holds the leader lock."""
+        if self._leader_fd is not None:
+            return True
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            fd = os.open(os.path.join(self.state_dir, "leader.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            print(f"Error opening preview warming lock: {e}")
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._leader_fd = fd
+        print(f"🔥 Preview warming runs in worker {os.getpid()}")
+        return True
+
+    async def _hot_videos(self) -> List[str]:
+        recent = Counter(video_id for _, video_id in self._requests)
+        limit = settings.PREVIEW_WARMING_TOP_VIDEOS
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Video.id)
+                .where(Video.isActive == True)
+                .order_by(Video.views.desc())
+                .limit(limit)
+            )
+            by_views = [str(video_id) for video_id in result.scalars().all()]
+
+        ranked = await asyncio.to_thread(self._take_requests)
+        ranked += [video_id for video_id, _ in recent.most_common(limit)]
+        ranked += by_views
+        # Deduplicate while keeping rank order
+        return list(dict.fromkeys(ranked))[:limit]
+
+    async def _load_chunks(self, video_id: str) -> List[VideoChunk]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(VideoChunk)
+                .where(VideoChunk.video_id == uuid.UUID(video_id))
+                .order_by(VideoChunk.chunk_index)
+            )
+            return result.scalars().all()
+
+    async def _yield_to_interactive(self):
+        while preview_scheduler.queued or preview_scheduler.running:
+            await asyncio.sleep(settings.PREVIEW_WARMING_BACKOFF)
+
+    async def _run_budgeted(self, fn, *args) -> Any:
+        """Run fn on the warming thread, then sleep to hold the configured CPU share."""
+        await self._yield_to_interactive()
+        loop = asyncio.get_running_loop()
+
+        def timed():
+            start = _cpu_seconds()
+            value = fn(*args)
+            return value, _cpu_seconds() - start
+
+        value, cpu = await loop.run_in_executor(self._executor, timed)
+        self.last_cycle_cpu += cpu
+        fraction = settings.PREVIEW_WARMING_CPU_FRACTION
+        if 0 < fraction < 1:
+            await asyncio.sleep(cpu * (1 - fraction) / fraction)
+        return value
+
+    def _over_budget(self) -> bool:
+        return self.last_cycle_cpu >= settings.PREVIEW_WARMING_CPU_BUDGET
+
+    async def warm_video(self, video_id: str):
+        """Ensure the atlas, grid previews and sprite sheet exist for one video.
+
+        The atlas is what makes the player's hover previews decoder-free. Grid
+        previews are only pre-encoded into a host-wide preview cache; in a
+        per-process cache only this worker would ever serve them.
+        """
+        atlas_service = get_frame_atlas_service()
+        vid = uuid.UUID(video_id)
+
+        if atlas_service.load_atlas(vid) is None:
+            chunks = await self._load_chunks(video_id)
+            if not chunks:
+                return
+            chunk_info = [
+                (c.chunk_index, c.filename, c.start_time, c.end_time, c.size) for c in chunks
+            ]
+            await self._run_budgeted(atlas_service.build_atlas, vid, chunk_info)
+            await invalidate(atlas_tag(vid))
+            if self._over_budget():
+                return
+
+        if previews_shared():
+            encoded = await self._run_budgeted(
+                atlas_service.warm_grid,
+                vid,
+                settings.PREVIEW_WARMING_GRID_SECONDS,
+                settings.PREVIEW_WARMING_FORMATS,
+            )
+            self.previews_encoded += encoded
+            if self._over_budget():
+                return
+
+        if atlas_service.load_sprite_meta(vid) is None:
+            meta = await self._run_budgeted(
+                atlas_service.build_sprite_sheet,
+                vid,
+                settings.PREVIEW_WARMING_GRID_SECONDS,
+                settings.SPRITE_COLUMNS,
+            )
+            if meta:
+                self.sprites_built += 1
+        self.videos_warmed += 1
+
+    async def run_cycle(self):
+        """Warm the current set of hot videos within one cycle's CPU budget."""
+        self.last_cycle_cpu = 0.0
+        for video_id in await self._hot_videos():
+            try:
+                await self.warm_video(video_id)
+            except Exception as e:
+                print(f"Error warming previews for {video_id}: {e}")
+            if self._over_budget():
+                self.budget_exhausted += 1
+                break
+        self.cycles += 1
+
+    async def _loop(self):
+        while True:
+            self._wakeup.clear()
+            if self._try_lead():
+                try:
+                    await self.run_cycle()
+                except Exception as e:
+                    print(f"Preview warming cycle failed: {e}")
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=settings.PREVIEW_WARMING_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the background warming loop."""
+        if self._task is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix="preview-warmer",
+                initializer=_lower_thread_priority,
+            )
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Stop the warming loop and its worker thread."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._leader_fd is not None:
+            os.close(self._leader_fd)  # Lets another worker take over
+            self._leader_fd = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return warming counters."""
+        return {
+            "running": self._task is not None,
+            "leader": self._leader_fd is not None,
+            "cycles": self.cycles,
+            "videos_warmed": self.videos_warmed,
+            "previews_encoded": self.previews_encoded,
+            "sprites_built": self.sprites_built,
+            "budget_exhausted": self.budget_exhausted,
+            "last_cycle_cpu_seconds": round(self.last_cycle_cpu, 3),
+            "recent_requests": len(self._requests),
+        }
+
+
+# Process-wide warmer fed by the preview and streaming endpoints
+preview_warmer = PreviewWarmer()
@@ -0,0 +1,163 @@
+"""
+Startup warm-up and readiness state for the ``/ready`` probe.
+
+``/health`` only says the process is up. A new replica reports ready once it
+has opened its database pool, confirmed ffmpeg runs, and preloaded chunk
+boundary indexes and HLS playlists for the most-viewed videos, so the first
+requests routed to it do not pay for cold caches.
+"""
+
+import asyncio
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import select, text
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, engine, replica_engine, replica_monitor
+from app.core.db_pool import per_worker
+from app.models.video import Video
+from app.services.hls_service import get_hls_service
+from app.services.video_processing import get_video_processing_service
+
+
+class Readiness:
+    """Runs the warm-up steps in the background and tracks whether the replica is ready.
+
+    Database and ffmpeg checks are required: while either fails the warm-up
+    retries every ``WARMUP_RETRY_INTERVAL`` seconds and ``/ready`` stays 503.
+    Cache preloading is best effort; a failure there is recorded but does not
+    hold readiness back.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.attempts = 0
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _step(self, name: str, run: Callable[[], Awaitable[Any]]) -> bool:
+        """Run one warm-up step, recording its duration and outcome."""
+        start = time.perf_counter()
+        try:
+            detail = await run()
+            ok = True
+        except Exception as e:
+            detail = f"{type(e).__name__}: {e}"
+            ok = False
+        if not ok and self.steps.get(name, {}).get("ok", True):
+            print(f"⚠️ Warm-up step {name} failed: {detail}")
+        self.steps[name] = {
+            "ok": ok,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            "detail": detail,
+        }
+        return ok
+
+    async def _warm_database(self) -> Dict[str, Any]:
+        """Open pool connections up front so early requests do not pay for connects."""
+        count = max(1, min(settings.WARMUP_DB_CONNECTIONS, per_worker(settings.DB_POOL_SIZE)))
+        async with AsyncExitStack() as stack:
+            for _ in range(count):
+                conn = await stack.enter_async_context(engine.connect())
+                await conn.execute(text("SELECT 1"))
+        detail: Dict[str, Any] = {"connections": count}
+        if replica_engine is not None:
+            # Decide replica routing before traffic arrives; an unhealthy replica is not fatal
+            detail["replica_healthy"] = await replica_monitor.check()
+        return detail
+
+    async def _check_ffmpeg(self) -> str:
+        """Make sure the ffmpeg binary is installed and runs."""
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-version",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout=settings.WARMUP_FFMPEG_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg -version exited with {process.returncode}")
+        return stdout.decode(errors="replace").splitlines()[0] if stdout else "ffmpeg"
+
+    async def _preload_caches(self) -> Dict[str, int]:
+        """Load chunk indexes and playlists of the most-viewed videos into memory."""
+        processing = get_video_processing_service()
+        hls = get_hls_service()
+        indexes = playlists = 0
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Video.id)
+                .where(Video.isActive.is_(True))
+                .order_by(Video.views.desc().nulls_last())
+                .limit(settings.WARMUP_TOP_VIDEOS)
+            )
+            video_ids = result.scalars().all()
+            for video_id in video_ids:
+                if await processing.get_chunk_index(video_id, db):
+                    indexes += 1
+                video_hls_dir = hls.hls_dir / str(video_id)
+                if not (video_hls_dir / "playlist.m3u8").exists():
+                    continue
+                await hls.get_hls_playlist(video_id)
+                playlists += 1
+                for quality in hls.quality_levels:
+                    if (video_hls_dir / quality["name"] / "playlist.m3u8").exists():
+                        await hls.get_variant_playlist(video_id, quality["name"])
+                        playlists += 1
+        return {"videos": len(video_ids), "chunk_indexes": indexes, "playlists": playlists}
+
+    async def _run(self):
+        self.started_at = time.time()
+        while True:
+            self.attempts += 1
+            ok = await self._step("database", self._warm_database)
+            ok = await self._step("ffmpeg", self._check_ffmpeg) and ok
+            if ok:
+                break
+            await asyncio.sleep(settings.WARMUP_RETRY_INTERVAL)
+
+        await self._step("caches", self._preload_caches)
+        self.ready = True
+        self.ready_at = time.time()
+        print(f"✅ Warm-up finished in {self.ready_at - self.started_at:.1f}s; ready for traffic")
+
+    def start(self):
+        """Begin warming up; with warm-up disabled the replica is ready at once."""
+        if not settings.WARMUP_ENABLED:
+            self.ready = True
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Report not ready while shutting down and cancel an unfinished warm-up."""
+        self.ready = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return readiness and per-step warm-up results for the probe."""
+        return {
+            "status": "ready" if self.ready else "warming_up",
+            "attempts": self.attempts,
+            "warmup_seconds": round(self.ready_at - self.started_at, 3)
+            if self.ready_at is not None and self.started_at is not None else None,
+            "steps": self.steps,
+        }
+
+
+# Process-wide readiness state; started by the app lifespan
+readiness = Readiness()
@@ -5,19 +5,63 @@ Video processing service for handling video files and chunking.
 import os
 import uuid
 import asyncio
+import bisect
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, NamedTuple, Tuple
 import aiofiles
-import ffmpeg
-import cv2
-import numpy as np
-from fastapi import UploadFile
+from fastapi import Request, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.core.cache import build_cache
+from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.core.metrics import ffmpeg_job
+from app.core.invalidation import invalidation_bus
+from app.core.result_cache import chunks_tag, invalidate, tagged_ids
 from app.schemas.video import VideoCreate
 from app.schemas.video_chunk import VideoChunkCreate
 from app.models.video_chunk import VideoChunk
+from app.services.frame_atlas import get_frame_atlas_service
+from app.services.image_encoding import bound_width, transcode_image
+from app.services.preview_scheduler import PreviewCancelled, preview_scheduler
+from app.services.preview_warmer import preview_warmer
+from app.services.waveform_service import get_waveform_service
+
+ffmpeg = lazy_import("ffmpeg")
+
+# Encoded frame previews, keyed by (video_id, time, format, width)
+_frame_preview_cache = build_cache(
+    "frame_previews",
+    max_entries=10_000,
+    max_bytes=settings.PREVIEW_CACHE_MAX_BYTES,
+)
+
+
+class ChunkBoundary(NamedTuple):
+    """The parts of a chunk row needed to map a timestamp onto a chunk file."""
+    chunk_index: int
+    filename: str
+    start_time: float
+    end_time: float
+    width: Optional[int]
+
+
+# Chunk boundaries per video, ordered by chunk_index
+_chunk_index_cache = build_cache("chunk_indexes", max_entries=settings.CHUNK_INDEX_CACHE_MAX_ENTRIES)
+
+
+@invalidation_bus.subscribe
+def _drop_chunk_caches(tags):
+    """Chunk boundaries and frames change when a video's chunks are rewritten."""
+    if tags is None:
+        _chunk_index_cache.clear()
+        _frame_preview_cache.clear()
+        return
+    for video_id in tagged_ids(tags, "chunks"):
+        _chunk_index_cache.delete(video_id)
+        _frame_preview_cache.invalidate_group(video_id)
 
 
 class VideoProcessingService:
@@ -90,13 +134,14 @@ class VideoProcessingService:
             thumbnail_path = self.thumbnails_dir / f"{video_id}_thumb.jpg"
             
             # Generate thumbnail at 10 seconds
-            (
-                ffmpeg
-                .input(str(file_path), ss=10)
-                .output(str(thumbnail_path), vframes=1, format='image2', vcodec='mjpeg')
-                .overwrite_output()
-                .run(quiet=True)
-            )
+            with ffmpeg_job("thumbnail"):
+                (
+                    ffmpeg
+                    .input(str(file_path), ss=10)
+                    .output(str(thumbnail_path), vframes=1, format='image2', vcodec='mjpeg')
+                    .overwrite_output()
+                    .run(quiet=True)
+                )
             
             print(f"Thumbnail generated for {video_id}")
         except Exception as e:
@@ -168,7 +213,14 @@ class VideoProcessingService:
                 chunk_index += 1
             
             await db.commit()
+            await invalidate(chunks_tag(video_id))
             print(f"Video {video_id} chunked into {len(chunks)} segments")
+            
+            # Extend the frame atlas with the new chunks for decoder-free previews
+            all_chunks = await self.get_video_chunks(video_id, db)
+            await get_frame_atlas_service().update_atlas(video_id, all_chunks)
+            await get_waveform_service().generate_for_chunks(video_id, all_chunks)
+            preview_warmer.request_warm(video_id)
             return chunks
             
         except Exception as e:
@@ -180,18 +232,19 @@ class VideoProcessingService:
         """Create a video chunk using ffmpeg."""
         try:
             print(f"Creating chunk: {start_time}s - {start_time + duration}s (duration: {duration}s)")
-            (
-                ffmpeg
-                .input(str(input_path), ss=start_time, t=duration)
-                .output(str(output_path), 
-                       vcodec='libx264', 
-                       acodec='aac',
-                       preset='fast',
-                       crf=23,
-                       avoid_negative_ts='make_zero')
-                .overwrite_output()
-                .run(quiet=False, capture_stdout=True, capture_stderr=True)
-            )
+            with ffmpeg_job("chunk", media_seconds=duration):
+                (
+                    ffmpeg
+                    .input(str(input_path), ss=start_time, t=duration)
+                    .output(str(output_path), 
+                           vcodec='libx264', 
+                           acodec='aac',
+                           preset='fast',
+                           crf=23,
+                           avoid_negative_ts='make_zero')
+                    .overwrite_output()
+                    .run(quiet=False, capture_stdout=True, capture_stderr=True)
+                )
             print(f"✅ Chunk created successfully: {output_path}")
         except Exception as e:
             print(f"❌ Error creating chunk {output_path}: {e}")
@@ -206,22 +259,62 @@ class VideoProcessingService:
         )
         return result.scalars().all()
 
-    async def get_chunk_for_time(self, video_id: uuid.UUID, time_seconds: float, db: AsyncSession) -> Optional[VideoChunk]:
-        """Get the chunk that contains the specified time."""
-        result = await db.execute(
-            select(VideoChunk)
-            .where(
-                VideoChunk.video_id == video_id,
-                VideoChunk.start_time <= time_seconds,
-                VideoChunk.end_time >= time_seconds
+    async def get_chunk_index(self, video_id: uuid.UUID, db: AsyncSession) -> Tuple[ChunkBoundary, ...]:
+        """Get a video's chunk boundaries, loading them from the database once."""
+        key = str(video_id)
+        index = _chunk_index_cache.get(key)
+        if index is None:
+            result = await db.execute(
+                select(
+                    VideoChunk.chunk_index,
+                    VideoChunk.filename,
+                    VideoChunk.start_time,
+                    VideoChunk.end_time,
+                    VideoChunk.width
+                )
+                .where(VideoChunk.video_id == video_id)
+                .order_by(VideoChunk.chunk_index)
             )
-            .order_by(VideoChunk.chunk_index)
-            .limit(1)
-        )
-        return result.scalar_one_or_none()
+            index = tuple(ChunkBoundary(*row) for row in result.all())
+            # Not-yet-chunked videos are not cached; chunking may finish in another worker
+            if index:
+                _chunk_index_cache.set(key, index)
+        return index
+
+    async def get_chunk_for_time(self, video_id: uuid.UUID, time_seconds: float, db: AsyncSession) -> Optional[ChunkBoundary]:
+        """Get the chunk that contains the specified time."""
+        index = await self.get_chunk_index(video_id, db)
+        # Last chunk starting at or before the time; on a shared boundary the
+        # earlier chunk wins, as it did with ORDER BY chunk_index LIMIT 1
+        position = bisect.bisect_right(index, time_seconds, key=lambda c: c.start_time) - 1
+        while position > 0 and index[position - 1].end_time >= time_seconds:
+            position -= 1
+        if position < 0 or index[position].end_time < time_seconds:
+            return None
+        return index[position]
 
-    async def generate_frame_preview(self, video_id: uuid.UUID, time_seconds: float, db: AsyncSession) -> Optional[bytes]:
-        """Generate a frame preview for the specified time."""
+    async def generate_frame_preview(
+        self,
+        video_id: uuid.UUID,
+        time_seconds: float,
+        db: AsyncSession,
+        request: Optional[Request] = None,
+        fmt: str = "jpeg",
+        width: Optional[int] = None
+    ) -> Optional[bytes]:
+        """Generate a frame preview for the specified time.
+        
+        The frame is scaled to a width from the allowed size ladder and encoded
+        as fmt; each variant is cached. When the originating request is passed,
+        the decode is scheduled through the shared preview scheduler so
+        abandoned hovers are cancelled.
+        """
+        width = bound_width(width)
+        cache_key = (str(video_id), round(time_seconds, 2), fmt, width)
+        cached = _frame_preview_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             # Get the chunk for this time
             chunk = await self.get_chunk_for_time(video_id, time_seconds, db)
@@ -234,21 +327,55 @@ class VideoProcessingService:
             
             # Calculate relative time within the chunk
             relative_time = time_seconds - chunk.start_time
+            if chunk.width:
+                width = min(width, chunk.width)
             
             # Generate frame using ffmpeg
-            frame_data = (
-                ffmpeg
-                .input(str(chunk_path), ss=relative_time)
-                .output('pipe:', vframes=1, format='image2', vcodec='mjpeg', pix_fmt='rgb24')
-                .run(capture_stdout=True, quiet=True)
-            )[0]
+            if request is not None:
+                frame_data = await preview_scheduler.run(
+                    request, video_id, lambda: self._extract_frame(chunk_path, relative_time, width)
+                )
+            else:
+                frame_data = await self._extract_frame(chunk_path, relative_time, width)
+            if not frame_data:
+                return None
             
-            return frame_data
+            encoded = await asyncio.to_thread(transcode_image, frame_data, fmt)
+            _frame_preview_cache.set(cache_key, encoded)
+            return encoded
             
+        except PreviewCancelled:
+            raise
         except Exception as e:
             print(f"Error generating frame preview for {video_id} at {time_seconds}s: {e}")
             return None
 
+    async def _extract_frame(self, chunk_path: Path, relative_time: float, width: int) -> bytes:
+        """Decode and scale a single frame in a subprocess that is killed if the caller is cancelled.
+        
+        The frame is emitted as uncompressed BMP so the only lossy encode is
+        the final one done with Pillow.
+        """
+        args = (
+            ffmpeg
+            .input(str(chunk_path), ss=relative_time)
+            .output('pipe:', vframes=1, format='image2pipe', vcodec='bmp', vf=f'scale={width}:-2')
+            .compile()
+        )
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        with ffmpeg_job("frame"):
+            try:
+                stdout, _ = await process.communicate()
+            except asyncio.CancelledError:
+                process.kill()
+                await process.wait()
+                raise
+        return stdout
+
     async def generate_timeline_thumbnails(self, video_id: uuid.UUID, db: AsyncSession, num_thumbnails: int = 20) -> List[bytes]:
         """Generate thumbnails for timeline preview."""
         try:
@@ -272,3 +399,9 @@ class VideoProcessingService:
         except Exception as e:
             print(f"Error generating timeline thumbnails for {video_id}: {e}")
             return []
+
+
+@lru_cache
+def get_video_processing_service() -> VideoProcessingService:
+    """Process-wide instance, built on first use; inject with Depends."""
+    return VideoProcessingService()
@@ -5,11 +5,17 @@ Video service for business logic.
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from sqlalchemy.orm import selectinload
+from collections import defaultdict
 from typing import List, Optional
 from uuid import UUID
 
+from app.core.pagination import count_rows, keyset_page, split_page
+from app.core.result_cache import VIDEO_LIST_TAG, annotations_tag, chunks_tag, invalidate, video_tag
+from app.models.annotation import Annotation
 from app.models.video import Video
+from app.schemas.serializers import VideoPage, annotation_serializer, video_serializer
 from app.schemas.video import VideoCreate, VideoUpdate
+from app.services.view_counter import view_counter
 
 
 class VideoService:
@@ -24,6 +30,7 @@ class VideoService:
         self.db.add(video)
         await self.db.commit()
         await self.db.refresh(video)
+        await invalidate(VIDEO_LIST_TAG)
         return video
     
     async def get_by_id(self, video_id: UUID) -> Optional[Video]:
@@ -46,6 +53,43 @@ class VideoService:
         )
         return result.scalars().all()
     
+    async def get_page(
+        self,
+        after: Optional[str] = None,
+        limit: int = 100,
+        count: str = "estimate",
+    ) -> VideoPage:
+        """Get a newest-first page of videos after a cursor.
+        
+        Rows are read without ORM instances and returned as a payload ready
+        for JSON encoding, with the next page's cursor (None on the last page)
+        and the total per the count mode.
+        """
+        result = await self.db.execute(
+            keyset_page(video_serializer.select(), Video.createdAt, Video.id, after, limit)
+        )
+        videos, next_cursor = split_page(
+            video_serializer.dump_all(result.all()), limit, key=lambda v: (v["created_at"], v["id"])
+        )
+        
+        # One query for the annotations of the whole page, like selectinload
+        by_video = defaultdict(list)
+        if videos:
+            result = await self.db.execute(
+                annotation_serializer.select()
+                .where(Annotation.videoId.in_([v["id"] for v in videos]))
+                .order_by(Annotation.videoId, Annotation.startTime)
+            )
+            for annotation in annotation_serializer.dump_all(result.all()):
+                by_video[annotation["videoId"]].append(annotation)
+        for video in videos:
+            video["annotations"] = by_video.get(video["id"], [])
+        
+        total = await count_rows(self.db, select(Video.id), count)
+        return VideoPage(
+            videos=videos, total=total, page=None if after else 1, size=limit, next_cursor=next_cursor
+        )
+    
     async def update(self, video_id: UUID, video_data: VideoUpdate) -> Optional[Video]:
         """Update a video."""
         result = await self.db.execute(
@@ -62,6 +106,7 @@ class VideoService:
         
         await self.db.commit()
         await self.db.refresh(video)
+        await invalidate(VIDEO_LIST_TAG, video_tag(video_id))
         return video
     
     async def delete(self, video_id: UUID) -> bool:
@@ -76,22 +121,12 @@ class VideoService:
         
         await self.db.delete(video)
         await self.db.commit()
+        await invalidate(VIDEO_LIST_TAG, video_tag(video_id), annotations_tag(video_id), chunks_tag(video_id))
         return True
     
-    async def increment_views(self, video_id: UUID) -> Optional[Video]:
-        """Increment video views."""
-        result = await self.db.execute(
-            select(Video).where(Video.id == video_id)
-        )
-        video = result.scalar_one_or_none()
-        
-        if not video:
-            return None
-        
-        video.views += 1
-        await self.db.commit()
-        await self.db.refresh(video)
-        return video
+    async def increment_views(self, video_id: UUID) -> Optional[int]:
+        """Count a view. Returns the approximate view count, or None if not found."""
+        return await view_counter.increment(self.db, video_id)
     
     async def get_count(self) -> int:
         """Get total video count."""
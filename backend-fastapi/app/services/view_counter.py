@@ -0,0 +1,135 @@
+"""
+Write-behind view counter.
+
+Views are aggregated in memory per video and written in one batched
+``UPDATE videos SET views = views + v.n FROM (VALUES ...) v`` on a timer and at
+shutdown, so a hot video costs no row lock per play. Counts returned to
+clients are the last persisted value plus pending increments, i.e. approximate
+while other workers are counting too.
+"""
+
+import asyncio
+import uuid
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Integer, column, func, select, update, values
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.result_cache import VIDEO_LIST_TAG, invalidate, video_tag
+from app.models.video import Video
+
+
+class ViewCounter:
+    """Aggregates view increments and flushes them in batches."""
+
+    def __init__(self, flush_interval: float = settings.VIEW_COUNT_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending: Dict[uuid.UUID, int] = {}
+        # Last persisted views per video; also doubles as the existence check
+        self._persisted = LRUCache("view_counts", max_entries=50_000)
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.views_flushed = 0
+        self.flush_failures = 0
+
+    async def increment(self, db: AsyncSession, video_id: uuid.UUID) -> Optional[int]:
+        """Count one view. Returns the approximate total, or None if the video doesn't exist."""
+        persisted = self._persisted.get(video_id)
+        if persisted is None:
+            result = await db.execute(select(Video.views).where(Video.id == video_id))
+            row = result.first()
+            if row is None:
+                return None
+            persisted = row[0] or 0
+            self._persisted.set(video_id, persisted)
+
+        pending = self._pending.get(video_id, 0) + 1
+        self._pending[video_id] = pending
+        return persisted + pending
+
+    async def flush(self) -> int:
+        """Write all pending increments in one statement. Returns rows updated."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+
+            increments = values(
+                column("id", UUID(as_uuid=True)), column("n", Integer), name="v"
+            ).data(list(batch.items()))
+            statement = (
+                update(Video)
+                .where(Video.id == increments.c.id)
+                .values(views=func.coalesce(Video.views, 0) + increments.c.n)
+                .returning(Video.id, Video.views)
+                .execution_options(synchronize_session=False)
+            )
+            try:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(statement)
+                    rows = result.all()
+                    await db.commit()
+            except Exception as e:
+                # Put the batch back so the views are retried on the next flush
+                for video_id, n in batch.items():
+                    self._pending[video_id] = self._pending.get(video_id, 0) + n
+                self.flush_failures += 1
+                print(f"Error flushing view counts: {e}")
+                return 0
+
+            for video_id, views in rows:
+                self._persisted.set(video_id, views)
+            # Videos deleted since they were viewed simply drop out of the join
+            for video_id in batch.keys() - {video_id for video_id, _ in rows}:
+                self._persisted.delete(video_id)
+            if rows:
+                # Cached query results still carry the old view counts; listings
+                # include views too, as with any other video update
+                await invalidate(VIDEO_LIST_TAG, *(video_tag(video_id) for video_id, _ in rows))
+
+            self.flushes += 1
+            self.rows_flushed += len(rows)
+            self.views_flushed += sum(batch.values())
+            return len(rows)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flush loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Stop the flush loop and write out whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return flush counters and the current backlog."""
+        return {
+            "pending_videos": len(self._pending),
+            "pending_views": sum(self._pending.values()),
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "views_flushed": self.views_flushed,
+            "flush_failures": self.flush_failures,
+        }
+
+
+# Process-wide counter; flushed by the app lifespan
+view_counter = ViewCounter()
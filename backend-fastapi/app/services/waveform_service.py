@@ -0,0 +1,182 @@
+"""
+Audio waveform peaks for the player timeline.
+
+Audio is decoded once per video to mono 16-bit PCM at a low sample rate and
+reduced to one (min, max) pair per fixed time bucket. Peaks are stored as an
+``int8`` array of shape ``(N, 2)`` so a two-hour recording fits in well under
+a megabyte on disk, and requests are served downsampled to the bucket count
+the client actually renders.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.cache import build_cache
+from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.core.metrics import ffmpeg_job
+from app.models.video_chunk import VideoChunk
+
+ffmpeg = lazy_import("ffmpeg")
+np = lazy_import("numpy")
+
+# Downsampled waveforms, keyed by (video_id, file mtime, bucket count)
+_waveform_cache = build_cache("waveforms", max_entries=2_000, max_bytes=16 * 1024 * 1024)
+
+
+class WaveformService:
+    """Computes, stores and downsamples per-video audio peaks."""
+
+    def __init__(
+        self,
+        sample_rate: int = settings.WAVEFORM_SAMPLE_RATE,
+        peaks_per_second: int = settings.WAVEFORM_PEAKS_PER_SECOND,
+    ):
+        self.videos_dir = Path("videos")
+        self.chunks_dir = Path("videos/chunks")
+        self.sample_rate = sample_rate
+        self.peaks_per_second = peaks_per_second
+        self.samples_per_bucket = sample_rate // peaks_per_second
+
+    def peaks_path(self, video_id: uuid.UUID) -> Path:
+        """Path of the stored (N, 2) int8 peaks array."""
+        return self.chunks_dir / f"{video_id}_peaks.npy"
+
+    def meta_path(self, video_id: uuid.UUID) -> Path:
+        """Path of the JSON sidecar describing the peaks resolution."""
+        return self.chunks_dir / f"{video_id}_peaks.json"
+
+    def _compute(self, sources: List[Path]) -> np.ndarray:
+        """Decode sources back to back and reduce them to min/max peaks per bucket."""
+        spb = self.samples_per_bucket
+        block_samples = spb * 4096
+        peaks: List[np.ndarray] = []
+        carry = np.empty(0, dtype=np.int16)
+
+        for source in sources:
+            with ffmpeg_job("waveform") as job:
+                process = (
+                    ffmpeg
+                    .input(str(source))
+                    .output('pipe:', format='s16le', acodec='pcm_s16le', ac=1, ar=self.sample_rate)
+                    .global_args('-loglevel', 'error', '-nostats')
+                    .run_async(pipe_stdout=True)
+                )
+                decoded = 0
+                try:
+                    while True:
+                        raw = process.stdout.read(block_samples * 2)
+                        if not raw:
+                            break
+                        decoded += len(raw) // 2
+                        samples = np.frombuffer(raw[: len(raw) - len(raw) % 2], dtype=np.int16)
+                        if carry.size:
+                            samples = np.concatenate([carry, samples])
+                        usable = samples.size - samples.size % spb
+                        carry = samples[usable:].copy()
+                        if usable:
+                            buckets = samples[:usable].reshape(-1, spb)
+                            peaks.append(np.stack([buckets.min(axis=1), buckets.max(axis=1)], axis=1))
+                finally:
+                    process.stdout.close()
+                    process.wait()
+                job.media_seconds = decoded / self.sample_rate
+
+        if carry.size:
+            peaks.append(np.array([[carry.min(), carry.max()]], dtype=np.int16))
+        if not peaks:
+            return np.empty((0, 2), dtype=np.int8)
+        # int16 -> int8 keeps the shape of the waveform at a quarter of the size
+        return (np.concatenate(peaks) >> 8).astype(np.int8)
+
+    def generate_peaks(self, video_id: uuid.UUID, sources: List[Path]) -> Optional[Dict[str, Any]]:
+        """Compute and store peaks for a video. Runs in a worker thread."""
+        peaks = self._compute([source for source in sources if source.exists()])
+        if peaks.shape[0] == 0:
+            return None
+
+        peaks_path = self.peaks_path(video_id)
+        tmp_path = peaks_path.with_suffix(".tmp.npy")
+        np.save(tmp_path, peaks)
+        os.replace(tmp_path, peaks_path)
+
+        meta = {
+            "peaks_per_second": self.peaks_per_second,
+            "sample_rate": self.sample_rate,
+            "count": int(peaks.shape[0]),
+            "duration": peaks.shape[0] / self.peaks_per_second,
+        }
+        meta_path = self.meta_path(video_id)
+        with open(meta_path.with_suffix(".json.tmp"), "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path.with_suffix(".json.tmp"), meta_path)
+        _waveform_cache.invalidate_group(str(video_id))
+        return meta
+
+    async def generate_for_chunks(self, video_id: uuid.UUID, chunks: List[VideoChunk]) -> Optional[Dict[str, Any]]:
+        """Ingest stage: compute peaks across a video's chunks in order."""
+        try:
+            sources = [
+                self.chunks_dir / chunk.filename
+                for chunk in sorted(chunks, key=lambda c: c.chunk_index)
+            ]
+            meta = await asyncio.to_thread(self.generate_peaks, video_id, sources)
+            if meta:
+                print(f"🔊 Waveform for {video_id} computed: {meta['count']} peaks")
+            return meta
+        except Exception as e:
+            print(f"Error computing waveform for {video_id}: {e}")
+            return None
+
+    @staticmethod
+    def downsample(peaks: np.ndarray, buckets: int) -> np.ndarray:
+        """Merge peaks into at most `buckets` (min, max) pairs."""
+        if buckets >= peaks.shape[0]:
+            return peaks
+        edges = np.linspace(0, peaks.shape[0], num=buckets, endpoint=False).astype(np.int64)
+        mins = np.minimum.reduceat(peaks[:, 0], edges)
+        maxs = np.maximum.reduceat(peaks[:, 1], edges)
+        return np.stack([mins, maxs], axis=1)
+
+    def get_waveform(self, video_id: uuid.UUID, buckets: int) -> Optional[Tuple[bytes, Dict[str, Any], str]]:
+        """Return interleaved int8 min/max bytes, the metadata and an ETag."""
+        peaks_path = self.peaks_path(video_id)
+        meta_path = self.meta_path(video_id)
+        try:
+            stat = peaks_path.stat()
+        except FileNotFoundError:
+            return None
+        if not meta_path.exists():
+            return None
+
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}-{buckets}"'
+        cache_key = (str(video_id), stat.st_mtime_ns, buckets)
+        cached = _waveform_cache.get(cache_key)
+        if cached is not None:
+            return cached[0], cached[1], etag
+
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        peaks = np.load(peaks_path, mmap_mode="r")
+        reduced = self.downsample(np.asarray(peaks), buckets)
+        data = np.ascontiguousarray(reduced, dtype=np.int8).tobytes()
+        meta = {
+            **meta,
+            "buckets": int(reduced.shape[0]),
+            "bucket_seconds": meta["duration"] / max(1, reduced.shape[0]),
+        }
+        _waveform_cache.set(cache_key, (data, meta), size=len(data))
+        return data, meta, etag
+
+
+@lru_cache
+def get_waveform_service() -> WaveformService:
+    """Process-wide instance, built on first use; inject with Depends."""
+    return WaveformService()
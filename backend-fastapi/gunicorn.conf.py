@@ -0,0 +1,45 @@
+"""
+Gunicorn settings for serving on every core.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Each worker runs its own uvicorn event loop. Media and metadata caches move
+to shared-memory slab files (app/core/shared_cache.py) so workers share one
+copy of hot previews, segments and playlists, and the DB_POOL_SIZE /
+DB_MAX_OVERFLOW budget is split between workers instead of multiplied.
+Slabs live in /dev/shm: give the container enough of it (``shm_size``).
+Workers also write metric snapshots to METRICS_MULTIPROC_DIR so a scrape of
+``/metrics`` on any worker covers all of them.
+"""
+
+import multiprocessing
+import os
+
+workers = int(os.environ.get("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+
+# Workers import the app after the fork, so none inherits the master's
+# database connections, mapped slabs or cache file locks
+preload_app = False
+
+# Previews and HLS generation can hold a request for a while
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+
+# Read by app.core.config in every worker
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ.setdefault("SHARED_CACHE_ENABLED", "true")
+os.environ.setdefault("METRICS_MULTIPROC_DIR", "/dev/shm/video-player-metrics")
+
+
+def on_starting(server):
+    """Start each deployment with empty shared caches and fresh metrics."""
+    from app.core.metrics import reset_metrics_dir
+    from app.core.shared_cache import reset_shared_caches
+
+    removed = reset_shared_caches()
+    snapshots = reset_metrics_dir()
+    print(f"🚀 Starting {workers} workers (removed {removed} stale cache slabs, {snapshots} metrics snapshots)")
@@ -0,0 +1,332 @@
+"""
+Query plan harness.
+
+Seeds a scaled dataset inside a transaction, drives the queries issued by
+VideoService, AnnotationService, VideoProcessingService and the GraphQL
+resolvers, and runs EXPLAIN (ANALYZE, BUFFERS) on every SELECT they send.
+Fails on sequential scans of the application tables or on statements over
+their time budget. The transaction is rolled back at the end, so the target
+database is left as it was.
+
+Run from backend-fastapi/ against a migrated PostgreSQL database:
+
+    python -m perf.query_plans --videos 20000 --annotations-per-video 50
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.core.database import engine
+from app.graphql.context import GraphQLContext
+from app.graphql.schema import schema
+from app.services.annotation_service import AnnotationService
+from app.services.video_processing import VideoProcessingService
+from app.services.video_service import VideoService
+from app.services.view_counter import ViewCounter
+
+CHECKED_TABLES = {"videos", "annotations", "video_chunks"}
+
+SEED_SQL = [
+    """
+    INSERT INTO videos (id, title, filename, "originalName", "mimeType", size, duration, views,
+                        "isActive", "isProduction", "totalDuration", "caseId", "sourceType",
+                        "createdAt", "updatedAt")
+    SELECT gen_random_uuid(), 'perf video ' || g, 'perf_' || g || '.mp4', 'perf_' || g || '.mp4',
+           'video/mp4', 100000000, 3600, (random() * 1000)::int,
+           g % 50 <> 0, g % :production_every = 0, 3600, 'CASE-' || g, 'NFS',
+           now() - g * interval '1 minute', now()
+    FROM generate_series(1, :videos) AS g
+    """,
+    """
+    INSERT INTO annotations (id, title, description, "startTime", "endTime", type, color,
+                             "isActive", "videoId", "createdAt", "updatedAt")
+    SELECT gen_random_uuid(), 'perf marker ' || a, NULL, a * 60, a * 60 + 45, 'marker', '#3B82F6',
+           a % 20 <> 0, v.id, now(), now()
+    FROM videos v CROSS JOIN generate_series(0, :annotations_per_video - 1) AS a
+    WHERE v.title LIKE 'perf video %'
+    """,
+    """
+    INSERT INTO video_chunks (id, video_id, chunk_index, filename, start_time, end_time, duration,
+                              size, fps, width, height, "isActive", "createdAt", "updatedAt")
+    SELECT gen_random_uuid(), v.id, c, 'perf_chunk_' || c || '.mp4', c * 300, c * 300 + 300, 300,
+           10000000, 30, 1920, 1080, true, now(), now()
+    FROM videos v CROSS JOIN generate_series(0, :chunks_per_video - 1) AS c
+    WHERE v.title LIKE 'perf video %' AND v."isProduction"
+    """,
+]
+
+
+@dataclass
+class Fixture:
+    """Ids picked from the seeded data for the cases to query."""
+    video_id: uuid.UUID
+    production_video_id: uuid.UUID
+    annotation_id: uuid.UUID
+    deep_cursor: Optional[str] = None
+
+
+@dataclass
+class Case:
+    name: str
+    run: Callable[[AsyncSession, Fixture], Awaitable[Any]]
+    # Queries that must read (nearly) every row, e.g. unpaginated listings
+    allow_seq_scan: bool = False
+    budget_ms: Optional[float] = None
+
+
+@dataclass
+class PlanReport:
+    case: str
+    statement: str
+    execution_ms: float
+    shared_hit: int
+    shared_read: int
+    seq_scans: List[str] = field(default_factory=list)
+    problems: List[str] = field(default_factory=list)
+
+
+class StatementCapture:
+    """Collects the SELECT statements sent to the database while enabled."""
+
+    def __init__(self):
+        self.enabled = False
+        self.statements: List[Tuple[str, Any]] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            self.statements.append((statement, parameters))
+
+
+def _walk(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+async def _graphql(session: AsyncSession, query: str, **variables) -> Any:
+    result = await schema.execute(query, variable_values=variables, context_value=GraphQLContext(session))
+    if result.errors:
+        raise RuntimeError(result.errors[0].message)
+    return result.data
+
+
+def build_cases() -> List[Case]:
+    """Every query path the harness covers."""
+    processing = VideoProcessingService()
+
+    async def deep_page(db: AsyncSession, fx: Fixture):
+        return await VideoService(db).get_page(after=fx.deep_cursor, limit=100, count="none")
+
+    return [
+        Case("VideoService.get_by_id", lambda db, fx: VideoService(db).get_by_id(fx.video_id)),
+        Case("VideoService.get_all", lambda db, fx: VideoService(db).get_all(skip=0, limit=100)),
+        Case("VideoService.get_page (first)", lambda db, fx: VideoService(db).get_page(limit=100, count="none")),
+        Case("VideoService.get_page (deep)", deep_page),
+        # An exact count has to visit every row
+        Case("VideoService.get_count", lambda db, fx: VideoService(db).get_count(), allow_seq_scan=True, budget_ms=500),
+        Case("ViewCounter.increment", lambda db, fx: ViewCounter().increment(db, fx.video_id)),
+        Case("AnnotationService.get_by_id", lambda db, fx: AnnotationService(db).get_by_id(fx.annotation_id)),
+        Case("AnnotationService.get_by_video_id", lambda db, fx: AnnotationService(db).get_by_video_id(fx.video_id)),
+        Case(
+            "AnnotationService.get_overlapping",
+            lambda db, fx: AnnotationService(db).get_overlapping(fx.video_id, 600.0, 900.0),
+        ),
+        Case("AnnotationService.get_at_time", lambda db, fx: AnnotationService(db).get_at_time(fx.video_id, 620.0)),
+        Case(
+            "VideoProcessingService.get_video_chunks",
+            lambda db, fx: processing.get_video_chunks(fx.production_video_id, db),
+        ),
+        Case(
+            "VideoProcessingService.get_chunk_for_time",
+            lambda db, fx: processing.get_chunk_for_time(fx.production_video_id, 1234.0, db),
+        ),
+        # The plain list fields return the whole table by design
+        Case(
+            "GraphQL videos",
+            lambda db, fx: _graphql(db, "{ videos { id title } }"),
+            allow_seq_scan=True,
+            budget_ms=2000,
+        ),
+        Case(
+            "GraphQL video",
+            lambda db, fx: _graphql(
+                db,
+                "query($id: ID!) { video(id: $id) { id title annotations { id } chunks { id } } }",
+                id=str(fx.video_id),
+            ),
+        ),
+        Case(
+            "GraphQL productionVideos",
+            lambda db, fx: _graphql(db, "{ productionVideos { id title } }"),
+        ),
+        Case(
+            "GraphQL videosConnection",
+            lambda db, fx: _graphql(db, "{ videosConnection(first: 50) { edges { node { id title } } } }"),
+        ),
+        Case(
+            "GraphQL productionVideosConnection",
+            lambda db, fx: _graphql(
+                db,
+                "{ productionVideosConnection(first: 50) { edges { node { id title chunks { id } } } } }",
+            ),
+        ),
+        Case(
+            "GraphQL annotationsByVideo",
+            lambda db, fx: _graphql(
+                db,
+                "query($id: ID!) { annotationsByVideo(videoId: $id) { id startTime } }",
+                id=str(fx.video_id),
+            ),
+        ),
+        Case(
+            "GraphQL annotationsByVideo (window)",
+            lambda db, fx: _graphql(
+                db,
+                "query($id: ID!) { annotationsByVideo(videoId: $id, start: 600, end: 900) { id } }",
+                id=str(fx.video_id),
+            ),
+        ),
+        Case(
+            "GraphQL annotationsAt",
+            lambda db, fx: _graphql(
+                db,
+                "query($id: ID!) { annotationsAt(videoId: $id, time: 620) { id } }",
+                id=str(fx.video_id),
+            ),
+        ),
+    ]
+
+
+async def seed(conn: AsyncConnection, args: argparse.Namespace) -> Fixture:
+    params = {
+        "videos": args.videos,
+        "annotations_per_video": args.annotations_per_video,
+        "chunks_per_video": args.chunks_per_video,
+        "production_every": args.production_every,
+    }
+    for statement in SEED_SQL:
+        await conn.execute(text(statement), params)
+    for table in sorted(CHECKED_TABLES):
+        await conn.execute(text(f"ANALYZE {table}"))
+
+    middle = args.videos // 2
+    video_id = (await conn.execute(text(
+        "SELECT id FROM videos WHERE title = :title"
+    ), {"title": f"perf video {middle}"})).scalar_one()
+    production_video_id = (await conn.execute(text(
+        "SELECT id FROM videos WHERE title LIKE 'perf video %' AND \"isProduction\" LIMIT 1"
+    ))).scalar_one()
+    annotation_id = (await conn.execute(text(
+        'SELECT id FROM annotations WHERE "videoId" = :video_id LIMIT 1'
+    ), {"video_id": video_id})).scalar_one()
+    return Fixture(video_id, production_video_id, annotation_id)
+
+
+async def explain(conn: AsyncConnection, statement: str, parameters: Any) -> Dict[str, Any]:
+    result = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def check(case: Case, statement: str, plan: Dict[str, Any], budget_ms: float) -> PlanReport:
+    root = plan["Plan"]
+    report = PlanReport(
+        case=case.name,
+        statement=" ".join(statement.split()),
+        execution_ms=plan["Execution Time"],
+        shared_hit=root.get("Shared Hit Blocks", 0),
+        shared_read=root.get("Shared Read Blocks", 0),
+    )
+    for node in _walk(root):
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in CHECKED_TABLES:
+            report.seq_scans.append(node["Relation Name"])
+    if report.seq_scans and not case.allow_seq_scan:
+        report.problems.append(f"sequential scan on {', '.join(sorted(set(report.seq_scans)))}")
+    budget = case.budget_ms if case.budget_ms is not None else budget_ms
+    if report.execution_ms > budget:
+        report.problems.append(f"{report.execution_ms:.1f} ms over the {budget:.0f} ms budget")
+    return report
+
+
+async def run(args: argparse.Namespace) -> int:
+    engine.sync_engine.echo = False
+    capture = StatementCapture()
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    reports: List[PlanReport] = []
+    failures: List[str] = []
+
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            print(f"🌱 Seeding {args.videos} videos, {args.annotations_per_video} annotations each...")
+            fixture = await seed(conn, args)
+            # Service commits become savepoint releases inside our transaction
+            session = AsyncSession(bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False)
+
+            page = await VideoService(session).get_page(limit=args.videos // 2, count="none")
+            fixture.deep_cursor = page[1]
+
+            for case in build_cases():
+                if args.only and args.only.lower() not in case.name.lower():
+                    continue
+                capture.statements.clear()
+                capture.enabled = True
+                try:
+                    await case.run(session, fixture)
+                except Exception as e:
+                    failures.append(f"{case.name}: {e}")
+                    continue
+                finally:
+                    capture.enabled = False
+                    session.expunge_all()
+
+                for statement, parameters in capture.statements:
+                    plan = await explain(conn, statement, parameters)
+                    reports.append(check(case, statement, plan, args.budget_ms))
+        finally:
+            await transaction.rollback()
+
+    for report in reports:
+        status = "❌" if report.problems else "✅"
+        print(
+            f"{status} {report.case:<45} {report.execution_ms:>9.2f} ms "
+            f"hit={report.shared_hit:<7} read={report.shared_read:<7}"
+            + (f" seq={','.join(report.seq_scans)}" if report.seq_scans else "")
+        )
+        if report.problems or args.verbose:
+            print(f"     {report.statement[:300]}")
+        for problem in report.problems:
+            print(f"     ↳ {problem}")
+    for failure in failures:
+        print(f"❌ {failure}")
+
+    problems = len(failures) + sum(len(report.problems) for report in reports)
+    print(f"\n{len(reports)} statements checked, {problems} problems")
+    return 1 if problems else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--videos", type=int, default=20_000)
+    parser.add_argument("--annotations-per-video", type=int, default=50)
+    parser.add_argument("--chunks-per-video", type=int, default=12)
+    parser.add_argument("--production-every", type=int, default=10, help="Every Nth video is a production video")
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="Default execution time budget per statement")
+    parser.add_argument("--only", help="Run only cases whose name contains this text")
+    parser.add_argument("--verbose", action="store_true", help="Print every statement")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
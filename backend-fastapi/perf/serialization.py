@@ -0,0 +1,116 @@
+"""
+Serialization benchmark for the REST video listing.
+
+Measures the CPU spent turning one page of fetched rows into a JSON body,
+for the ORM + Pydantic path the endpoint used to take and for the row
+serializer + orjson fast path. No database is needed: rows are synthesized
+in the shape the listing queries return.
+
+Run from backend-fastapi/:
+
+    python -m perf.serialization --videos 1000 --annotations-per-video 10
+"""
+
+import argparse
+import json
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List, Tuple
+
+import orjson
+
+from app.models.annotation import Annotation
+from app.models.video import Video
+from app.schemas.serializers import JSON_OPTIONS, VideoPage, annotation_serializer, video_serializer
+from app.schemas.video import VideoList
+
+
+def make_rows(videos: int, annotations_per_video: int) -> Tuple[List[tuple], List[tuple]]:
+    """Rows in video_serializer / annotation_serializer column order."""
+    now = datetime.now(timezone.utc)
+    video_rows, annotation_rows = [], []
+    for v in range(videos):
+        video_id = uuid.uuid4()
+        created = now - timedelta(minutes=v)
+        video_rows.append((
+            f"Video {v}", "Benchmark video", f"video_{v}.mp4", f"video_{v}.mp4", "video/mp4",
+            100_000_000, 3600.0, v, True, video_id, created, created,
+        ))
+        for a in range(annotations_per_video):
+            annotation_rows.append((
+                f"Marker {a}", None, a * 60.0, a * 60.0 + 45.0, "marker", "#3B82F6", True,
+                video_id, uuid.uuid4(), created, created,
+            ))
+    return video_rows, annotation_rows
+
+
+def orm_path(video_rows: List[tuple], annotation_rows: List[tuple]) -> bytes:
+    """ORM instances validated into VideoList, as FastAPI serializes a response_model."""
+    by_video = defaultdict(list)
+    for row in annotation_rows:
+        fields = dict(zip(annotation_serializer.keys, row))
+        annotation = Annotation(**{k: v for k, v in fields.items() if k not in ("created_at", "updated_at")})
+        # The response schemas read created_at/updated_at
+        annotation.created_at = annotation.updated_at = fields["created_at"]
+        by_video[fields["videoId"]].append(annotation)
+    videos = []
+    for row in video_rows:
+        fields = dict(zip(video_serializer.keys, row))
+        video = Video(**{k: v for k, v in fields.items() if k not in ("created_at", "updated_at")})
+        video.created_at = video.updated_at = fields["created_at"]
+        video.annotations = by_video[fields["id"]]
+        videos.append(video)
+
+    payload = VideoList(videos=videos, total=len(videos), page=1, size=len(videos))
+    # FastAPI re-validates the returned model against response_model, then dumps it
+    content = VideoList.model_validate(payload.model_dump()).model_dump(mode="json")
+    return json.dumps(content).encode()
+
+
+def fast_path(video_rows: List[tuple], annotation_rows: List[tuple]) -> bytes:
+    """Row serializers and orjson, as VideoService.get_page does."""
+    videos = video_serializer.dump_all(video_rows)
+    by_video = defaultdict(list)
+    for annotation in annotation_serializer.dump_all(annotation_rows):
+        by_video[annotation["videoId"]].append(annotation)
+    for video in videos:
+        video["annotations"] = by_video.get(video["id"], [])
+    page = VideoPage(videos=videos, total=len(videos), page=1, size=len(videos))
+    return orjson.dumps(page, option=JSON_OPTIONS)
+
+
+def measure(fn: Callable[..., Any], *args: Any, repeat: int) -> float:
+    """Best CPU seconds of `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        fn(*args)
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--annotations-per-video", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    video_rows, annotation_rows = make_rows(args.videos, args.annotations_per_video)
+    # Both paths must produce the same document
+    assert json.loads(orm_path(video_rows, annotation_rows)) == json.loads(fast_path(video_rows, annotation_rows))
+
+    before = measure(orm_path, video_rows, annotation_rows, repeat=args.repeat)
+    after = measure(fast_path, video_rows, annotation_rows, repeat=args.repeat)
+    per_thousand = 1000 / args.videos * 1000
+
+    print(f"📊 {args.videos} videos x {args.annotations_per_video} annotations, best of {args.repeat}")
+    print(f"   ORM + Pydantic: {before * per_thousand:8.1f} ms CPU per 1,000 videos")
+    print(f"   Rows + orjson:  {after * per_thousand:8.1f} ms CPU per 1,000 videos")
+    print(f"   Speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
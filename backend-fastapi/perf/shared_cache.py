@@ -0,0 +1,87 @@
+"""
+Shared-memory cache benchmark.
+
+Fills a hot set of preview-sized values, then has several worker processes
+read it, once with per-process LRUCaches (each worker decodes and keeps its
+own copy) and once with one SharedCache slab. Reports get latency and how
+many bytes of cached data the host holds in each mode.
+
+Run from backend-fastapi/:
+
+    python -m perf.shared_cache --workers 4 --items 2000 --item-bytes 24000
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+os.environ.setdefault("SHARED_CACHE_DIR", tempfile.mkdtemp(prefix="shared-cache-bench-"))
+os.environ.setdefault("SHARED_CACHE_PREFIX", "bench")
+
+from app.core.cache import LRUCache  # noqa: E402
+from app.core.shared_cache import SharedCache, reset_shared_caches  # noqa: E402
+
+
+def make_value(i: int, size: int) -> bytes:
+    return i.to_bytes(4, "little") * (size // 4)
+
+
+def worker(mode: str, items: int, item_bytes: int, rounds: int, results):
+    if mode == "shared":
+        cache = SharedCache("bench", max_entries=items, max_bytes=items * (item_bytes + 64) * 2)
+    else:
+        cache = LRUCache("bench", max_entries=items, max_bytes=items * item_bytes * 2)
+    held = 0
+    start = time.perf_counter()
+    reads = 0
+    for _ in range(rounds):
+        for i in range(items):
+            key = ("video", i, "jpeg", 320)
+            value = cache.get(key)
+            if value is None:
+                # Stand-in for an ffmpeg decode: only the first worker to miss pays it
+                value = make_value(i, item_bytes)
+                cache.set(key, value)
+                if mode == "process":
+                    held += len(value)
+            reads += 1
+    results.put((mode, reads, time.perf_counter() - start, held))
+
+
+def run(mode: str, workers: int, items: int, item_bytes: int, rounds: int):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(mode, items, item_bytes, rounds, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    reads = sum(o[1] for o in outcomes)
+    seconds = max(o[2] for o in outcomes)
+    held = sum(o[3] for o in outcomes) if mode == "process" else items * item_bytes
+    print(f"   {mode:8s} {seconds / (reads / workers) * 1e6:7.1f} µs/get   {held / 1024 / 1024:8.1f} MB cached on the host")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--item-bytes", type=int, default=24_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    reset_shared_caches()
+    print(f"📊 {args.workers} workers reading {args.items} x {args.item_bytes} B values, {args.rounds} rounds")
+    run("process", args.workers, args.items, args.item_bytes, args.rounds)
+    run("shared", args.workers, args.items, args.item_bytes, args.rounds)
+    reset_shared_caches()
+
+
+if __name__ == "__main__":
+    main()
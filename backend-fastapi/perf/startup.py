@@ -0,0 +1,80 @@
+"""
+Import-time benchmark for worker cold start.
+
+Imports ``app.main`` in fresh interpreters with ``-X importtime`` and reports
+the best wall time, the slowest modules by self time, and whether any heavy
+media library (numpy, Pillow, ffmpeg-python, m3u8, OpenCV) was executed at
+import. Those are expected to load on first use only, so the check fails if
+one of them shows up.
+
+Run from backend-fastapi/:
+
+    python -m perf.startup --runs 5
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+HEAVY_MODULES = ("numpy", "cv2", "PIL.Image", "ffmpeg", "m3u8")
+
+# "import time:   self [us] | cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_once(target: str) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """Import target in a new interpreter. Returns wall seconds and {module: (self_us, cumulative_us)}."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{result.stderr[-2000:]}")
+
+    modules: Dict[str, Tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return elapsed, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    # The first run also writes bytecode caches; it is not counted
+    import_once(args.target)
+    runs: List[Tuple[float, Dict[str, Tuple[int, int]]]] = [
+        import_once(args.target) for _ in range(args.runs)
+    ]
+    best_wall, modules = min(runs, key=lambda run: run[0])
+    cumulative_ms = modules.get(args.target, (0, 0))[1] / 1000
+
+    print(f"📊 import {args.target}, best of {args.runs}")
+    print(f"   Interpreter + import: {best_wall * 1000:8.1f} ms wall")
+    print(f"   {args.target} cumulative: {cumulative_ms:8.1f} ms ({len(modules)} modules)")
+    print("   Slowest modules by self time:")
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda item: -item[1][0])[: args.top]:
+        print(f"     {self_us / 1000:7.1f} ms self {cumulative_us / 1000:8.1f} ms cumulative  {name}")
+
+    loaded = [name for name in HEAVY_MODULES if name in modules]
+    if loaded:
+        print(f"❌ Heavy modules executed at import: {', '.join(loaded)}")
+        sys.exit(1)
+    print("✅ No heavy media modules executed at import")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,12 @@ import { useQuery } from '@apollo/client';
 import { Video } from '@/types';
 import { GET_ANNOTATIONS_BY_VIDEO } from '@/graphql/queries';
 
+// Names this tab's hover previews so the backend can cancel the stale ones.
+// Math.random rather than crypto.randomUUID, which plain-HTTP pages lack.
+const PREVIEW_SESSION_ID = `${Date.now().toString(36)}-${Math.random()
+  .toString(36)
+  .slice(2)}`;
+
 interface YouTubeLikePlayerProps {
   video: Video;
   onTimeUpdate?: (time: number) => void;
@@ -124,9 +130,15 @@ const YouTubeLikePlayer = forwardRef<
     // Generate frame preview
     const generateFramePreview = async (time: number) => {
       try {
-        const response = await fetch(
-          `http://localhost:8000/api/v1/videos/${video.id}/frame/${time}`
-        );
+        const base = `http://localhost:8000/api/v1/videos/${video.id}`;
+        // Sliced from the frame atlas without decoding; until the atlas is
+        // built, fall back to decoding the frame with ffmpeg
+        let response = await fetch(`${base}/preview/${time}`);
+        if (response.status === 404) {
+          response = await fetch(`${base}/frame/${time}`, {
+            headers: { 'X-Preview-Session': PREVIEW_SESSION_ID },
+          });
+        }
         if (response.ok) {
           const blob = await response.blob();
           const url = URL.createObjectURL(blob);
@@ -4,13 +4,22 @@ import {
   createHttpLink,
   FetchPolicy,
 } from '@apollo/client';
+import { createPersistedQueryLink } from '@apollo/client/link/persisted-queries';
+import { sha256 } from 'js-sha256';
 
 const httpLink = createHttpLink({
   uri: process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/graphql',
 });
 
+// Send only the query hash once the server has seen the document. Hashed in
+// JS: crypto.subtle is missing when the UI is served over plain HTTP.
+const persistedQueryLink = createPersistedQueryLink({
+  sha256: (query: string) => sha256(query),
+  useGETForHashedQueries: true,
+});
+
 export const apolloClient = new ApolloClient({
-  link: httpLink,
+  link: persistedQueryLink.concat(httpLink),
   cache: new InMemoryCache({
     typePolicies: {
       Query: {